@@ -15,7 +15,7 @@
   # 获取下载链接 (无需 API 密钥)
   python douyin_downloader.py --link "抖音分享链接" --action info
 
-  # 下载视频
+  # 下载视频（图集作品下载全部图片到 ./videos/<作品ID>/）
   python douyin_downloader.py --link "抖音分享链接" --action download --output ./videos
 
   # 提取文案并保存到文件 (需要 API_KEY 环境变量)
@@ -23,14 +23,17 @@
 """
 
 import os
-import re
 import sys
 import json
+import asyncio
 import argparse
+import functools
 import tempfile
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Iterator, List, Optional
 from datetime import datetime
 
 
@@ -38,9 +41,14 @@ def check_dependencies():
     """检查必要的依赖是否已安装"""
     missing = []
     try:
-        import requests
+        # 连接池、解析、识别后端和缓存等共享模块
+        import douyin_mcp_server
     except ImportError:
-        missing.append("requests")
+        missing.append("douyin-mcp-server")
+    try:
+        import httpx
+    except ImportError:
+        missing.append("httpx")
     try:
         import ffmpeg
     except ImportError:
@@ -54,26 +62,250 @@ def check_dependencies():
 
 check_dependencies()
 
-import requests
+import httpx
 import ffmpeg
 
-# 请求头，模拟移动端访问
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) EdgiOS/121.0.2277.107 Version/17.0 Mobile/15E148 Safari/604.1'
-}
+from douyin_mcp_server.audio import (
+    AUDIO_PROFILES,
+    AudioProfile,
+    detect_silences,
+    detect_silences_async,
+    encode_audio,
+    get_audio_profile,
+    iter_segments,
+    iter_segments_async,
+    plan_split_points,
+    transcode_stream,
+    transcode_stream_async,
+)
+from douyin_mcp_server.asr import (
+    DEFAULT_OPENAI_BASE_URL,
+    DEFAULT_OPENAI_MODEL,
+    OpenAICompatibleBackend,
+    select_backend,
+)
+from douyin_mcp_server.cache import get_media_cache, get_transcript_cache, hash_file, link_or_copy
+from douyin_mcp_server.download import download_file, download_file_async, get_download_stats
+from douyin_mcp_server.http_client import get_client, get_async_client
+from douyin_mcp_server.images import download_images as download_image_files
+from douyin_mcp_server.resolver import (
+    HEADERS,
+    PLAY_URL_EXPIRED_STATUS,
+    extract_share_urls,
+    parse_share_page,
+    resolve_share_url,
+    resolve_share_url_async,
+    revalidate_video_info,
+    revalidate_video_info_async,
+)
+from douyin_mcp_server.singleflight import SingleFlight
+from douyin_mcp_server.video_info import audio_source_report, select_audio_source
+
+# 硅基流动 API 配置（OpenAI 兼容接口，识别后端见 douyin_mcp_server/asr.py）
+DEFAULT_API_BASE_URL = DEFAULT_OPENAI_BASE_URL
+DEFAULT_MODEL = DEFAULT_OPENAI_MODEL
+
+# 单次识别的音频上限，超过后自动分段（9 分钟一段，留余量）
+MAX_AUDIO_DURATION = 3600  # 1 小时
+MAX_AUDIO_SIZE = 50 * 1024 * 1024  # 50MB
+SEGMENT_DURATION = 540
+
+# 分段识别的并发数和单段失败后的重试次数；同一识别服务的请求速率见 douyin_mcp_server/ratelimit.py
+ASR_CONCURRENCY = max(1, int(os.getenv("DOUYIN_ASR_CONCURRENCY", "4")))
+ASR_RETRIES = max(0, int(os.getenv("DOUYIN_ASR_RETRIES", "2")))
+ASR_RETRY_BACKOFF = 1.0
+
+# 批量提取时各阶段的并发上限：解析分享页、下载并提取音频、语音识别
+BATCH_RESOLVE_CONCURRENCY = max(1, int(os.getenv("DOUYIN_BATCH_RESOLVE_CONCURRENCY", "8")))
+BATCH_AUDIO_CONCURRENCY = max(1, int(os.getenv("DOUYIN_BATCH_AUDIO_CONCURRENCY", "2")))
+BATCH_ASR_CONCURRENCY = max(1, int(os.getenv("DOUYIN_BATCH_ASR_CONCURRENCY", "4")))
+
+# 进行中的视频提取，按 (video_id, 模型, API Key) 合并
+_extract_flight = SingleFlight("extract")
+
+# 提取文案时边下载边转码，视频不落盘（DOUYIN_STREAM_AUDIO=false 时先下载再提取）
+STREAM_AUDIO = os.getenv("DOUYIN_STREAM_AUDIO", "true").lower() == "true"
+
+# 只需要文案时下载作品原声或码率最低的版本，而不是默认的高清视频（DOUYIN_AUDIO_SMALLEST_SOURCE=false 时关闭）
+SMALLEST_AUDIO_SOURCE = os.getenv("DOUYIN_AUDIO_SMALLEST_SOURCE", "true").lower() == "true"
+
+# 异步流程中的 CPU/阻塞步骤（解析分享页、计算音频哈希等）放到有界线程池执行
+CPU_WORKERS = int(os.getenv("DOUYIN_CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """获取进程级共享的有界线程池"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(1, CPU_WORKERS), thread_name_prefix="douyin-cpu")
+    return _executor
+
+
+async def run_in_executor(func, *args, **kwargs):
+    """在有界线程池中执行阻塞函数"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def run_subprocess_async(args: list) -> bytes:
+    """以 asyncio 子进程运行命令，返回 stdout；任务被取消时结束子进程"""
+    proc = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await proc.communicate()
+    except asyncio.CancelledError:
+        proc.kill()
+        await proc.wait()
+        raise
+    if proc.returncode != 0:
+        raise ffmpeg.Error(args[0], stdout, stderr)
+    return stdout
+
+
+async def run_ffmpeg_async(stream) -> bytes:
+    """异步运行 ffmpeg-python 构建的命令"""
+    return await run_subprocess_async(stream.compile(overwrite_output=True))
+
+
+async def probe_async(path: Path) -> dict:
+    """ffmpeg.probe 的异步版本"""
+    stdout = await run_subprocess_async(
+        ["ffprobe", "-show_format", "-show_streams", "-of", "json", str(path)]
+    )
+    return json.loads(stdout.decode("utf-8"))
+
+
+async def _parse_share_page_async(page: bytes, video_id: str) -> dict:
+    return await run_in_executor(parse_share_page, page, video_id)
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """识别请求失败是否值得重试：网络错误、429 和 5xx"""
+    # 本身就是 httpx 异常时直接判断（其 __cause__ 是 httpcore 的异常）
+    cause = exc if isinstance(exc, httpx.HTTPError) else (exc.__cause__ or exc)
+    if isinstance(cause, httpx.HTTPStatusError):
+        status = cause.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(cause, httpx.TransportError)
+
+
+def _play_urls(video_info: dict, audio_only: bool = False) -> list:
+    """默认播放地址（或识别用音频来源）的全部 CDN 镜像（旧缓存中只有 url）"""
+    if not video_info.get('url'):
+        raise ValueError("图集作品没有视频，请使用下载图片功能")
+    if audio_only:
+        return audio_source(video_info)['urls']
+    return video_info.get('urls') or [video_info['url']]
 
-# 硅基流动 API 配置
-DEFAULT_API_BASE_URL = "https://api.siliconflow.cn/v1/audio/transcriptions"
-DEFAULT_MODEL = "FunAudioLLM/SenseVoiceSmall"
+
+def audio_source(video_info: dict) -> dict:
+    """识别用音频的下载来源，见 douyin_mcp_server/video_info.py 中的 select_audio_source"""
+    return select_audio_source(video_info, smallest=SMALLEST_AUDIO_SOURCE)
+
+
+def record_audio_source(source: dict, downloaded: int) -> dict:
+    """记录一次音频来源的下载量和节省的字节数（计入 /api/stats 的 download 统计）"""
+    report = audio_source_report(source, downloaded)
+    get_download_stats().record_audio_source(report)
+    return report
+
+
+def describe_audio_source(report: dict) -> str:
+    names = {"music": "作品原声", "bit_rate": f"低码率版本 {report['gear_name']}",
+             "default": "默认视频", "media_cache": "已缓存的视频"}
+    text = f"音频来源: {names.get(report['kind'], report['kind'])}，下载 {report['bytes'] / 1024 / 1024:.1f}MB"
+    if report['saved']:
+        text += f"，比下载默认视频节省 {report['saved'] / 1024 / 1024:.1f}MB"
+    return text
+
+
+def fetch_video_file(video_info: dict, path: Path, progress=None, audio_only: bool = False) -> dict:
+    """
+    分段下载视频到 path（不经过视频缓存），已下载的分块会保留
+
+    某个 CDN 镜像连接失败或返回 429/5xx 时换下一个镜像；签名地址失效时重新解析后重试一次。
+    audio_only 时下载 audio_source() 选出的来源（不能写入视频缓存）。
+    """
+    client = get_client()
+    for attempt in range(2):
+        urls = _play_urls(video_info, audio_only)
+        for i, url in enumerate(urls):
+            try:
+                return download_file(client, url, path, HEADERS, progress=progress)
+            except httpx.HTTPError as e:
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code in PLAY_URL_EXPIRED_STATUS \
+                        and attempt == 0:
+                    break
+                if i == len(urls) - 1 or not is_retryable_error(e):
+                    raise
+        video_info.update(revalidate_video_info(video_info['video_id']))
+
+
+async def fetch_video_file_async(video_info: dict, path: Path, progress=None, audio_only: bool = False) -> dict:
+    """fetch_video_file 的异步版本"""
+    client = get_async_client()
+    for attempt in range(2):
+        urls = _play_urls(video_info, audio_only)
+        for i, url in enumerate(urls):
+            try:
+                return await download_file_async(client, url, path, HEADERS, progress=progress)
+            except httpx.HTTPError as e:
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code in PLAY_URL_EXPIRED_STATUS \
+                        and attempt == 0:
+                    break
+                if i == len(urls) - 1 or not is_retryable_error(e):
+                    raise
+        video_info.update(await revalidate_video_info_async(
+            video_info['video_id'], parse=_parse_share_page_async))
+
+
+async def stream_video_file_async(video_info: dict, path: Path) -> int:
+    """
+    用单个连接从头到尾顺序下载视频到 path，每块写入后立即 flush，返回写入的字节数
+
+    与分段下载不同，下载过程中其他请求可以边写边读 path（见 MediaCache.tail）。
+    镜像切换和签名地址失效的处理与 fetch_video_file_async 相同，但已经写入数据后不再换镜像重试，
+    以免正在读取的请求读到两个来源拼接的内容。
+    """
+    client = get_async_client()
+    written = 0
+    for attempt in range(2):
+        urls = _play_urls(video_info)
+        for i, url in enumerate(urls):
+            try:
+                async with client.stream("GET", url, headers=HEADERS) as response:
+                    response.raise_for_status()
+                    with open(path, "wb") as f:
+                        async for chunk in response.aiter_bytes():
+                            f.write(chunk)
+                            f.flush()
+                            written += len(chunk)
+                return written
+            except httpx.HTTPError as e:
+                if written:
+                    raise
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code in PLAY_URL_EXPIRED_STATUS \
+                        and attempt == 0:
+                    break
+                if i == len(urls) - 1 or not is_retryable_error(e):
+                    raise
+        video_info.update(await revalidate_video_info_async(
+            video_info['video_id'], parse=_parse_share_page_async))
 
 
 class DouyinProcessor:
     """抖音视频处理器"""
 
-    def __init__(self, api_key: str = "", api_base_url: Optional[str] = None, model: Optional[str] = None):
+    def __init__(self, api_key: str = "", api_base_url: Optional[str] = None, model: Optional[str] = None,
+                 audio_profile: Optional[str] = None):
         self.api_key = api_key
         self.api_base_url = api_base_url or DEFAULT_API_BASE_URL
         self.model = model or DEFAULT_MODEL
+        self.backend = OpenAICompatibleBackend(api_key, self.model, self.api_base_url)
+        # 识别用音频的编码配置（默认 16kHz 单声道低码率，见 douyin_mcp_server/audio.py）
+        self.audio_profile: AudioProfile = get_audio_profile(audio_profile)
         self.temp_dir = Path(tempfile.mkdtemp())
 
     def __del__(self):
@@ -81,57 +313,28 @@ class DouyinProcessor:
         if hasattr(self, 'temp_dir') and self.temp_dir.exists():
             shutil.rmtree(self.temp_dir, ignore_errors=True)
 
-    def parse_share_url(self, share_text: str) -> dict:
-        """从分享文本中提取无水印视频链接"""
-        # 提取分享链接
-        urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', share_text)
-        if not urls:
-            raise ValueError("未找到有效的分享链接")
-
-        share_url = urls[0]
-        share_response = requests.get(share_url, headers=HEADERS)
-        video_id = share_response.url.split("?")[0].strip("/").split("/")[-1]
-        share_url = f'https://www.iesdouyin.com/share/video/{video_id}'
-
-        # 获取视频页面内容
-        response = requests.get(share_url, headers=HEADERS)
-        response.raise_for_status()
-
-        pattern = re.compile(
-            pattern=r"window\._ROUTER_DATA\s*=\s*(.*?)</script>",
-            flags=re.DOTALL,
-        )
-        find_res = pattern.search(response.text)
-
-        if not find_res or not find_res.group(1):
-            raise ValueError("从HTML中解析视频信息失败")
-
-        # 解析JSON数据
-        json_data = json.loads(find_res.group(1).strip())
-        VIDEO_ID_PAGE_KEY = "video_(id)/page"
-        NOTE_ID_PAGE_KEY = "note_(id)/page"
-
-        if VIDEO_ID_PAGE_KEY in json_data["loaderData"]:
-            original_video_info = json_data["loaderData"][VIDEO_ID_PAGE_KEY]["videoInfoRes"]
-        elif NOTE_ID_PAGE_KEY in json_data["loaderData"]:
-            original_video_info = json_data["loaderData"][NOTE_ID_PAGE_KEY]["videoInfoRes"]
-        else:
-            raise Exception("无法从JSON中解析视频或图集信息")
-
-        data = original_video_info["item_list"][0]
-
-        # 获取视频信息
-        video_url = data["video"]["play_addr"]["url_list"][0].replace("playwm", "play")
-        desc = data.get("desc", "").strip() or f"douyin_{video_id}"
+    def parse_share_url(self, share_text: str, refresh: bool = False) -> dict:
+        """从分享文本中提取无水印视频链接（结果会写入持久化缓存）"""
+        return resolve_share_url(share_text, refresh=refresh)
 
-        # 替换文件名中的非法字符
-        desc = re.sub(r'[\\/:*?"<>|]', '_', desc)
+    def open_video_stream(self, video_info: dict, audio_only: bool = False) -> httpx.Response:
+        """
+        打开视频下载流（调用方负责 close）；签名地址失效时重新解析后重试一次
 
-        return {
-            "url": video_url,
-            "title": desc,
-            "video_id": video_id
-        }
+        audio_only 时打开 audio_source() 选出的来源
+        """
+        client = get_client()
+        for attempt in range(2):
+            url = _play_urls(video_info, audio_only)[0]
+            response = client.send(client.build_request("GET", url, headers=HEADERS), stream=True)
+            if response.status_code in PLAY_URL_EXPIRED_STATUS and attempt == 0:
+                response.close()
+                video_info.update(revalidate_video_info(video_info['video_id']))
+                continue
+            if response.is_error:
+                response.close()
+                response.raise_for_status()
+            return response
 
     def download_video(self, video_info: dict, output_dir: Optional[Path] = None, show_progress: bool = True) -> Path:
         """下载视频"""
@@ -147,38 +350,51 @@ class DouyinProcessor:
         if show_progress:
             print(f"正在下载视频: {video_info['title']}")
 
-        response = requests.get(video_info['url'], headers=HEADERS, stream=True)
-        response.raise_for_status()
+        def report(downloaded: int, total: int):
+            if total > 0:
+                print(f"\r下载进度: {downloaded / total * 100:.1f}%", end="", flush=True)
+
+        results = []
 
-        # 获取文件大小
-        total_size = int(response.headers.get('content-length', 0))
+        def fetch(path: Path):
+            results.append(fetch_video_file(video_info, path, progress=report if show_progress else None))
 
-        # 下载文件
-        downloaded = 0
-        with open(filepath, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if show_progress and total_size > 0:
-                        progress = downloaded / total_size * 100
-                        print(f"\r下载进度: {progress:.1f}%", end="", flush=True)
+        # 下载过的视频保存在本地缓存中，这里得到的是缓存文件的硬链接（或副本）
+        get_media_cache().fetch(video_info['video_id'], fetch, dest=filepath)
 
         if show_progress:
-            print(f"\n视频下载完成: {filepath}")
+            if not results:
+                print(f"使用已缓存的视频: {filepath}")
+            else:
+                result = results[0]
+                speed = result['bytes_per_second'] / 1024 / 1024
+                resumed = f"，续传 {result['resumed'] / 1024 / 1024:.1f}MB" if result['resumed'] else ""
+                print(f"\n视频下载完成: {filepath}（{speed:.1f}MB/s，{result['connections']} 个连接{resumed}）")
         return filepath
 
+    def download_images(self, video_info: dict, output_dir: Optional[Path] = None, show_progress: bool = True) -> list:
+        """并发下载图集作品的全部图片到 output_dir/<video_id>/，返回按顺序排列的图片路径"""
+        folder = Path(output_dir or self.temp_dir) / video_info['video_id']
+        if show_progress:
+            print(f"正在下载图集: {video_info['title']}（{len(video_info['images'])} 张）")
+
+        def report(done: int, total: int):
+            print(f"\r下载进度: {done}/{total}", end="", flush=True)
+
+        paths = download_image_files(video_info['images'], folder, HEADERS, progress=report if show_progress else None)
+        if show_progress:
+            print(f"\n图集下载完成: {folder}")
+        return paths
+
     def extract_audio(self, video_path: Path, show_progress: bool = True) -> Path:
         """从视频文件中提取音频"""
-        audio_path = video_path.with_suffix('.mp3')
+        audio_path = video_path.with_suffix(self.audio_profile.suffix)
 
         if show_progress:
             print("正在提取音频...")
         try:
             (
-                ffmpeg
-                .input(str(video_path))
-                .output(str(audio_path), acodec='libmp3lame', q=0)
+                encode_audio(ffmpeg.input(str(video_path)), str(audio_path), self.audio_profile)
                 .run(capture_stdout=True, capture_stderr=True, overwrite_output=True)
             )
             if show_progress:
@@ -187,8 +403,105 @@ class DouyinProcessor:
         except Exception as e:
             raise Exception(f"提取音频时出错: {str(e)}")
 
-    def get_audio_info(self, audio_path: Path) -> dict:
-        """获取音频文件信息（时长和大小）"""
+    def stream_audio(self, video_info: dict, show_progress: bool = True) -> tuple:
+        """
+        边下载边提取音频：HTTP 响应体直接送入 ffmpeg，视频不落盘
+
+        返回:
+            (音频路径, {'duration', 'size', 'sha256'})
+        """
+        audio_path = self.temp_dir / f"{video_info['video_id']}{self.audio_profile.suffix}"
+        if show_progress:
+            print("正在边下载边提取音频...")
+
+        response = self.open_video_stream(video_info, audio_only=True)
+        try:
+            audio_info = transcode_stream(response.iter_bytes(chunk_size=65536), audio_path, self.audio_profile)
+            downloaded = response.num_bytes_downloaded
+        finally:
+            response.close()
+        audio_info['source'] = record_audio_source(audio_source(video_info), downloaded)
+
+        if show_progress:
+            print(f"音频提取完成: {audio_path}")
+            print(describe_audio_source(audio_info['source']))
+        return audio_path, audio_info
+
+    def cached_audio_source(self, video_info: dict, output_dir: Optional[Path] = None) -> tuple:
+        """
+        视频缓存中已有完整视频时直接用它提取音频，无需再下载
+
+        返回:
+            (output_dir（默认临时目录）中的硬链接或副本, 来源记录)，未命中时为 (None, None)
+        """
+        cached = get_media_cache().get(video_info['video_id'])
+        if cached is None:
+            return None, None
+        path = link_or_copy(cached, Path(output_dir or self.temp_dir) / f"{video_info['video_id']}.source")
+        return path, record_audio_source(dict(audio_source(video_info), kind="media_cache", gear_name=""), 0)
+
+    def download_audio_source(self, video_info: dict, output_dir: Optional[Path] = None,
+                              show_progress: bool = True) -> tuple:
+        """
+        下载识别用的音频来源（作品原声或最低码率版本，不写入视频缓存）
+
+        返回:
+            (文件路径, 来源记录)
+        """
+        path, report = self.cached_audio_source(video_info, output_dir)
+        if path is not None:
+            return path, report
+        path = Path(output_dir or self.temp_dir) / f"{video_info['video_id']}.source"
+        if show_progress:
+            print("正在下载音频来源...")
+        result = fetch_video_file(video_info, path, audio_only=True)
+        return path, record_audio_source(audio_source(video_info), result['downloaded'])
+
+    def prepare_audio(self, video_info: dict, video_path: Optional[Path] = None, show_progress: bool = True) -> tuple:
+        """
+        获取用于识别的音频
+
+        没有本地视频时优先流式提取；CDN 返回的视频不支持从管道解析（如 moov 在文件尾）
+        等情况下回退到先下载再提取。
+
+        返回:
+            (音频路径, {'duration', 'size', 'sha256'})
+        """
+        source = None
+        downloaded = video_path is None
+        if downloaded:
+            video_path, source = self.cached_audio_source(video_info)
+
+        if video_path is None and STREAM_AUDIO:
+            try:
+                return self.stream_audio(video_info, show_progress=show_progress)
+            except Exception as e:
+                if show_progress:
+                    print(f"流式提取音频失败，改为下载后提取: {e}")
+
+        if video_path is None:
+            video_path, source = self.download_audio_source(video_info, show_progress=show_progress)
+        audio_path = self.extract_audio(video_path, show_progress=show_progress)
+        if downloaded:
+            self.cleanup_files(video_path)
+
+        audio_info = self.get_audio_info(audio_path, duration=video_info.get('duration'))
+        audio_info['sha256'] = hash_file(audio_path)
+        if source is not None:
+            audio_info['source'] = source
+            if show_progress:
+                print(describe_audio_source(source))
+        return audio_path, audio_info
+
+    def get_audio_info(self, audio_path: Path, duration: Optional[float] = None) -> dict:
+        """
+        获取音频文件信息（时长和大小）
+
+        参数:
+            duration: 已知的时长（如分享页给出的视频时长），有值时不再 ffprobe
+        """
+        if duration:
+            return {'duration': duration, 'size': audio_path.stat().st_size}
         try:
             probe = ffmpeg.probe(str(audio_path))
             duration = float(probe['format'].get('duration', 0))
@@ -197,128 +510,307 @@ class DouyinProcessor:
         except Exception:
             return {'duration': 0, 'size': audio_path.stat().st_size}
 
-    def split_audio(self, audio_path: Path, segment_duration: int = 600, show_progress: bool = True) -> list:
+    def split_audio(self, audio_path: Path, segment_duration: int = SEGMENT_DURATION, show_progress: bool = True,
+                    audio_info: Optional[dict] = None) -> Iterator[Path]:
         """
         将音频分割成多个片段
 
+        由单个 ffmpeg 进程复制音频流完成分割，切分点尽量落在目标时长附近的静音处，避免把一句话切断。
+
         参数:
             audio_path: 音频文件路径
-            segment_duration: 每段时长（秒），默认 10 分钟
+            segment_duration: 每段最长时长（秒），默认 9 分钟
             show_progress: 是否显示进度
+            audio_info: 已知的时长和静音区间（如流式提取时得到的），缺少时重新检测
 
         返回:
-            分割后的音频文件路径列表
+            片段路径的生成器，每个片段写完即返回，无需等待全部分割完成
         """
-        audio_info = self.get_audio_info(audio_path)
+        if not audio_info or not audio_info.get('duration'):
+            audio_info = self.get_audio_info(audio_path)
         duration = audio_info['duration']
 
         if duration <= segment_duration:
-            return [audio_path]
+            yield audio_path
+            return
 
-        segments = []
-        segment_index = 0
-        current_time = 0
+        silences = audio_info.get('silences')
+        if silences is None:
+            silences = detect_silences(audio_path)
+        split_points = plan_split_points(duration, segment_duration, silences)
 
         if show_progress:
-            total_segments = int(duration / segment_duration) + 1
-            print(f"音频时长 {duration:.0f} 秒，将分割为 {total_segments} 段...")
-
-        while current_time < duration:
-            segment_path = self.temp_dir / f"segment_{segment_index}.mp3"
+            print(f"音频时长 {duration:.0f} 秒，将分割为 {len(split_points) + 1} 段...")
 
-            try:
-                (
-                    ffmpeg
-                    .input(str(audio_path), ss=current_time, t=segment_duration)
-                    .output(str(segment_path), acodec='libmp3lame', q=0)
-                    .run(capture_stdout=True, capture_stderr=True, overwrite_output=True)
-                )
-                segments.append(segment_path)
-
-                if show_progress:
-                    print(f"  分割片段 {segment_index + 1}: {current_time:.0f}s - {min(current_time + segment_duration, duration):.0f}s")
-
-            except Exception as e:
-                raise Exception(f"分割音频片段 {segment_index} 时出错: {str(e)}")
+        try:
+            yield from iter_segments(audio_path, self.temp_dir, split_points, self.audio_profile)
+        except ffmpeg.Error as e:
+            raise Exception(f"分割音频时出错: {str(e)}")
 
-            current_time += segment_duration
-            segment_index += 1
+    @staticmethod
+    def need_split(audio_info: dict) -> bool:
+        """音频超过单次识别的时长或大小限制，需要分段识别"""
+        return audio_info['duration'] > MAX_AUDIO_DURATION or audio_info['size'] > MAX_AUDIO_SIZE
 
-        return segments
+    def model_key(self, duration: Optional[float] = None) -> str:
+        """识别时长为 duration 的音频实际使用的后端的模型标识，文案缓存按它区分"""
+        return select_backend(self.backend, duration).model_key
 
-    def transcribe_single_audio(self, audio_path: Path) -> str:
-        """转录单个音频文件"""
-        files = {
-            'file': (audio_path.name, open(audio_path, 'rb'), 'audio/mpeg'),
-            'model': (None, self.model)
-        }
+    def audio_model_key(self, audio_info: dict) -> str:
+        """extract_text_from_audio 识别这段音频时使用的后端的模型标识（分段识别时各段不按时长路由）"""
+        return self.model_key(None if self.need_split(audio_info) else audio_info['duration'])
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}"
-        }
+    def transcribe_single_audio(self, audio_path: Path, duration: Optional[float] = None) -> str:
+        """
+        转录单个音频文件
 
+        参数:
+            duration: 音频时长；已知时按时长路由，短音频可交给本地模型（见 select_backend）
+        """
         try:
-            response = requests.post(self.api_base_url, files=files, headers=headers)
-            response.raise_for_status()
-
-            result = response.json()
-            if 'text' in result:
-                return result['text']
-            else:
-                return response.text
-
+            return select_backend(self.backend, duration).transcribe(audio_path)['text']
         except Exception as e:
-            raise Exception(f"提取文字时出错: {str(e)}")
-        finally:
-            files['file'][1].close()
+            raise Exception(f"提取文字时出错: {str(e)}") from e
 
-    def extract_text_from_audio(self, audio_path: Path, show_progress: bool = True) -> str:
-        """从音频文件中提取文字（支持大文件自动分段）"""
+    def transcribe_segment(self, audio_path: Path, cleanup: bool = False, duration: Optional[float] = None) -> str:
+        """转录单个片段，网络错误和限流时按指数退避重试；cleanup 为 True 时识别成功后删除片段"""
+        for attempt in range(ASR_RETRIES + 1):
+            try:
+                text = self.transcribe_single_audio(audio_path, duration)
+                break
+            except Exception as e:
+                if attempt == ASR_RETRIES or not is_retryable_error(e):
+                    raise
+                time.sleep(ASR_RETRY_BACKOFF * 2 ** attempt)
+        if cleanup:
+            self.cleanup_files(audio_path)
+        return text
+
+    def extract_text_from_audio(self, audio_path: Path, show_progress: bool = True,
+                                audio_info: Optional[dict] = None) -> str:
+        """
+        从音频文件中提取文字（支持大文件自动分段）
+
+        参数:
+            audio_info: 已知的时长和大小（如流式提取时得到的），提供时不再 ffprobe
+        """
         if not self.api_key:
             raise ValueError("未设置 API 密钥，请设置环境变量 DOUYIN_API_KEY")
 
         # 检查文件大小和时长
-        audio_info = self.get_audio_info(audio_path)
-        max_duration = 3600  # 1 小时
-        max_size = 50 * 1024 * 1024  # 50MB
+        if not audio_info or not audio_info.get('duration'):
+            audio_info = self.get_audio_info(audio_path)
 
         # 判断是否需要分段
-        need_split = audio_info['duration'] > max_duration or audio_info['size'] > max_size
-
-        if not need_split:
+        if not self.need_split(audio_info):
             # 文件在限制范围内，直接处理
             if show_progress:
                 print("正在识别语音...")
-            return self.transcribe_single_audio(audio_path)
+            return self.transcribe_segment(audio_path, duration=audio_info['duration'])
 
         # 需要分段处理
         if show_progress:
             print(f"音频文件较大（时长: {audio_info['duration']:.0f}秒, 大小: {audio_info['size'] / 1024 / 1024:.1f}MB）")
             print("将自动分段处理...")
 
-        # 分割音频
-        segments = self.split_audio(audio_path, segment_duration=540, show_progress=show_progress)  # 9分钟一段，留余量
+        # 分割音频，片段写完即提交到有界线程池并发识别
+        segments = self.split_audio(audio_path, show_progress=show_progress, audio_info=audio_info)
+        pool = ThreadPoolExecutor(max_workers=ASR_CONCURRENCY, thread_name_prefix="douyin-asr")
+        try:
+            futures = []
+            for segment_path in segments:
+                if show_progress:
+                    print(f"正在识别第 {len(futures) + 1} 段...")
+                futures.append(pool.submit(self.transcribe_segment, segment_path, segment_path != audio_path))
+
+            # 按片段顺序合并文本
+            all_texts = [future.result() for future in futures]
+        except BaseException:
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+        pool.shutdown()
+        merged_text = ''.join(all_texts)
 
-        # 逐段转录
-        all_texts = []
-        for i, segment_path in enumerate(segments):
-            if show_progress:
-                print(f"正在识别第 {i + 1}/{len(segments)} 段...")
+        if show_progress:
+            print(f"语音识别完成，共处理 {len(all_texts)} 个片段")
+
+        return merged_text
 
-            text = self.transcribe_single_audio(segment_path)
-            all_texts.append(text)
+    # ---------- 异步版本：网络请求和 ffmpeg 均不阻塞事件循环 ----------
+
+    async def parse_share_url_async(self, share_text: str, refresh: bool = False) -> dict:
+        """parse_share_url 的异步版本，分享页解析放到线程池执行"""
+        return await resolve_share_url_async(share_text, refresh=refresh, parse=_parse_share_page_async)
+
+    async def open_video_stream_async(self, video_info: dict, audio_only: bool = False) -> httpx.Response:
+        """open_video_stream 的异步版本（调用方负责 aclose）"""
+        client = get_async_client()
+        for attempt in range(2):
+            url = _play_urls(video_info, audio_only)[0]
+            response = await client.send(client.build_request("GET", url, headers=HEADERS), stream=True)
+            if response.status_code in PLAY_URL_EXPIRED_STATUS and attempt == 0:
+                await response.aclose()
+                video_info.update(await revalidate_video_info_async(
+                    video_info['video_id'], parse=_parse_share_page_async))
+                continue
+            if response.is_error:
+                await response.aclose()
+                response.raise_for_status()
+            return response
+
+    async def download_video_async(self, video_info: dict, output_dir: Optional[Path] = None) -> Path:
+        """download_video 的异步版本"""
+        if output_dir is None:
+            output_dir = self.temp_dir
+        else:
+            output_dir = Path(output_dir)
+            output_dir.mkdir(parents=True, exist_ok=True)
 
-            # 清理分段文件
-            if segment_path != audio_path:
-                self.cleanup_files(segment_path)
+        filepath = output_dir / f"{video_info['video_id']}.mp4"
 
-        # 合并文本
-        merged_text = ''.join(all_texts)
+        return await get_media_cache().fetch_async(
+            video_info['video_id'], functools.partial(fetch_video_file_async, video_info), dest=filepath)
 
-        if show_progress:
-            print(f"语音识别完成，共处理 {len(segments)} 个片段")
+    async def extract_audio_async(self, video_path: Path) -> Path:
+        """extract_audio 的异步版本"""
+        audio_path = video_path.with_suffix(self.audio_profile.suffix)
+        try:
+            await run_ffmpeg_async(encode_audio(ffmpeg.input(str(video_path)), str(audio_path), self.audio_profile))
+            return audio_path
+        except Exception as e:
+            raise Exception(f"提取音频时出错: {str(e)}")
 
-        return merged_text
+    async def stream_audio_async(self, video_info: dict) -> tuple:
+        """stream_audio 的异步版本"""
+        audio_path = self.temp_dir / f"{video_info['video_id']}{self.audio_profile.suffix}"
+        response = await self.open_video_stream_async(video_info, audio_only=True)
+        try:
+            audio_info = await transcode_stream_async(
+                response.aiter_bytes(chunk_size=65536), audio_path, self.audio_profile)
+            downloaded = response.num_bytes_downloaded
+        finally:
+            await response.aclose()
+        audio_info['source'] = record_audio_source(audio_source(video_info), downloaded)
+        return audio_path, audio_info
+
+    async def download_audio_source_async(self, video_info: dict, output_dir: Optional[Path] = None) -> tuple:
+        """download_audio_source 的异步版本"""
+        path, report = self.cached_audio_source(video_info, output_dir)
+        if path is not None:
+            return path, report
+        path = Path(output_dir or self.temp_dir) / f"{video_info['video_id']}.source"
+        result = await fetch_video_file_async(video_info, path, audio_only=True)
+        return path, record_audio_source(audio_source(video_info), result['downloaded'])
+
+    async def prepare_audio_async(self, video_info: dict, video_path: Optional[Path] = None) -> tuple:
+        """prepare_audio 的异步版本"""
+        source = None
+        downloaded = video_path is None
+        if downloaded:
+            video_path, source = self.cached_audio_source(video_info)
+
+        if video_path is None and STREAM_AUDIO:
+            try:
+                return await self.stream_audio_async(video_info)
+            except Exception:
+                pass
+
+        if video_path is None:
+            video_path, source = await self.download_audio_source_async(video_info)
+        audio_path = await self.extract_audio_async(video_path)
+        if downloaded:
+            self.cleanup_files(video_path)
+
+        audio_info = await self.get_audio_info_async(audio_path, duration=video_info.get('duration'))
+        audio_info['sha256'] = await run_in_executor(hash_file, audio_path)
+        if source is not None:
+            audio_info['source'] = source
+        return audio_path, audio_info
+
+    async def get_audio_info_async(self, audio_path: Path, duration: Optional[float] = None) -> dict:
+        """get_audio_info 的异步版本"""
+        if duration:
+            return {'duration': duration, 'size': audio_path.stat().st_size}
+        try:
+            probe = await probe_async(audio_path)
+            duration = float(probe['format'].get('duration', 0))
+            return {'duration': duration, 'size': audio_path.stat().st_size}
+        except Exception:
+            return {'duration': 0, 'size': audio_path.stat().st_size}
+
+    async def split_audio_async(self, audio_path: Path, segment_duration: int = SEGMENT_DURATION,
+                                audio_info: Optional[dict] = None) -> AsyncIterator[Path]:
+        """split_audio 的异步版本"""
+        if not audio_info or not audio_info.get('duration'):
+            audio_info = await self.get_audio_info_async(audio_path)
+        duration = audio_info['duration']
+
+        if duration <= segment_duration:
+            yield audio_path
+            return
+
+        silences = audio_info.get('silences')
+        if silences is None:
+            silences = await detect_silences_async(audio_path)
+        split_points = plan_split_points(duration, segment_duration, silences)
+
+        try:
+            async for segment_path in iter_segments_async(audio_path, self.temp_dir, split_points, self.audio_profile):
+                yield segment_path
+        except ffmpeg.Error as e:
+            raise Exception(f"分割音频时出错: {str(e)}")
+
+    async def transcribe_single_audio_async(self, audio_path: Path, duration: Optional[float] = None) -> str:
+        """transcribe_single_audio 的异步版本"""
+        try:
+            return (await select_backend(self.backend, duration).transcribe_async(audio_path))['text']
+        except Exception as e:
+            raise Exception(f"提取文字时出错: {str(e)}") from e
+
+    async def transcribe_segment_async(self, audio_path: Path, cleanup: bool = False,
+                                       duration: Optional[float] = None) -> str:
+        """transcribe_segment 的异步版本"""
+        for attempt in range(ASR_RETRIES + 1):
+            try:
+                text = await self.transcribe_single_audio_async(audio_path, duration)
+                break
+            except Exception as e:
+                if attempt == ASR_RETRIES or not is_retryable_error(e):
+                    raise
+                await asyncio.sleep(ASR_RETRY_BACKOFF * 2 ** attempt)
+        if cleanup:
+            self.cleanup_files(audio_path)
+        return text
+
+    async def extract_text_from_audio_async(self, audio_path: Path, audio_info: Optional[dict] = None) -> str:
+        """extract_text_from_audio 的异步版本"""
+        if not self.api_key:
+            raise ValueError("未设置 API 密钥，请设置环境变量 DOUYIN_API_KEY")
+
+        if not audio_info or not audio_info.get('duration'):
+            audio_info = await self.get_audio_info_async(audio_path)
+
+        if not self.need_split(audio_info):
+            return await self.transcribe_segment_async(audio_path, duration=audio_info['duration'])
+
+        semaphore = asyncio.Semaphore(ASR_CONCURRENCY)
+
+        async def transcribe(segment_path: Path) -> str:
+            async with semaphore:
+                return await self.transcribe_segment_async(segment_path, cleanup=segment_path != audio_path)
+
+        tasks = []
+        try:
+            async for segment_path in self.split_audio_async(audio_path, audio_info=audio_info):
+                tasks.append(asyncio.create_task(transcribe(segment_path)))
+            all_texts = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        return ''.join(all_texts)
 
     def cleanup_files(self, *file_paths: Path):
         """清理指定的文件"""
@@ -340,81 +832,271 @@ def download_video(share_link: str, output_dir: str = ".") -> Path:
     return processor.download_video(video_info, Path(output_dir))
 
 
+def save_transcript(video_info: dict, text_content: str, output_dir: str,
+                    video_path: Optional[Path] = None, show_progress: bool = True) -> str:
+    """
+    将文案保存为 Markdown 文件 (一个视频一个文件夹)
+
+    参数:
+        video_path: 提供时同时把视频复制到该文件夹
+
+    返回:
+        str: 视频文件夹路径
+    """
+    output_base = Path(output_dir)
+    video_folder = output_base / video_info['video_id']
+    video_folder.mkdir(parents=True, exist_ok=True)
+
+    # 保存文案为 Markdown 格式
+    transcript_path = video_folder / "transcript.md"
+    with open(transcript_path, 'w', encoding='utf-8') as f:
+        f.write(f"# {video_info['title']}\n\n")
+        f.write(f"| 属性 | 值 |\n")
+        f.write(f"|------|----|\n")
+        f.write(f"| 视频ID | `{video_info['video_id']}` |\n")
+        f.write(f"| 提取时间 | {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} |\n")
+        f.write(f"| 下载链接 | [点击下载]({video_info['url']}) |\n\n")
+        f.write(f"---\n\n")
+        f.write(f"## 文案内容\n\n")
+        f.write(text_content)
+
+    if show_progress:
+        print(f"文案已保存到: {transcript_path}")
+
+    # 保存视频 (可选)
+    if video_path is not None:
+        saved_video_path = video_folder / f"{video_info['video_id']}.mp4"
+        shutil.copy2(video_path, saved_video_path)
+        if show_progress:
+            print(f"视频已保存到: {saved_video_path}")
+
+    return str(video_folder)
+
+
 def extract_text(share_link: str, api_key: Optional[str] = None, output_dir: Optional[str] = None,
-                 save_video: bool = False, show_progress: bool = True) -> dict:
+                 save_video: bool = False, show_progress: bool = True, use_cache: bool = True,
+                 audio_profile: Optional[str] = None) -> dict:
     """
     从视频中提取文案并保存到文件
 
+    参数:
+        use_cache: 是否读取文案缓存；为 False 时强制重新识别（结果仍会写回缓存）
+        audio_profile: 识别用音频的编码配置，默认读取 DOUYIN_AUDIO_PROFILE
+
     返回:
-        dict: 包含 video_info, text, output_path 的字典
+        dict: 包含 video_info, text, output_path, cached, audio_source 的字典
     """
     api_key = api_key or os.getenv('API_KEY')
     if not api_key:
         raise ValueError("未设置环境变量 API_KEY，请先获取硅基流动 API 密钥")
 
-    processor = DouyinProcessor(api_key)
+    processor = DouyinProcessor(api_key, audio_profile=audio_profile)
+    transcript_cache = get_transcript_cache()
 
     if show_progress:
         print("正在解析抖音分享链接...")
     video_info = processor.parse_share_url(share_link)
 
-    if show_progress:
-        print("正在下载视频...")
-    video_path = processor.download_video(video_info, show_progress=show_progress)
+    text_content = transcript_cache.get_by_video(video_info['video_id'], processor.model_key(video_info.get('duration'))) if use_cache else None
+    cached = text_content is not None
+    if cached and show_progress:
+        print("命中文案缓存，跳过语音识别")
 
-    if show_progress:
-        print("正在提取音频...")
-    audio_path = processor.extract_audio(video_path, show_progress=show_progress)
+    video_path = audio_path = None
+    if output_dir and save_video:
+        # 需要保存视频时才把视频下载到本地，否则直接流式提取音频
+        if show_progress:
+            print("正在下载视频...")
+        video_path = processor.download_video(video_info, show_progress=show_progress)
 
-    if show_progress:
-        print("正在从音频中提取文本...")
-    text_content = processor.extract_text_from_audio(audio_path, show_progress=show_progress)
+    if not cached:
+        audio_path, audio_info = processor.prepare_audio(video_info, video_path, show_progress=show_progress)
+
+        # 相同音频（如重新上传的视频）直接复用已有文案
+        audio_hash = audio_info['sha256']
+        text_content = transcript_cache.get_by_audio(audio_hash, processor.audio_model_key(audio_info)) if use_cache else None
+        cached = text_content is not None
+        if cached:
+            if show_progress:
+                print("音频内容与已识别的视频相同，复用已有文案")
+        else:
+            if show_progress:
+                print("正在从音频中提取文本...")
+            text_content = processor.extract_text_from_audio(
+                audio_path, show_progress=show_progress, audio_info=audio_info
+            )
+        transcript_cache.put(video_info['video_id'], processor.audio_model_key(audio_info), text_content, audio_hash=audio_hash)
 
     result = {
         "video_info": video_info,
         "text": text_content,
-        "output_path": None
+        "output_path": None,
+        "cached": cached,
+        # 本次下载识别用音频的来源和节省的字节数（未下载时为 None）
+        "audio_source": audio_info.get('source') if audio_path is not None else None
     }
 
     # 保存到文件
     if output_dir:
-        output_base = Path(output_dir)
-        video_folder = output_base / video_info['video_id']
-        video_folder.mkdir(parents=True, exist_ok=True)
-
-        # 保存文案为 Markdown 格式
-        transcript_path = video_folder / "transcript.md"
-        with open(transcript_path, 'w', encoding='utf-8') as f:
-            f.write(f"# {video_info['title']}\n\n")
-            f.write(f"| 属性 | 值 |\n")
-            f.write(f"|------|----|\n")
-            f.write(f"| 视频ID | `{video_info['video_id']}` |\n")
-            f.write(f"| 提取时间 | {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} |\n")
-            f.write(f"| 下载链接 | [点击下载]({video_info['url']}) |\n\n")
-            f.write(f"---\n\n")
-            f.write(f"## 文案内容\n\n")
-            f.write(text_content)
-
-        result["output_path"] = str(video_folder)
-
-        if show_progress:
-            print(f"文案已保存到: {transcript_path}")
-
-        # 保存视频 (可选)
-        if save_video:
-            saved_video_path = video_folder / f"{video_info['video_id']}.mp4"
-            shutil.copy2(video_path, saved_video_path)
-            if show_progress:
-                print(f"视频已保存到: {saved_video_path}")
+        result["output_path"] = save_transcript(
+            video_info, text_content, output_dir,
+            video_path=video_path if save_video else None, show_progress=show_progress
+        )
 
     # 清理临时文件
     if show_progress:
         print("正在清理临时文件...")
-    processor.cleanup_files(video_path, audio_path)
+    processor.cleanup_files(*[p for p in (video_path, audio_path) if p is not None])
 
     return result
 
 
+async def get_video_info_async(share_link: str) -> dict:
+    """get_video_info 的异步版本"""
+    processor = DouyinProcessor()
+    return await processor.parse_share_url_async(share_link)
+
+
+async def _transcribe_video_async(processor: DouyinProcessor, video_info: dict, video_path: Optional[Path] = None,
+                                  use_cache: bool = True) -> tuple:
+    """提取音频并识别（音频哈希命中文案缓存时跳过识别），返回 (文案, 是否命中缓存, 音频来源记录)"""
+    transcript_cache = get_transcript_cache()
+    audio_path, audio_info = await processor.prepare_audio_async(video_info, video_path)
+    try:
+        audio_hash = audio_info['sha256']
+        text = transcript_cache.get_by_audio(audio_hash, processor.audio_model_key(audio_info)) if use_cache else None
+        cached = text is not None
+        if not cached:
+            text = await processor.extract_text_from_audio_async(audio_path, audio_info=audio_info)
+        transcript_cache.put(video_info['video_id'], processor.audio_model_key(audio_info), text, audio_hash=audio_hash)
+        return text, cached, audio_info.get('source')
+    finally:
+        processor.cleanup_files(audio_path)
+
+
+async def extract_text_async(share_link: str, api_key: Optional[str] = None, output_dir: Optional[str] = None,
+                             save_video: bool = False, use_cache: bool = True,
+                             audio_profile: Optional[str] = None) -> dict:
+    """
+    extract_text 的异步版本：下载、ffmpeg 和语音识别都不阻塞事件循环
+
+    返回:
+        dict: 包含 video_info, text, output_path, cached, audio_source 的字典
+    """
+    api_key = api_key or os.getenv('API_KEY')
+    if not api_key:
+        raise ValueError("未设置环境变量 API_KEY，请先获取硅基流动 API 密钥")
+
+    processor = DouyinProcessor(api_key, audio_profile=audio_profile)
+    transcript_cache = get_transcript_cache()
+    video_info = await processor.parse_share_url_async(share_link)
+
+    text_content = transcript_cache.get_by_video(video_info['video_id'], processor.model_key(video_info.get('duration'))) if use_cache else None
+    cached = text_content is not None
+
+    video_path = source = None
+    try:
+        if output_dir and save_video:
+            video_path = await processor.download_video_async(video_info)
+
+        if not cached:
+            # 同一视频正在被其他请求提取时直接等待那次的结果
+            text_content, cached, source = await _extract_flight.do_async(
+                (video_info['video_id'], processor.model_key(video_info.get('duration')), processor.api_key),
+                _transcribe_video_async, processor, video_info, video_path, use_cache,
+            )
+
+        result = {
+            "video_info": video_info,
+            "text": text_content,
+            "output_path": None,
+            "cached": cached,
+            "audio_source": source
+        }
+        if output_dir:
+            result["output_path"] = await run_in_executor(
+                save_transcript, video_info, text_content, output_dir,
+                video_path=video_path if save_video else None, show_progress=False
+            )
+        return result
+    finally:
+        if video_path is not None:
+            processor.cleanup_files(video_path)
+
+
+async def extract_text_batch_async(share_texts: List[str], api_key: Optional[str] = None,
+                                   use_cache: bool = True) -> AsyncIterator[dict]:
+    """
+    批量提取文案，按完成顺序逐个返回结果
+
+    解析 → 下载并提取音频 → 语音识别 三个阶段流水线执行，每个阶段单独限制并发，
+    前面的视频在识别时后面的视频已经在下载。解析出相同 video_id 的链接只处理一次。
+
+    参数:
+        share_texts: 分享链接或分享文本列表（一条文本中有多个链接时逐个处理）
+
+    返回:
+        异步迭代器，每项为 {'index', 'share_link', 'success', 'video_info', 'text', 'cached', 'error'}，
+        index 为链接在展开后列表中的位置
+    """
+    api_key = api_key or os.getenv('API_KEY')
+    if not api_key:
+        raise ValueError("未设置环境变量 API_KEY，请先获取硅基流动 API 密钥")
+
+    processor = DouyinProcessor(api_key)
+    transcript_cache = get_transcript_cache()
+    resolve_limit = asyncio.Semaphore(BATCH_RESOLVE_CONCURRENCY)
+    audio_limit = asyncio.Semaphore(BATCH_AUDIO_CONCURRENCY)
+    asr_limit = asyncio.Semaphore(BATCH_ASR_CONCURRENCY)
+    videos = {}
+
+    async def transcribe(video_info: dict) -> tuple:
+        text = transcript_cache.get_by_video(video_info['video_id'], processor.model_key(video_info.get('duration'))) if use_cache else None
+        if text is not None:
+            return text, True
+
+        async with audio_limit:
+            audio_path, audio_info = await processor.prepare_audio_async(video_info)
+        try:
+            audio_hash = audio_info['sha256']
+            text = transcript_cache.get_by_audio(audio_hash, processor.audio_model_key(audio_info)) if use_cache else None
+            cached = text is not None
+            if not cached:
+                async with asr_limit:
+                    text = await processor.extract_text_from_audio_async(audio_path, audio_info=audio_info)
+            transcript_cache.put(video_info['video_id'], processor.audio_model_key(audio_info), text, audio_hash=audio_hash)
+            return text, cached
+        finally:
+            processor.cleanup_files(audio_path)
+
+    async def run(index: int, share_link: str) -> dict:
+        result = {"index": index, "share_link": share_link, "success": False,
+                  "video_info": None, "text": "", "cached": False, "error": ""}
+        try:
+            async with resolve_limit:
+                video_info = await processor.parse_share_url_async(share_link)
+            result["video_info"] = video_info
+            task = videos.get(video_info['video_id'])
+            if task is None:
+                # 批次内按 video_id 去重；与其他请求同时提取同一视频时也只识别一次
+                task = videos[video_info['video_id']] = asyncio.ensure_future(_extract_flight.do_async(
+                    (video_info['video_id'], processor.model_key(video_info.get('duration')), processor.api_key), transcribe, video_info))
+            result["text"], result["cached"] = await asyncio.shield(task)
+            result["success"] = True
+        except Exception as e:
+            result["error"] = str(e)
+        return result
+
+    tasks = [asyncio.ensure_future(run(i, link)) for i, link in enumerate(extract_share_urls(share_texts))]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        for task in [*tasks, *videos.values()]:
+            task.cancel()
+        await asyncio.gather(*tasks, *videos.values(), return_exceptions=True)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="抖音无水印视频下载和文案提取工具",
@@ -424,7 +1106,7 @@ def main():
   # 获取视频信息和下载链接
   python douyin_downloader.py --link "抖音分享链接" --action info
 
-  # 下载视频
+  # 下载视频（图集作品下载全部图片到 ./videos/<作品ID>/）
   python douyin_downloader.py --link "抖音分享链接" --action download --output ./videos
 
   # 提取文案并保存到文件 (需要设置 DOUYIN_API_KEY 环境变量)
@@ -432,16 +1114,22 @@ def main():
 
   # 提取文案并同时保存视频
   python douyin_downloader.py --link "抖音分享链接" --action extract --output ./output --save-video
+
+  # 忽略文案缓存，强制重新识别
+  python douyin_downloader.py --link "抖音分享链接" --action extract --output ./output --no-cache
         """
     )
 
     parser.add_argument("--link", "-l", required=True, help="抖音分享链接或包含链接的文本")
     parser.add_argument("--action", "-a", choices=["info", "download", "extract"],
-                        default="info", help="操作类型: info(获取信息), download(下载视频), extract(提取文案)")
+                        default="info", help="操作类型: info(获取信息), download(下载视频或图集), extract(提取文案)")
     parser.add_argument("--output", "-o", default="./output", help="输出目录 (默认 ./output)")
     parser.add_argument("--api-key", "-k", help="硅基流动 API 密钥 (也可通过 DOUYIN_API_KEY 环境变量设置)")
     parser.add_argument("--save-video", "-v", action="store_true", help="提取文案时同时保存视频")
     parser.add_argument("--quiet", "-q", action="store_true", help="安静模式，减少输出")
+    parser.add_argument("--no-cache", action="store_true", help="忽略文案缓存，强制重新识别")
+    parser.add_argument("--audio-profile", choices=list(AUDIO_PROFILES),
+                        help="识别用音频的编码配置 (默认 mp3-16k，也可通过 DOUYIN_AUDIO_PROFILE 环境变量设置)")
 
     args = parser.parse_args()
 
@@ -453,12 +1141,21 @@ def main():
             print("=" * 50)
             print(f"视频ID: {info['video_id']}")
             print(f"标题: {info['title']}")
-            print(f"下载链接: {info['url']}")
+            if info.get('images'):
+                print(f"图集: {len(info['images'])} 张图片")
+            else:
+                print(f"下载链接: {info['url']}")
             print("=" * 50)
 
         elif args.action == "download":
-            video_path = download_video(args.link, args.output)
-            print(f"\n视频已保存到: {video_path}")
+            processor = DouyinProcessor()
+            video_info = processor.parse_share_url(args.link)
+            if video_info.get('images'):
+                paths = processor.download_images(video_info, Path(args.output))
+                print(f"\n图集已保存到: {paths[0].parent}（{len(paths)} 张）")
+            else:
+                video_path = processor.download_video(video_info, Path(args.output))
+                print(f"\n视频已保存到: {video_path}")
 
         elif args.action == "extract":
             result = extract_text(
@@ -466,7 +1163,9 @@ def main():
                 args.api_key,
                 output_dir=args.output,
                 save_video=args.save_video,
-                show_progress=not args.quiet
+                show_progress=not args.quiet,
+                use_cache=not args.no_cache,
+                audio_profile=args.audio_profile
             )
 
             if not args.quiet:
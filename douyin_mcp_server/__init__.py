@@ -4,6 +4,11 @@ __version__ = "1.3.0"
 __author__ = "yzfly"
 __email__ = "yz.liu.me@gmail.com"
 
-from .server import main
+
+def main():
+    """启动MCP服务器（延迟导入，使 WebUI 和命令行工具可以单独使用共享模块）"""
+    from .server import main as _main
+    _main()
+
 
 __all__ = ["main"]
\ No newline at end of file
@@ -0,0 +1,466 @@
+"""
+语音识别后端
+
+MCP Server、WebUI 和命令行工具共用的识别接口：
+- submit: 提交识别任务（本地音频文件或可公开访问的地址），返回任务句柄
+- poll: 查询任务，完成时返回结果，未完成时返回 None
+- transcribe / transcribe_async: 提交后按指数退避轮询直到完成，超过 DOUYIN_ASR_WAIT_TIMEOUT 时抛出 TimeoutError；
+  异步版本可传入进度回调，等待被取消或超时时会尝试取消服务端任务
+
+识别结果: {'text': 全文, 'segments': [{'start': 秒, 'end': 秒, 'text': 句子}, ...]}
+
+内置后端:
+- dashscope: 阿里云百炼录音文件识别，只接受地址（可直接识别视频 CDN 链接）
+- openai: 任意 OpenAI 兼容的 /audio/transcriptions 接口（默认硅基流动）
+- local: 本地 faster-whisper 模型（需 pip install faster-whisper），没有网络往返和按次计费
+
+环境变量:
+- DOUYIN_ASR_TIMEOUT: 识别请求读超时（秒），默认 600
+- DOUYIN_ASR_WAIT_TIMEOUT: 提交后等待识别完成的总时长上限（秒），默认 3600
+- DASHSCOPE_HTTP_BASE_URL: 百炼接口地址，默认 https://dashscope.aliyuncs.com/api/v1
+- DOUYIN_ASR_LOCAL_MAX_DURATION: 不超过该时长（秒）的音频改用本地模型识别，默认 0（不启用）
+- DOUYIN_LOCAL_ASR_MODEL: 本地模型，默认 small
+- DOUYIN_LOCAL_ASR_DEVICE: 本地模型运行设备，默认 cpu
+- DOUYIN_LOCAL_ASR_COMPUTE_TYPE: 本地模型计算精度，默认 int8
+"""
+
+import abc
+import asyncio
+import importlib.util
+import os
+import threading
+import time
+from http import HTTPStatus
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from .audio import AUDIO_PROFILES
+from .http_client import _env_float, get_client, get_async_client
+from .ratelimit import get_rate_limiter, provider_key
+
+# 识别请求需要等待服务端识别完成，读超时单独放宽
+ASR_TIMEOUT = float(os.getenv("DOUYIN_ASR_TIMEOUT", "600"))
+# 轮询等待识别完成的总时长上限，服务端任务一直不结束时不会无限等待
+ASR_WAIT_TIMEOUT = _env_float("DOUYIN_ASR_WAIT_TIMEOUT", 3600)
+
+DEFAULT_OPENAI_BASE_URL = "https://api.siliconflow.cn/v1/audio/transcriptions"
+DEFAULT_OPENAI_MODEL = "FunAudioLLM/SenseVoiceSmall"
+DEFAULT_DASHSCOPE_MODEL = "paraformer-v2"
+
+# 等待期间的进度回调，参数为已等待的秒数
+ProgressCallback = Callable[[float], Awaitable[None]]
+
+# 取消服务端任务的后台任务（被取消的协程里无法再等待网络请求）
+_cancel_tasks: set = set()
+
+
+def _mime_type(path: Path) -> str:
+    for profile in AUDIO_PROFILES.values():
+        if profile.suffix == path.suffix:
+            return profile.mime_type
+    return "application/octet-stream"
+
+
+class ASRBackend(abc.ABC):
+    """识别后端基类，子类实现 submit 和 poll"""
+
+    name = ""
+    # 能否识别本地音频文件 / 远程地址
+    accepts_file = True
+    accepts_url = False
+    # 轮询间隔（秒），每次翻倍直到上限
+    poll_interval = 1.0
+    max_poll_interval = 10.0
+
+    @property
+    def model_key(self) -> str:
+        """区分识别结果的模型标识（用于文案缓存）"""
+        return self.name
+
+    @abc.abstractmethod
+    def submit(self, source):
+        """提交识别任务，返回任务句柄"""
+
+    @abc.abstractmethod
+    def poll(self, job) -> Optional[dict]:
+        """查询任务，完成时返回结果，未完成时返回 None"""
+
+    async def submit_async(self, source):
+        return await asyncio.to_thread(self.submit, source)
+
+    async def poll_async(self, job) -> Optional[dict]:
+        return await asyncio.to_thread(self.poll, job)
+
+    async def cancel_async(self, job) -> None:
+        """取消服务端任务（不支持时忽略）"""
+
+    @staticmethod
+    def _timeout_error(timeout: float) -> TimeoutError:
+        return TimeoutError(f"识别任务超过 {timeout:.0f} 秒仍未完成")
+
+    def wait(self, job, poll=None, timeout: Optional[float] = None):
+        """轮询任务直到完成，超过 timeout 秒（默认 ASR_WAIT_TIMEOUT）仍未完成时抛出 TimeoutError"""
+        poll = poll or self.poll
+        timeout = ASR_WAIT_TIMEOUT if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        delay = self.poll_interval
+        while True:
+            result = poll(job)
+            if result is not None:
+                return result
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise self._timeout_error(timeout)
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, self.max_poll_interval)
+
+    async def wait_async(self, job, poll=None, progress: Optional[ProgressCallback] = None,
+                         timeout: Optional[float] = None):
+        """
+        wait 的异步版本，等待期间不阻塞事件循环
+
+        参数:
+        - poll: 轮询协程，默认 poll_async
+        - progress: 每次轮询仍未完成时调用，参数为已等待的秒数
+        - timeout: 等待的总时长上限（秒），默认 ASR_WAIT_TIMEOUT；超时后取消服务端任务并抛出 TimeoutError
+        """
+        poll = poll or self.poll_async
+        timeout = ASR_WAIT_TIMEOUT if timeout is None else timeout
+        started = time.monotonic()
+        delay = self.poll_interval
+        try:
+            while True:
+                result = await poll(job)
+                if result is not None:
+                    return result
+                elapsed = time.monotonic() - started
+                if elapsed >= timeout:
+                    self._cancel_in_background(job)
+                    raise self._timeout_error(timeout)
+                if progress is not None:
+                    await progress(elapsed)
+                await asyncio.sleep(min(delay, timeout - elapsed))
+                delay = min(delay * 2, self.max_poll_interval)
+        except asyncio.CancelledError:
+            self._cancel_in_background(job)
+            raise
+
+    def _cancel_in_background(self, job) -> None:
+        task = asyncio.get_running_loop().create_task(self.cancel_async(job))
+        _cancel_tasks.add(task)
+        task.add_done_callback(_cancel_tasks.discard)
+
+    def transcribe(self, source) -> dict:
+        """提交识别任务并等待结果"""
+        return self.wait(self.submit(source))
+
+    async def transcribe_async(self, source, progress: Optional[ProgressCallback] = None) -> dict:
+        """transcribe 的异步版本"""
+        return await self.wait_async(await self.submit_async(source), progress=progress)
+
+
+class OpenAICompatibleBackend(ASRBackend):
+    """OpenAI 兼容的 /audio/transcriptions 接口，请求返回即为结果"""
+
+    name = "openai"
+
+    def __init__(self, api_key: str, model: Optional[str] = None, base_url: Optional[str] = None):
+        self.api_key = api_key
+        self.model = model or DEFAULT_OPENAI_MODEL
+        self.base_url = base_url or DEFAULT_OPENAI_BASE_URL
+
+    @property
+    def model_key(self) -> str:
+        return self.model
+
+    def _request_kwargs(self, audio_path: Path, f) -> dict:
+        return {
+            "files": {"file": (audio_path.name, f, _mime_type(audio_path))},
+            "data": {"model": self.model},
+            "headers": {"Authorization": f"Bearer {self.api_key}"},
+            "timeout": httpx.Timeout(ASR_TIMEOUT, connect=10.0),
+        }
+
+    @staticmethod
+    def _parse(response: httpx.Response) -> dict:
+        response.raise_for_status()
+        result = response.json()
+        if "text" not in result:
+            return {"text": response.text, "segments": []}
+        segments = [
+            {"start": segment.get("start"), "end": segment.get("end"), "text": segment.get("text", "")}
+            for segment in result.get("segments") or []
+        ]
+        return {"text": result["text"], "segments": segments}
+
+    def submit(self, source) -> dict:
+        audio_path = Path(source)
+        limiter = get_rate_limiter(provider_key(self.base_url))
+        if limiter is not None:
+            limiter.acquire()
+        with open(audio_path, "rb") as f:
+            response = get_client().post(self.base_url, **self._request_kwargs(audio_path, f))
+        return self._parse(response)
+
+    async def submit_async(self, source) -> dict:
+        audio_path = Path(source)
+        limiter = get_rate_limiter(provider_key(self.base_url))
+        if limiter is not None:
+            await limiter.acquire_async()
+        with open(audio_path, "rb") as f:
+            response = await get_async_client().post(self.base_url, **self._request_kwargs(audio_path, f))
+        return self._parse(response)
+
+    def poll(self, job: dict) -> dict:
+        return job
+
+    async def poll_async(self, job: dict) -> dict:
+        return job
+
+
+def dashscope_base_url() -> str:
+    return os.getenv("DASHSCOPE_HTTP_BASE_URL", "https://dashscope.aliyuncs.com/api/v1").rstrip("/")
+
+
+class DashScopeBackend(ASRBackend):
+    """
+    阿里云百炼录音文件识别（异步任务：提交地址后轮询结果）
+
+    直接调用 REST 接口并复用共享连接池，轮询和下载结果都不占用线程。
+    一个任务可以包含多个地址，结果按提交顺序返回，单个地址失败不影响其他地址。
+    """
+
+    name = "dashscope"
+    accepts_file = False
+    accepts_url = True
+
+    def __init__(self, api_key: str, model: Optional[str] = None, language_hints: Optional[list] = None):
+        self.api_key = api_key
+        self.model = model or DEFAULT_DASHSCOPE_MODEL
+        self.language_hints = language_hints
+
+    @property
+    def model_key(self) -> str:
+        return self.model
+
+    def _headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    def _submit_request(self, file_urls: list) -> dict:
+        payload = {"model": self.model, "input": {"file_urls": [str(url) for url in file_urls]}}
+        if self.language_hints:
+            payload["parameters"] = {"language_hints": self.language_hints}
+        return {
+            "url": f"{dashscope_base_url()}/services/audio/asr/transcription",
+            "json": payload,
+            "headers": {**self._headers(), "X-DashScope-Async": "enable"},
+        }
+
+    @staticmethod
+    def _check(response: httpx.Response, action: str) -> dict:
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        if response.status_code != HTTPStatus.OK:
+            raise Exception(f"{action}: {body.get('message') or response.status_code}")
+        return body
+
+    def _task_url(self, job: dict) -> str:
+        return f"{dashscope_base_url()}/tasks/{job['task_id']}"
+
+    @staticmethod
+    def _task_output(body: dict) -> Optional[dict]:
+        """返回已完成任务的 output，未完成时返回 None"""
+        output = body.get("output", {})
+        status = output.get("task_status")
+        if status in ("PENDING", "RUNNING"):
+            return None
+        if status != "SUCCEEDED":
+            raise Exception(f"转录失败: {output.get('message', status)}")
+        return output
+
+    @staticmethod
+    def _parse_transcription(data: dict) -> dict:
+        """解析单个文件的识别结果（多声道时取第一个声道）"""
+        if not data.get("transcripts"):
+            return {"text": "未识别到文本内容", "segments": []}
+        transcript = data["transcripts"][0]
+        segments = [
+            {"start": sentence["begin_time"] / 1000, "end": sentence["end_time"] / 1000, "text": sentence["text"]}
+            for sentence in transcript.get("sentences", [])
+        ]
+        return {"text": transcript["text"], "segments": segments}
+
+    @staticmethod
+    def _order_results(job: dict, output: dict) -> list:
+        """按提交顺序排列各地址的子任务结果（返回的地址与提交的不一致时按出现顺序对应）"""
+        items = list(output.get("results", []))
+        ordered = []
+        for url in job["file_urls"]:
+            matched = next((item for item in items if item.get("file_url") == url), None)
+            if matched is not None:
+                items.remove(matched)
+            ordered.append(matched)
+        return [item if item is not None else (items.pop(0) if items else None) for item in ordered]
+
+    def submit(self, source) -> dict:
+        return self.submit_many([source])
+
+    def submit_many(self, file_urls: list) -> dict:
+        """提交多个地址，返回任务句柄"""
+        request = self._submit_request(file_urls)
+        body = self._check(get_client().post(**request), "提交识别任务失败")
+        return {"task_id": body["output"]["task_id"], "file_urls": request["json"]["input"]["file_urls"]}
+
+    async def submit_async(self, source) -> dict:
+        return await self.submit_many_async([source])
+
+    async def submit_many_async(self, file_urls: list) -> dict:
+        request = self._submit_request(file_urls)
+        body = self._check(await get_async_client().post(**request), "提交识别任务失败")
+        return {"task_id": body["output"]["task_id"], "file_urls": request["json"]["input"]["file_urls"]}
+
+    def poll_many(self, job: dict) -> Optional[list]:
+        """查询任务，完成时按提交顺序返回每个地址的结果（失败的地址为 Exception）"""
+        body = self._check(get_client().get(self._task_url(job), headers=self._headers()), "查询识别任务失败")
+        output = self._task_output(body)
+        if output is None:
+            return None
+        results = []
+        for item in self._order_results(job, output):
+            if item is None or item.get("subtask_status") != "SUCCEEDED":
+                results.append(Exception(f"转录失败: {(item or {}).get('message', '没有返回结果')}"))
+                continue
+            data = get_client().get(item["transcription_url"]).json()
+            results.append(self._parse_transcription(data))
+        return results
+
+    async def poll_many_async(self, job: dict) -> Optional[list]:
+        """poll_many 的异步版本，各地址的结果并发下载"""
+        client = get_async_client()
+        body = self._check(await client.get(self._task_url(job), headers=self._headers()), "查询识别任务失败")
+        output = self._task_output(body)
+        if output is None:
+            return None
+
+        async def load(item: Optional[dict]):
+            if item is None or item.get("subtask_status") != "SUCCEEDED":
+                return Exception(f"转录失败: {(item or {}).get('message', '没有返回结果')}")
+            response = await client.get(item["transcription_url"])
+            response.raise_for_status()
+            return self._parse_transcription(response.json())
+
+        return await asyncio.gather(*(load(item) for item in self._order_results(job, output)))
+
+    def poll(self, job: dict) -> Optional[dict]:
+        results = self.poll_many(job)
+        return None if results is None else self._first(results)
+
+    async def poll_async(self, job: dict) -> Optional[dict]:
+        results = await self.poll_many_async(job)
+        return None if results is None else self._first(results)
+
+    @staticmethod
+    def _first(results: list) -> dict:
+        if isinstance(results[0], Exception):
+            raise results[0]
+        return results[0]
+
+    async def cancel_async(self, job: dict) -> None:
+        """取消排队中的任务（已开始识别的任务服务端会忽略）"""
+        try:
+            await get_async_client().post(f"{self._task_url(job)}/cancel", headers=self._headers())
+        except httpx.HTTPError:
+            pass
+
+    async def transcribe_many_async(self, file_urls: list, progress: Optional[ProgressCallback] = None) -> list:
+        """在一个任务中识别多个地址，按顺序返回结果（失败的地址为 Exception）"""
+        job = await self.submit_many_async(file_urls)
+        return await self.wait_async(job, poll=self.poll_many_async, progress=progress)
+
+
+_local_models: dict = {}
+_local_lock = threading.Lock()
+
+
+def local_asr_available() -> bool:
+    """是否安装了本地识别引擎"""
+    return importlib.util.find_spec("faster_whisper") is not None
+
+
+class LocalWhisperBackend(ASRBackend):
+    """本地 faster-whisper 模型，CPU 上运行，识别在线程中同步完成"""
+
+    name = "local"
+
+    def __init__(self, model_size: Optional[str] = None, device: Optional[str] = None,
+                 compute_type: Optional[str] = None):
+        self.model_size = model_size or os.getenv("DOUYIN_LOCAL_ASR_MODEL", "small")
+        self.device = device or os.getenv("DOUYIN_LOCAL_ASR_DEVICE", "cpu")
+        self.compute_type = compute_type or os.getenv("DOUYIN_LOCAL_ASR_COMPUTE_TYPE", "int8")
+
+    @property
+    def model_key(self) -> str:
+        return f"faster-whisper/{self.model_size}"
+
+    def _model(self):
+        key = (self.model_size, self.device, self.compute_type)
+        with _local_lock:
+            model = _local_models.get(key)
+            if model is None:
+                try:
+                    from faster_whisper import WhisperModel
+                except ImportError:
+                    raise ImportError("本地识别需要安装 faster-whisper: pip install faster-whisper")
+                model = _local_models[key] = WhisperModel(
+                    self.model_size, device=self.device, compute_type=self.compute_type
+                )
+            return model
+
+    def submit(self, source) -> dict:
+        model = self._model()
+        segments, _ = model.transcribe(str(source), vad_filter=True)
+        segments = list(segments)
+        # 英文等语言的片段自带前导空格，直接拼接即可
+        return {
+            "text": "".join(segment.text for segment in segments).strip(),
+            "segments": [
+                {"start": segment.start, "end": segment.end, "text": segment.text.strip()}
+                for segment in segments
+            ],
+        }
+
+    def poll(self, job: dict) -> dict:
+        return job
+
+    async def poll_async(self, job: dict) -> dict:
+        return job
+
+
+_local_backend: Optional[LocalWhisperBackend] = None
+
+
+def local_max_duration() -> float:
+    try:
+        return float(os.getenv("DOUYIN_ASR_LOCAL_MAX_DURATION", "0"))
+    except ValueError:
+        return 0.0
+
+
+def select_backend(default: ASRBackend, duration: Optional[float] = None) -> ASRBackend:
+    """
+    按音频时长选择识别后端
+
+    启用了本地识别（DOUYIN_ASR_LOCAL_MAX_DURATION > 0 且已安装 faster-whisper）时，
+    不超过该时长的短音频交给本地模型，其余仍使用 default。
+    """
+    global _local_backend
+    max_duration = local_max_duration()
+    if not duration or max_duration <= 0 or duration > max_duration or not local_asr_available():
+        return default
+    if _local_backend is None:
+        _local_backend = LocalWhisperBackend()
+    return _local_backend
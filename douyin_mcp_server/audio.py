@@ -0,0 +1,379 @@
+"""
+音频处理（ffmpeg）
+
+ASR 音频配置：语音识别服务内部都会重采样到 16kHz 单声道，
+默认直接输出 16kHz 单声道低码率音频，编码和上传都比最高质量 VBR MP3 小得多。
+可通过环境变量 DOUYIN_AUDIO_PROFILE 选择：
+- mp3-16k: 16kHz 单声道 32kbps MP3（默认，各识别服务都支持）
+- opus: 16kHz 单声道 24kbps Opus/Ogg（体积最小）
+- flac: 16kHz 单声道 FLAC（无损，适合本地识别）
+- wav: 16kHz 单声道 16bit PCM（无需解码，适合本地识别）
+- mp3-hq: 原始声道和采样率的最高质量 VBR MP3（旧行为）
+
+流式转码：视频字节流直接写入 ffmpeg 的 stdin，音频从 stdout 读出写入文件，
+视频本身不落盘，下载和编码同时进行。输出音频时顺带计算时长、大小和内容哈希，
+后续的识别和文案缓存无需再次 ffprobe 或读取文件。
+
+分段：转码时用 silencedetect 顺带记录静音区间，超长音频按目标时长在附近的静音处切分，
+由一个 ffmpeg 进程以 segment 封装器直接复制音频流输出所有片段，不再逐段重新解码。
+- DOUYIN_SILENCE_NOISE: 静音判定阈值，默认 -30dB
+- DOUYIN_SILENCE_MIN_DURATION: 最短静音时长（秒），默认 0.3
+"""
+
+import asyncio
+import bisect
+import hashlib
+import os
+import re
+import subprocess
+import threading
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, NamedTuple, Optional
+
+import ffmpeg
+
+from .http_client import _env_float
+
+# ffmpeg 进度日志中的输出时间，如 time=00:01:23.45
+_TIME_PATTERN = re.compile(rb"time=(\d+):(\d+):(\d+(?:\.\d+)?)")
+# silencedetect 日志，如 silence_start: 12.3 / silence_end: 13.1 | silence_duration: 0.8
+_SILENCE_PATTERN = re.compile(rb"silence_(start|end): (-?\d+(?:\.\d+)?)")
+
+SILENCE_NOISE = os.getenv('DOUYIN_SILENCE_NOISE', '-30dB')
+SILENCE_MIN_DURATION = _env_float('DOUYIN_SILENCE_MIN_DURATION', 0.3)
+
+READ_CHUNK_SIZE = 65536
+
+
+class AudioProfile(NamedTuple):
+    """音频输出配置"""
+    name: str
+    suffix: str
+    mime_type: str
+    format: str
+    output_args: dict
+
+
+_ASR_ARGS = {'ar': 16000, 'ac': 1}
+
+AUDIO_PROFILES = {
+    profile.name: profile
+    for profile in (
+        AudioProfile('mp3-16k', '.mp3', 'audio/mpeg', 'mp3', {'acodec': 'libmp3lame', 'b:a': '32k', **_ASR_ARGS}),
+        AudioProfile('opus', '.ogg', 'audio/ogg', 'ogg', {'acodec': 'libopus', 'b:a': '24k', 'application': 'voip', **_ASR_ARGS}),
+        AudioProfile('flac', '.flac', 'audio/flac', 'flac', {'acodec': 'flac', **_ASR_ARGS}),
+        AudioProfile('wav', '.wav', 'audio/wav', 'wav', {'acodec': 'pcm_s16le', **_ASR_ARGS}),
+        AudioProfile('mp3-hq', '.mp3', 'audio/mpeg', 'mp3', {'acodec': 'libmp3lame', 'q': 0}),
+    )
+}
+DEFAULT_AUDIO_PROFILE = 'mp3-16k'
+
+
+def get_audio_profile(name: Optional[str] = None) -> AudioProfile:
+    """按名称获取音频配置，未指定时读取环境变量 DOUYIN_AUDIO_PROFILE"""
+    name = name or os.getenv('DOUYIN_AUDIO_PROFILE', DEFAULT_AUDIO_PROFILE)
+    if name not in AUDIO_PROFILES:
+        raise ValueError(f"未知的音频配置: {name}，可选: {', '.join(AUDIO_PROFILES)}")
+    return AUDIO_PROFILES[name]
+
+
+def encode_audio(stream, output: str, profile: AudioProfile, detect_silence: bool = False):
+    """
+    为 ffmpeg-python 输入流追加按配置编码的纯音频输出
+
+    参数:
+    - detect_silence: 同时运行 silencedetect，静音区间输出到 stderr（见 parse_silences）
+    """
+    if detect_silence:
+        stream = stream.audio.filter('silencedetect', noise=SILENCE_NOISE, d=SILENCE_MIN_DURATION)
+    return stream.output(output, format=profile.format, vn=None, **profile.output_args)
+
+
+def parse_ffmpeg_duration(stderr: bytes) -> float:
+    """从 ffmpeg 日志中取最后一次进度输出的时间（秒），取不到时返回 0"""
+    matches = _TIME_PATTERN.findall(stderr or b"")
+    if not matches:
+        return 0.0
+    hours, minutes, seconds = matches[-1]
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def parse_silences(stderr: bytes) -> list:
+    """从 silencedetect 日志中解析静音区间 [(开始, 结束), ...]（秒）"""
+    silences = []
+    start = None
+    for kind, value in _SILENCE_PATTERN.findall(stderr or b""):
+        if kind == b'start':
+            start = max(0.0, float(value))
+        elif start is not None:
+            silences.append((start, float(value)))
+            start = None
+    return silences
+
+
+def plan_split_points(duration: float, segment_duration: float, silences: list,
+                      search_window: Optional[float] = None) -> list:
+    """
+    计算分段切分点（秒）
+
+    每个片段不超过 segment_duration；在目标切分点之前 search_window 秒内
+    取最靠后的静音中点切分，找不到静音时按固定时长切分。
+    """
+    if search_window is None:
+        search_window = min(60.0, segment_duration / 4)
+    midpoints = sorted((start + end) / 2 for start, end in silences)
+
+    points = []
+    last = 0.0
+    while duration - last > segment_duration:
+        target = last + segment_duration
+        index = bisect.bisect_right(midpoints, target)
+        if index and midpoints[index - 1] > max(last, target - search_window):
+            point = midpoints[index - 1]
+        else:
+            point = target
+        points.append(point)
+        last = point
+    return points
+
+
+def detect_silences_command(audio_path: Path) -> list:
+    """只做静音检测、不输出文件的 ffmpeg 命令"""
+    return (
+        ffmpeg
+        .input(str(audio_path))
+        .filter('silencedetect', noise=SILENCE_NOISE, d=SILENCE_MIN_DURATION)
+        .output('-', format='null')
+        .compile()
+    )
+
+
+def detect_silences(audio_path: Path) -> list:
+    """检测音频文件中的静音区间（没有转码时记录的静音信息时使用）"""
+    proc = subprocess.run(detect_silences_command(audio_path), capture_output=True)
+    if proc.returncode != 0:
+        raise ffmpeg.Error('ffmpeg', proc.stdout, proc.stderr)
+    return parse_silences(proc.stderr)
+
+
+async def detect_silences_async(audio_path: Path) -> list:
+    """detect_silences 的异步版本"""
+    proc = await asyncio.create_subprocess_exec(
+        *detect_silences_command(audio_path),
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await proc.communicate()
+    except asyncio.CancelledError:
+        proc.kill()
+        await proc.wait()
+        raise
+    if proc.returncode != 0:
+        raise ffmpeg.Error('ffmpeg', None, stderr)
+    return parse_silences(stderr)
+
+
+def segment_command(audio_path: Path, output_dir: Path, split_points: list, profile: AudioProfile) -> list:
+    """
+    单次分段的 ffmpeg 命令：按切分点输出全部片段，完成一个片段就把文件名写到 stdout
+
+    输入已经是该配置的格式时直接复制音频流，否则在同一进程中按配置重新编码。
+    """
+    if Path(audio_path).suffix == profile.suffix:
+        codec_args = {'acodec': 'copy'}
+    else:
+        codec_args = profile.output_args
+    return (
+        ffmpeg
+        .input(str(audio_path))
+        .output(
+            str(Path(output_dir) / f"{Path(audio_path).stem}_segment_%03d{profile.suffix}"),
+            format='segment',
+            segment_format=profile.format,
+            segment_times=','.join(f"{point:.3f}" for point in split_points),
+            segment_list='pipe:1',
+            segment_list_type='flat',
+            reset_timestamps=1,
+            vn=None,
+            **codec_args,
+        )
+        .compile(overwrite_output=True)
+    )
+
+
+def iter_segments(audio_path: Path, output_dir: Path, split_points: list, profile: AudioProfile) -> Iterator[Path]:
+    """
+    分割音频并逐个返回片段路径
+
+    片段写完即返回，调用方可以在后续片段仍在输出时开始识别；
+    提前停止迭代时结束 ffmpeg 进程。
+    """
+    if not split_points:
+        yield Path(audio_path)
+        return
+
+    proc = subprocess.Popen(
+        segment_command(audio_path, output_dir, split_points, profile),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    stderr_output = []
+    stderr_thread = threading.Thread(target=lambda: stderr_output.append(proc.stderr.read()), daemon=True)
+    stderr_thread.start()
+    finished = False
+    try:
+        for line in proc.stdout:
+            name = line.decode('utf-8').strip()
+            if name:
+                yield Path(output_dir) / name
+        finished = True
+    finally:
+        if not finished:
+            proc.kill()
+        stderr_thread.join()
+        proc.wait()
+    if proc.returncode != 0:
+        raise ffmpeg.Error('ffmpeg', None, stderr_output[0] if stderr_output else b'')
+
+
+async def iter_segments_async(audio_path: Path, output_dir: Path, split_points: list,
+                              profile: AudioProfile) -> AsyncIterator[Path]:
+    """iter_segments 的异步版本"""
+    if not split_points:
+        yield Path(audio_path)
+        return
+
+    proc = await asyncio.create_subprocess_exec(
+        *segment_command(audio_path, output_dir, split_points, profile),
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    stderr_task = asyncio.ensure_future(proc.stderr.read())
+    finished = False
+    try:
+        async for line in proc.stdout:
+            name = line.decode('utf-8').strip()
+            if name:
+                yield Path(output_dir) / name
+        finished = True
+    finally:
+        if not finished and proc.returncode is None:
+            proc.kill()
+        stderr = await stderr_task
+        await proc.wait()
+    if proc.returncode != 0:
+        raise ffmpeg.Error('ffmpeg', None, stderr)
+
+
+def stream_audio_command(profile: AudioProfile) -> list:
+    """从 stdin 读取视频、向 stdout 输出音频的 ffmpeg 命令（同时检测静音）"""
+    return encode_audio(ffmpeg.input('pipe:0'), 'pipe:1', profile, detect_silence=True).compile()
+
+
+def transcode_stream(chunks: Iterable[bytes], output_path: Path, profile: Optional[AudioProfile] = None) -> dict:
+    """
+    把视频字节流转码为音频文件
+
+    参数:
+    - chunks: 视频数据块（如 HTTP 响应体）
+    - output_path: 音频输出路径
+    - profile: 音频配置，默认读取 DOUYIN_AUDIO_PROFILE
+
+    返回:
+    - {'duration': 秒, 'size': 字节数, 'sha256': 音频内容哈希, 'silences': 静音区间}
+    """
+    proc = subprocess.Popen(
+        stream_audio_command(profile or get_audio_profile()), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    feed_errors = []
+    stderr_output = []
+
+    def feed():
+        try:
+            for chunk in chunks:
+                proc.stdin.write(chunk)
+        except BrokenPipeError:
+            # ffmpeg 提前退出，错误信息以 stderr 为准
+            pass
+        except Exception as e:
+            feed_errors.append(e)
+        finally:
+            try:
+                proc.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    def read_stderr():
+        stderr_output.append(proc.stderr.read())
+
+    threads = [threading.Thread(target=feed, daemon=True), threading.Thread(target=read_stderr, daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(output_path, 'wb') as f:
+            for chunk in iter(lambda: proc.stdout.read(READ_CHUNK_SIZE), b''):
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+    except BaseException:
+        proc.kill()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+        proc.wait()
+
+    stderr = stderr_output[0] if stderr_output else b''
+    if feed_errors:
+        raise feed_errors[0]
+    duration = parse_ffmpeg_duration(stderr)
+    if proc.returncode != 0 or duration <= 0:
+        # moov 位于文件尾的 MP4 无法从管道解析，ffmpeg 此时以 0 退出但只输出空文件头
+        raise ffmpeg.Error('ffmpeg', None, stderr)
+    return {'duration': duration, 'size': size, 'sha256': digest.hexdigest(), 'silences': parse_silences(stderr)}
+
+
+async def transcode_stream_async(chunks: AsyncIterable[bytes], output_path: Path,
+                                 profile: Optional[AudioProfile] = None) -> dict:
+    """transcode_stream 的异步版本，写入 stdin 时遵循管道背压"""
+    proc = await asyncio.create_subprocess_exec(
+        *stream_audio_command(profile or get_audio_profile()),
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    digest = hashlib.sha256()
+    size = 0
+
+    async def feed():
+        try:
+            async for chunk in chunks:
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            proc.stdin.close()
+
+    async def drain_output():
+        nonlocal size
+        with open(output_path, 'wb') as f:
+            while True:
+                chunk = await proc.stdout.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+
+    try:
+        _, stderr, _ = await asyncio.gather(feed(), proc.stderr.read(), drain_output())
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+
+    duration = parse_ffmpeg_duration(stderr)
+    if await proc.wait() != 0 or duration <= 0:
+        raise ffmpeg.Error('ffmpeg', None, stderr)
+    return {'duration': duration, 'size': size, 'sha256': digest.hexdigest(), 'silences': parse_silences(stderr)}
@@ -0,0 +1,792 @@
+"""
+持久化缓存
+
+视频解析缓存分两层缓存分享链接的解析结果，存放在 SQLite 中，进程重启后仍然有效：
+1. 分享短链 -> video_id（短链长期稳定，TTL 较长）
+2. video_id -> 解析出的视频信息（播放地址带签名会过期，TTL 较短）
+
+两层都按 TTL 过期，并按最近访问时间做 LRU 淘汰。
+
+文案缓存按 (video_id, 模型, 语言提示) 索引识别结果，同时以音频内容哈希作为
+内容地址去重：重新上传的相同音频直接复用已有文案，不再调用语音识别。
+按保存时间和总大小淘汰。
+
+视频文件缓存把下载过的视频按 video_id 保存在磁盘上（索引在同一个 SQLite 中），
+重复下载同一个视频时直接使用本地文件；按最近访问时间淘汰到总大小以内。
+同一进程内对同一个未缓存视频的并发请求只会向 CDN 下载一次。
+
+环境变量:
+- DOUYIN_CACHE: 是否启用缓存，默认 true
+- DOUYIN_CACHE_DIR: 缓存数据库所在目录，默认 ~/.cache/douyin-mcp-server
+- DOUYIN_CACHE_LINK_TTL: 短链缓存时间（秒），默认 30 天
+- DOUYIN_CACHE_INFO_TTL: 视频信息缓存时间（秒），默认 6 小时
+- DOUYIN_CACHE_MAX_ENTRIES: 每层最多缓存条数，默认 10000
+- DOUYIN_TRANSCRIPT_MAX_AGE: 文案最长保存时间（秒），默认 90 天
+- DOUYIN_TRANSCRIPT_MAX_BYTES: 文案缓存总大小上限（字节），默认 200MB
+- DOUYIN_MEDIA_CACHE: 是否缓存视频文件，默认 true（DOUYIN_CACHE=false 时同样关闭）
+- DOUYIN_MEDIA_CACHE_DIR: 视频文件缓存目录，默认 <DOUYIN_CACHE_DIR>/media（可指向挂载的磁盘）
+- DOUYIN_MEDIA_CACHE_MAX_BYTES: 视频文件缓存总大小上限（字节），默认 1GB
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+CACHE_DB_NAME = "douyin_cache.db"
+
+
+def cache_dir() -> Path:
+    """缓存数据库所在目录"""
+    configured = os.getenv("DOUYIN_CACHE_DIR", "")
+    if configured:
+        return Path(configured).expanduser()
+    return Path.home() / ".cache" / "douyin-mcp-server"
+
+
+def play_url_expired(url: str, now: Optional[float] = None) -> bool:
+    """
+    判断带签名的播放地址是否已过期
+
+    支持查询参数中的 x-expires / expires，以及抖音 CDN 路径中
+    第二段的十六进制过期时间戳（如 /<签名>/<6650a1b2>/video/...）。
+    无法判断时视为未过期。
+    """
+    now = now or time.time()
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    for key in ("x-expires", "expires"):
+        if key in query:
+            try:
+                return int(query[key][0]) <= now
+            except ValueError:
+                return False
+    segments = [s for s in parts.path.split("/") if s]
+    if len(segments) > 2 and len(segments[1]) == 8:
+        try:
+            return int(segments[1], 16) <= now
+        except ValueError:
+            return False
+    return False
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+def _cache_enabled() -> bool:
+    return os.getenv("DOUYIN_CACHE", "true").lower() == "true"
+
+
+def hash_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """计算文件内容的 sha256，用作音频的内容地址"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class VideoCache:
+    """分享短链和视频信息的两层 SQLite 缓存"""
+
+    def __init__(self, db_path: Path, link_ttl: float = 30 * 86400, info_ttl: float = 6 * 3600,
+                 max_entries: int = 10000):
+        self.db_path = Path(db_path)
+        self.link_ttl = link_ttl
+        self.info_ttl = info_ttl
+        self.max_entries = max_entries
+        self.counters = {
+            "link_hits": 0,
+            "link_misses": 0,
+            "info_hits": 0,
+            "info_misses": 0,
+            "info_expired": 0,
+        }
+        self._lock = threading.Lock()
+        self._conn = _connect(self.db_path)
+        self._init_schema()
+
+    def _init_schema(self) -> None:
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS share_links (
+                share_url TEXT PRIMARY KEY,
+                video_id TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_share_links_access ON share_links(last_access);
+            CREATE TABLE IF NOT EXISTS video_info (
+                video_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_video_info_access ON video_info(last_access);
+            """
+        )
+
+    @staticmethod
+    def normalize_share_url(share_url: str) -> str:
+        return share_url.split("#")[0].rstrip("/")
+
+    def _get(self, table: str, key_column: str, value_column: str, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {value_column}, expires_at FROM {table} WHERE {key_column} = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute(f"DELETE FROM {table} WHERE {key_column} = ?", (key,))
+                return None
+            self._conn.execute(f"UPDATE {table} SET last_access = ? WHERE {key_column} = ?", (now, key))
+            return row[0]
+
+    def _put(self, table: str, key_column: str, value_column: str, key: str, value: str, ttl: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {table}({key_column}, {value_column}, expires_at, last_access) "
+                "VALUES(?, ?, ?, ?)",
+                (key, value, now + ttl, now),
+            )
+            # LRU 淘汰：只保留最近访问的 max_entries 条
+            self._conn.execute(
+                f"DELETE FROM {table} WHERE {key_column} IN ("
+                f"SELECT {key_column} FROM {table} ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def get_video_id(self, share_url: str) -> Optional[str]:
+        video_id = self._get("share_links", "share_url", "video_id", self.normalize_share_url(share_url))
+        self.counters["link_hits" if video_id else "link_misses"] += 1
+        return video_id
+
+    def put_video_id(self, share_url: str, video_id: str) -> None:
+        self._put("share_links", "share_url", "video_id", self.normalize_share_url(share_url), video_id,
+                  self.link_ttl)
+
+    def get_info(self, video_id: str) -> Optional[dict]:
+        data = self._get("video_info", "video_id", "data", video_id)
+        if data is None:
+            self.counters["info_misses"] += 1
+            return None
+        info = json.loads(data)
+        # 图集作品没有播放地址，按第一张图片的签名地址判断
+        images = info.get("images") or [[""]]
+        if play_url_expired(info.get("url") or images[0][0]):
+            # 签名地址已过期，需要重新解析分享页
+            self.counters["info_expired"] += 1
+            self.invalidate_info(video_id)
+            return None
+        self.counters["info_hits"] += 1
+        return info
+
+    def put_info(self, video_id: str, info: dict) -> None:
+        self._put("video_info", "video_id", "data", video_id, json.dumps(info, ensure_ascii=False),
+                  self.info_ttl)
+
+    def invalidate_info(self, video_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM video_info WHERE video_id = ?", (video_id,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            links = self._conn.execute("SELECT COUNT(*) FROM share_links").fetchone()[0]
+            infos = self._conn.execute("SELECT COUNT(*) FROM video_info").fetchone()[0]
+        return {**self.counters, "link_entries": links, "info_entries": infos}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class NullVideoCache(VideoCache):
+    """禁用缓存时使用：不读不写，只统计未命中"""
+
+    def __init__(self):
+        self.counters = {
+            "link_hits": 0,
+            "link_misses": 0,
+            "info_hits": 0,
+            "info_misses": 0,
+            "info_expired": 0,
+        }
+
+    def get_video_id(self, share_url: str) -> Optional[str]:
+        self.counters["link_misses"] += 1
+        return None
+
+    def put_video_id(self, share_url: str, video_id: str) -> None:
+        pass
+
+    def get_info(self, video_id: str) -> Optional[dict]:
+        self.counters["info_misses"] += 1
+        return None
+
+    def put_info(self, video_id: str, info: dict) -> None:
+        pass
+
+    def invalidate_info(self, video_id: str) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {**self.counters, "link_entries": 0, "info_entries": 0}
+
+    def close(self) -> None:
+        pass
+
+
+_video_cache: Optional[VideoCache] = None
+_video_cache_lock = threading.Lock()
+
+
+def get_video_cache() -> VideoCache:
+    """获取进程级共享的视频解析缓存"""
+    global _video_cache
+    if _video_cache is None:
+        with _video_cache_lock:
+            if _video_cache is None:
+                if not _cache_enabled():
+                    _video_cache = NullVideoCache()
+                else:
+                    _video_cache = VideoCache(
+                        cache_dir() / CACHE_DB_NAME,
+                        link_ttl=float(os.getenv("DOUYIN_CACHE_LINK_TTL", 30 * 86400)),
+                        info_ttl=float(os.getenv("DOUYIN_CACHE_INFO_TTL", 6 * 3600)),
+                        max_entries=int(os.getenv("DOUYIN_CACHE_MAX_ENTRIES", 10000)),
+                    )
+    return _video_cache
+
+
+class TranscriptCache:
+    """
+    文案缓存
+
+    transcript_texts 以内容键（音频哈希或 video_id，加上模型和语言提示）保存文案，
+    transcript_index 把 (video_id, 模型, 语言提示) 指向内容键，
+    多个视频的音频相同时共用同一份文案。
+    """
+
+    def __init__(self, db_path: Path, max_age: float = 90 * 86400, max_bytes: int = 200 * 1024 * 1024):
+        self.db_path = Path(db_path)
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.counters = {"video_hits": 0, "audio_hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._conn = _connect(self.db_path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS transcript_texts (
+                content_key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_transcript_texts_access ON transcript_texts(last_access);
+            CREATE INDEX IF NOT EXISTS idx_transcript_texts_created ON transcript_texts(created_at);
+            CREATE TABLE IF NOT EXISTS transcript_index (
+                video_key TEXT PRIMARY KEY,
+                content_key TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_transcript_index_content ON transcript_index(content_key);
+            """
+        )
+
+    @staticmethod
+    def _suffix(model: str, language_hints: Optional[list] = None) -> str:
+        return f"{model}|{','.join(language_hints or [])}"
+
+    def video_key(self, video_id: str, model: str, language_hints: Optional[list] = None) -> str:
+        return f"video:{video_id}|{self._suffix(model, language_hints)}"
+
+    def audio_key(self, audio_hash: str, model: str, language_hints: Optional[list] = None) -> str:
+        return f"sha256:{audio_hash}|{self._suffix(model, language_hints)}"
+
+    def _read_text(self, content_key: str) -> Optional[str]:
+        now = time.time()
+        row = self._conn.execute(
+            "SELECT text, created_at FROM transcript_texts WHERE content_key = ?", (content_key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] + self.max_age <= now:
+            self._conn.execute("DELETE FROM transcript_texts WHERE content_key = ?", (content_key,))
+            return None
+        self._conn.execute("UPDATE transcript_texts SET last_access = ? WHERE content_key = ?", (now, content_key))
+        return row[0]
+
+    def get_by_video(self, video_id: str, model: str, language_hints: Optional[list] = None) -> Optional[str]:
+        """按 (video_id, 模型, 语言提示) 查找文案"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_key FROM transcript_index WHERE video_key = ?",
+                (self.video_key(video_id, model, language_hints),),
+            ).fetchone()
+            text = self._read_text(row[0]) if row else None
+        self.counters["video_hits" if text is not None else "misses"] += 1
+        return text
+
+    def get_by_audio(self, audio_hash: str, model: str, language_hints: Optional[list] = None) -> Optional[str]:
+        """按音频内容哈希查找文案（video_id 未命中时的回退）"""
+        with self._lock:
+            text = self._read_text(self.audio_key(audio_hash, model, language_hints))
+        self.counters["audio_hits" if text is not None else "misses"] += 1
+        return text
+
+    def put(self, video_id: str, model: str, text: str, language_hints: Optional[list] = None,
+            audio_hash: Optional[str] = None) -> None:
+        """
+        保存文案
+
+        参数:
+        - audio_hash: 音频内容哈希；没有本地音频时（如直接把视频地址交给识别服务）以 video_id 作为内容键
+        """
+        if audio_hash:
+            content_key = self.audio_key(audio_hash, model, language_hints)
+        else:
+            content_key = self.video_key(video_id, model, language_hints)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcript_texts(content_key, text, size, created_at, last_access) "
+                "VALUES(?, ?, ?, ?, ?)",
+                (content_key, text, len(text.encode("utf-8")), now, now),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO transcript_index(video_key, content_key) VALUES(?, ?)",
+                (self.video_key(video_id, model, language_hints), content_key),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        # 先按保存时间淘汰，再按最近访问时间淘汰到总大小以内
+        self._conn.execute("DELETE FROM transcript_texts WHERE created_at <= ?", (now - self.max_age,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM transcript_texts").fetchone()[0]
+        if total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT content_key, size FROM transcript_texts ORDER BY last_access"
+            ).fetchall()
+            evicted = []
+            for content_key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                evicted.append((content_key,))
+                total -= size
+            self._conn.executemany("DELETE FROM transcript_texts WHERE content_key = ?", evicted)
+        self._conn.execute(
+            "DELETE FROM transcript_index WHERE content_key NOT IN (SELECT content_key FROM transcript_texts)"
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcript_texts"
+            ).fetchone()
+        return {**self.counters, "entries": entries, "bytes": total}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class NullTranscriptCache(TranscriptCache):
+    """禁用缓存时使用：不读不写"""
+
+    def __init__(self):
+        self.counters = {"video_hits": 0, "audio_hits": 0, "misses": 0}
+
+    def get_by_video(self, video_id: str, model: str, language_hints: Optional[list] = None) -> Optional[str]:
+        self.counters["misses"] += 1
+        return None
+
+    def get_by_audio(self, audio_hash: str, model: str, language_hints: Optional[list] = None) -> Optional[str]:
+        self.counters["misses"] += 1
+        return None
+
+    def put(self, video_id: str, model: str, text: str, language_hints: Optional[list] = None,
+            audio_hash: Optional[str] = None) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {**self.counters, "entries": 0, "bytes": 0}
+
+    def close(self) -> None:
+        pass
+
+
+_transcript_cache: Optional[TranscriptCache] = None
+
+
+def get_transcript_cache() -> TranscriptCache:
+    """获取进程级共享的文案缓存"""
+    global _transcript_cache
+    if _transcript_cache is None:
+        with _video_cache_lock:
+            if _transcript_cache is None:
+                if not _cache_enabled():
+                    _transcript_cache = NullTranscriptCache()
+                else:
+                    _transcript_cache = TranscriptCache(
+                        cache_dir() / CACHE_DB_NAME,
+                        max_age=float(os.getenv("DOUYIN_TRANSCRIPT_MAX_AGE", 90 * 86400)),
+                        max_bytes=int(os.getenv("DOUYIN_TRANSCRIPT_MAX_BYTES", 200 * 1024 * 1024)),
+                    )
+    return _transcript_cache
+
+
+_MEDIA_KEY = re.compile(r"^[\w-]{1,64}$")
+
+
+def link_or_copy(src: Path, dest: Path) -> Path:
+    """把缓存文件放到目标位置：同一文件系统上用硬链接，否则复制"""
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if dest.exists():
+        dest.unlink()
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+    return dest
+
+
+class _Fill:
+    """
+    进行中的一次缓存下载；异步下载时 future 为执行下载的任务
+
+    下载写入缓存目录中的临时文件 path，成功后由 put() 移到正式位置；
+    sequential 为 True 时 fetch 从头到尾顺序写入 path，下载过程中可以用 MediaCache.tail() 边写边读。
+    """
+
+    def __init__(self, path: Path):
+        self.done = threading.Event()
+        self.future: Optional[asyncio.Future] = None
+        self.path = path
+        self.sequential = False
+
+    def failed(self) -> bool:
+        """异步下载已结束且没有成功"""
+        future = self.future
+        return future is not None and future.done() and (future.cancelled() or future.exception() is not None)
+
+
+class MediaCache:
+    """
+    视频文件缓存
+
+    文件保存在 directory/<video_id>.mp4，media_files 表记录大小和最近访问时间。
+    fetch / fetch_async 在未命中时调用 fetch(path) 把视频下载到缓存目录中的临时文件，成功后移到正式位置，
+    失败或被取消时删除临时文件；同一个 video_id 的并发请求（无论同步还是异步）共用这一次下载，
+    下载结束后登记随之删除。
+    """
+
+    enabled = True
+
+    def __init__(self, directory: Path, db_path: Path, max_bytes: int = 1024 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self._fills: dict[str, _Fill] = {}
+        self._conn = _connect(Path(db_path))
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS media_files (
+                video_id TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_media_files_access ON media_files(last_access);
+            """
+        )
+
+    @staticmethod
+    def cacheable(video_id: str) -> bool:
+        """video_id 会用作文件名，只接受字母数字、下划线和连字符"""
+        return bool(_MEDIA_KEY.match(video_id or ""))
+
+    def path(self, video_id: str) -> Path:
+        return self.directory / f"{video_id}.mp4"
+
+    def _temp_path(self, video_id: str) -> Path:
+        return self.directory / f"{video_id}.mp4.tmp"
+
+    def _discard(self, path: Path) -> None:
+        """删除下载失败留下的临时文件（包括分段下载的 .part 和清单）"""
+        for partial in self.directory.glob(f"{path.name}*"):
+            partial.unlink(missing_ok=True)
+
+    def get(self, video_id: str) -> Optional[Path]:
+        """返回缓存的视频文件路径，未缓存时返回 None"""
+        if not self.cacheable(video_id):
+            return None
+        path = self.path(video_id)
+        with self._lock:
+            row = self._conn.execute("SELECT size FROM media_files WHERE video_id = ?", (video_id,)).fetchone()
+            if row and path.exists():
+                self._conn.execute(
+                    "UPDATE media_files SET last_access = ? WHERE video_id = ?", (time.time(), video_id)
+                )
+                self.counters["hits"] += 1
+                return path
+            if row:
+                # 文件已被手动删除，索引作废
+                self._conn.execute("DELETE FROM media_files WHERE video_id = ?", (video_id,))
+        return None
+
+    def put(self, video_id: str, path: Path) -> Path:
+        """登记已写入缓存目录的视频文件（不在缓存目录时移动过去）"""
+        dest = self.path(video_id)
+        if Path(path).parent == self.directory:
+            os.replace(path, dest)
+        elif Path(path) != dest:
+            shutil.move(str(path), str(dest))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO media_files(video_id, size, created_at, last_access) VALUES(?, ?, ?, ?)",
+                (video_id, dest.stat().st_size, now, now),
+            )
+            self._evict(keep=video_id)
+        return dest
+
+    def _evict(self, keep: str) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM media_files").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT video_id, size FROM media_files WHERE video_id != ? ORDER BY last_access", (keep,)
+        ).fetchall()
+        evicted = []
+        for video_id, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.path(video_id).unlink(missing_ok=True)
+            evicted.append((video_id,))
+            total -= size
+        self._conn.executemany("DELETE FROM media_files WHERE video_id = ?", evicted)
+        self.counters["evictions"] += len(evicted)
+
+    def _begin_fill(self, video_id: str) -> tuple:
+        """登记一次下载，返回 (登记, 是否由调用方执行下载)；已有下载在进行时返回那次的登记"""
+        with self._lock:
+            fill = self._fills.get(video_id)
+            if fill is not None:
+                self.counters["coalesced"] += 1
+                return fill, False
+            fill = self._fills[video_id] = _Fill(self._temp_path(video_id))
+            return fill, True
+
+    def _end_fill(self, video_id: str, fill: _Fill, future: Optional[asyncio.Future] = None) -> None:
+        if future is not None and not future.cancelled():
+            # 异常由等待方处理；没有等待方时（如请求已断开）不再由 asyncio 报告“异常未被取回”
+            future.exception()
+        with self._lock:
+            if self._fills.get(video_id) is fill:
+                del self._fills[video_id]
+        fill.done.set()
+
+    def _fill(self, video_id: str, fetch: Callable[[Path], object], temp: Path) -> Path:
+        # 登记前另一次下载可能刚好完成，再查一次
+        path = self.get(video_id)
+        if path is None:
+            self.counters["misses"] += 1
+            self._discard(temp)
+            try:
+                fetch(temp)
+                path = self.put(video_id, temp)
+            except BaseException:
+                self._discard(temp)
+                raise
+        return path
+
+    async def _fill_async(self, video_id: str, fetch: Callable[[Path], Awaitable[object]], temp: Path) -> Path:
+        path = await asyncio.to_thread(self.get, video_id)
+        if path is None:
+            self.counters["misses"] += 1
+            self._discard(temp)
+            try:
+                await fetch(temp)
+                path = await asyncio.to_thread(self.put, video_id, temp)
+            except BaseException:
+                self._discard(temp)
+                raise
+        return path
+
+    def fetch(self, video_id: str, fetch: Callable[[Path], object], dest: Optional[Path] = None) -> Path:
+        """
+        取缓存的视频，未命中时调用 fetch(path) 下载到缓存目录
+
+        参数:
+        - dest: 指定时把缓存文件硬链接（或复制）到 dest 并返回 dest，调用方可以随意删除
+        """
+        if not self.cacheable(video_id):
+            fetch(dest)
+            return dest
+        path = self.get(video_id)
+        while path is None:
+            fill, leader = self._begin_fill(video_id)
+            if leader:
+                try:
+                    path = self._fill(video_id, fetch, fill.path)
+                finally:
+                    self._end_fill(video_id, fill)
+            else:
+                # 等待进行中的下载（同步或异步）结束后重新查找；那次下载失败时由自己下载
+                fill.done.wait()
+                path = self.get(video_id)
+        return link_or_copy(path, dest) if dest is not None else path
+
+    def start_fill_async(self, video_id: str, fetch: Callable[[Path], Awaitable[object]],
+                         sequential: bool = False) -> _Fill:
+        """
+        在当前事件循环中开始下载 video_id（已有下载在进行时返回那次的登记），不等待下载结束
+
+        参数:
+        - sequential: fetch(path) 从头到尾顺序写入 path，其他请求可以用 tail() 边写边读
+        """
+        fill, leader = self._begin_fill(video_id)
+        if leader:
+            fill.sequential = sequential
+            fill.future = asyncio.ensure_future(self._fill_async(video_id, fetch, fill.path))
+            fill.future.add_done_callback(lambda future, fill=fill: self._end_fill(video_id, fill, future))
+        return fill
+
+    async def wait_fill(self, video_id: str, fill: _Fill) -> Optional[Path]:
+        """等待下载结束，返回缓存文件；同一事件循环中的下载失败时抛出它的异常，其他下载失败时返回 None"""
+        if fill.future is not None and fill.future.get_loop() is asyncio.get_running_loop():
+            # 某个等待方被取消时下载继续进行，不影响其他等待方
+            return await asyncio.shield(fill.future)
+        # 同步调用或其他事件循环中的下载：在线程中等待结束后重新查找
+        await asyncio.to_thread(fill.done.wait)
+        return await asyncio.to_thread(self.get, video_id)
+
+    async def tail(self, video_id: str, fill: _Fill, chunk_size: int = 65536,
+                   interval: float = 0.05) -> AsyncIterator[bytes]:
+        """
+        边写边读 start_fill_async(sequential=True) 正在写入的文件，下载结束后读完剩余部分
+
+        下载失败时抛出 RuntimeError（已经输出的部分无法撤回，调用方应中断响应）
+        """
+        f = None
+        try:
+            while True:
+                # 先记录是否已结束再读取：读到文件尾且读取前已结束，才说明没有剩余内容
+                finished = fill.done.is_set()
+                if finished and fill.failed():
+                    raise RuntimeError(f"视频 {video_id} 下载失败")
+                if f is None:
+                    # 下载成功后临时文件已移到正式位置；已打开的文件不受移动影响
+                    path = await asyncio.to_thread(self.get, video_id) if finished else fill.path
+                    if path is None:
+                        raise RuntimeError(f"视频 {video_id} 下载失败")
+                    try:
+                        f = open(path, "rb")
+                    except FileNotFoundError:
+                        if finished:
+                            raise
+                        await asyncio.sleep(interval)
+                        continue
+                data = await asyncio.to_thread(f.read, chunk_size)
+                if data:
+                    yield data
+                elif finished:
+                    return
+                else:
+                    await asyncio.sleep(interval)
+        finally:
+            if f is not None:
+                f.close()
+
+    async def fetch_async(self, video_id: str, fetch: Callable[[Path], Awaitable[object]],
+                          dest: Optional[Path] = None) -> Path:
+        """fetch 的异步版本；某个等待方被取消时下载继续进行，不影响其他等待方"""
+        if not self.cacheable(video_id):
+            await fetch(dest)
+            return dest
+        path = await asyncio.to_thread(self.get, video_id)
+        while path is None:
+            # 其他下载失败时（返回 None）重新登记，由自己下载
+            path = await self.wait_fill(video_id, self.start_fill_async(video_id, fetch))
+        return link_or_copy(path, dest) if dest is not None else path
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM media_files"
+            ).fetchone()
+        return {**self.counters, "entries": entries, "bytes": total, "filling": len(self._fills)}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class NullMediaCache(MediaCache):
+    """禁用缓存时使用：直接下载到目标位置"""
+
+    enabled = False
+
+    def __init__(self):
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    def get(self, video_id: str) -> Optional[Path]:
+        return None
+
+    def fetch(self, video_id: str, fetch: Callable[[Path], object], dest: Optional[Path] = None) -> Path:
+        self.counters["misses"] += 1
+        fetch(dest)
+        return dest
+
+    async def fetch_async(self, video_id: str, fetch: Callable[[Path], Awaitable[object]],
+                          dest: Optional[Path] = None) -> Path:
+        self.counters["misses"] += 1
+        await fetch(dest)
+        return dest
+
+    def stats(self) -> dict:
+        return {**self.counters, "entries": 0, "bytes": 0}
+
+    def close(self) -> None:
+        pass
+
+
+_media_cache: Optional[MediaCache] = None
+
+
+def get_media_cache() -> MediaCache:
+    """获取进程级共享的视频文件缓存"""
+    global _media_cache
+    if _media_cache is None:
+        with _video_cache_lock:
+            if _media_cache is None:
+                if not _cache_enabled() or os.getenv("DOUYIN_MEDIA_CACHE", "true").lower() != "true":
+                    _media_cache = NullMediaCache()
+                else:
+                    directory = os.getenv("DOUYIN_MEDIA_CACHE_DIR", "")
+                    _media_cache = MediaCache(
+                        Path(directory).expanduser() if directory else cache_dir() / "media",
+                        cache_dir() / CACHE_DB_NAME,
+                        max_bytes=int(os.getenv("DOUYIN_MEDIA_CACHE_MAX_BYTES", 1024 * 1024 * 1024)),
+                    )
+    return _media_cache
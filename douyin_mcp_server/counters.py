@@ -0,0 +1,153 @@
+"""
+写回（write-behind）计数器
+
+访问量之类的计数如果每次都 UPDATE + COMMIT，吞吐就受限于一次提交（fsync）的延迟。
+WriteBehindCounters 只在内存中累加，按固定间隔把累计的增量一次性交给 flush 回调写入数据库：
+- 计数分散在多个分片中（每个线程固定使用一个分片），各分片有自己的锁，线程之间不争用同一把锁
+- 待写入的增量达到 max_pending 时提前写入；写入失败时增量放回内存，下次重试
+- 丢失上限：进程被强制终止时只丢失最近一次写入之后的计数，即最多 interval 秒、一般不超过 max_pending 次
+  （达到后立即写入）；正常关闭时 stop() 会全部写入
+- snapshot(read) 在没有写入进行时读取数据库并取得尚未写入的增量，两者相加即为当前值，不会重复或遗漏
+"""
+
+import asyncio
+import itertools
+import threading
+from typing import Any, Callable, Hashable, Optional
+
+
+class WriteBehindCounters:
+    """内存中累加、定期批量写入的计数器"""
+
+    def __init__(self, flush: Callable[[dict], None], interval: float = 5.0,
+                 max_pending: int = 1000, shards: int = 8):
+        """
+        参数:
+        - flush: 写入回调 flush({键: 增量})，在工作线程中调用，应在一个事务中完成写入
+        - interval: 定期写入的间隔（秒）
+        - max_pending: 待写入的计数达到该值时提前写入
+        - shards: 分片数
+        """
+        self._flush = flush
+        self.interval = interval
+        self.max_pending = max(1, max_pending)
+        self.counters = {"flushes": 0, "flushed": 0, "failures": 0}
+        self._shards = [(threading.Lock(), {}) for _ in range(max(1, shards))]
+        self._next_shard = itertools.count()
+        self._local = threading.local()
+        # 待写入的计数总和，各分片并发累加时可能略有偏差，只用于判断是否提前写入
+        self._pending = 0
+        self._flush_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _shard(self) -> tuple:
+        index = getattr(self._local, "shard", None)
+        if index is None:
+            index = self._local.shard = next(self._next_shard) % len(self._shards)
+        return self._shards[index]
+
+    def incr(self, key: Hashable, n: int = 1) -> None:
+        """计数加 n（只写内存）"""
+        lock, counts = self._shard()
+        with lock:
+            counts[key] = counts.get(key, 0) + n
+            self._pending += n
+            pending = self._pending
+        if pending >= self.max_pending:
+            # start() 可能同时替换 _wake，先取到局部变量再调度
+            wake, loop = self._wake, self._loop
+            if wake is not None:
+                try:
+                    loop.call_soon_threadsafe(wake.set)
+                except RuntimeError:
+                    # 事件循环已关闭：增量留在内存中，由下次写入或 flush() 写入
+                    pass
+
+    def _drain(self) -> dict:
+        deltas: dict = {}
+        for lock, counts in self._shards:
+            with lock:
+                for key, n in counts.items():
+                    deltas[key] = deltas.get(key, 0) + n
+                counts.clear()
+        self._pending = 0
+        return deltas
+
+    def pending(self) -> dict:
+        """尚未写入数据库的增量（不含正在写入的部分）"""
+        deltas: dict = {}
+        for lock, counts in self._shards:
+            with lock:
+                for key, n in counts.items():
+                    deltas[key] = deltas.get(key, 0) + n
+        return deltas
+
+    def snapshot(self, read: Callable[[], Any]) -> tuple:
+        """等待正在进行的写入结束后调用 read()，返回 (read() 的结果, 尚未写入的增量)"""
+        with self._flush_lock:
+            return read(), self.pending()
+
+    def flush(self) -> int:
+        """立即写入全部待写入的增量，返回写入的键数；失败时增量放回内存并抛出异常"""
+        with self._flush_lock:
+            deltas = self._drain()
+            if not deltas:
+                return 0
+            try:
+                self._flush(deltas)
+            except BaseException:
+                self.counters["failures"] += 1
+                for key, n in deltas.items():
+                    self.incr(key, n)
+                raise
+            self.counters["flushes"] += 1
+            self.counters["flushed"] += sum(deltas.values())
+            return len(deltas)
+
+    def start(self) -> None:
+        """在当前事件循环中启动定期写入"""
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        wake, stop = self._wake, self._stop
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            wake.clear()
+            if stop.is_set():
+                break
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                print(f"[Counters] 写入计数失败，稍后重试: {e}")
+                try:
+                    await asyncio.wait_for(stop.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def stop(self) -> None:
+        """停止定期写入，并写入剩余的增量"""
+        # 用事件通知停止而不是 cancel()：Python 3.11 的 wait_for 在等待的事件恰好完成时会吞掉取消，
+        # 循环继续运行，stop() 永远等不到它结束
+        if self._task is not None:
+            self._stop.set()
+            self._wake.set()
+            await self._task
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "pending": sum(self.pending().values()),
+            "interval": self.interval,
+            "max_pending": self.max_pending,
+        }
@@ -0,0 +1,485 @@
+"""
+分段并行下载
+
+CDN 支持 Range 时把文件切成固定大小的分块，用多个连接同时下载，
+各分块用 os.pwrite 直接写入预先分配好的 .part 文件的对应位置：
+- 每完成一个分块就记录到旁边的 .part.json 清单中，中断后再次下载只补齐缺失的分块
+- 分块内连接断开时从已写入的位置继续请求，不必从头再来
+- CDN 不支持 Range（返回 200）或文件在两次下载之间发生变化时，退回单连接顺序下载
+
+环境变量:
+- DOUYIN_DOWNLOAD_CONNECTIONS: 单个文件同时使用的连接数，默认 4
+- DOUYIN_DOWNLOAD_CHUNK_SIZE: 分块大小（字节），默认 4194304（4MB）
+- DOUYIN_DOWNLOAD_RETRIES: 单个分块失败后的重试次数，默认 2
+"""
+
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from .http_client import _env_int
+
+DOWNLOAD_CONNECTIONS = max(1, _env_int("DOUYIN_DOWNLOAD_CONNECTIONS", 4))
+DOWNLOAD_CHUNK_SIZE = max(65536, _env_int("DOUYIN_DOWNLOAD_CHUNK_SIZE", 4 * 1024 * 1024))
+DOWNLOAD_RETRIES = max(0, _env_int("DOUYIN_DOWNLOAD_RETRIES", 2))
+DOWNLOAD_RETRY_BACKOFF = 0.5
+READ_SIZE = 65536
+
+ProgressCallback = Callable[[int, int], None]
+AsyncProgressCallback = Callable[[int, int], Awaitable[None]]
+
+_CONTENT_RANGE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+)")
+
+
+class RangeNotSupported(Exception):
+    """服务器忽略了 Range 请求（或文件已变化），需要改为单连接下载"""
+
+
+def parse_content_range(value: Optional[str]) -> Optional[int]:
+    """从 Content-Range 中取出文件总大小，无法解析时返回 None"""
+    match = _CONTENT_RANGE.match(value or "")
+    return int(match.group(3)) if match else None
+
+
+def plan_chunks(size: int, chunk_size: int) -> list:
+    """把 [0, size) 切成若干 (start, end) 闭区间"""
+    return [(start, min(start + chunk_size, size) - 1) for start in range(0, size, chunk_size)]
+
+
+def part_path(path: Path) -> Path:
+    return path.with_name(path.name + ".part")
+
+
+def manifest_path(path: Path) -> Path:
+    return path.with_name(path.name + ".part.json")
+
+
+def _validator(headers: httpx.Headers) -> str:
+    """用于判断续传前后是否同一个文件的校验值（ETag 优先，其次 Last-Modified）"""
+    etag = headers.get("etag", "")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("last-modified", "")
+
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+class _RangeState:
+    """一次分段下载的共享状态：分块、已完成清单、写入位置和计数"""
+
+    def __init__(self, path: Path, size: int, validator: str, chunk_size: int):
+        self.path = path
+        self.size = size
+        self.validator = validator
+        self.chunk_size = chunk_size
+        self.chunks = plan_chunks(size, chunk_size)
+        self.done: set = set()
+        self.fd: Optional[int] = None
+        self.downloaded = 0
+        self.resumed = 0
+        self._lock = threading.Lock()
+
+    def open(self) -> None:
+        """打开 .part 文件；清单与本次文件一致时沿用已完成的分块"""
+        part = part_path(self.path)
+        manifest = manifest_path(self.path)
+        try:
+            saved = json.loads(manifest.read_text())
+            if (part.exists() and saved.get("size") == self.size and saved.get("chunk_size") == self.chunk_size
+                    and saved.get("validator") == self.validator):
+                self.done = {i for i in saved.get("done", []) if 0 <= i < len(self.chunks)}
+        except (OSError, ValueError):
+            pass
+        self.resumed = sum(self.chunks[i][1] - self.chunks[i][0] + 1 for i in self.done)
+
+        self.fd = os.open(part, os.O_RDWR | os.O_CREAT, 0o644)
+        if not self.done:
+            os.ftruncate(self.fd, 0)
+        if os.fstat(self.fd).st_size != self.size:
+            os.ftruncate(self.fd, self.size)
+            if hasattr(os, "posix_fallocate"):
+                try:
+                    os.posix_fallocate(self.fd, 0, self.size)
+                except OSError:
+                    pass
+        self._save()
+
+    def pending(self) -> list:
+        return [i for i in range(len(self.chunks)) if i not in self.done]
+
+    def write(self, data: bytes, offset: int) -> int:
+        """写入一段数据，返回本次下载累计字节数"""
+        os.pwrite(self.fd, data, offset)
+        with self._lock:
+            self.downloaded += len(data)
+            return self.resumed + self.downloaded
+
+    def mark_done(self, index: int) -> None:
+        with self._lock:
+            self.done.add(index)
+            self._save()
+
+    def _save(self) -> None:
+        manifest = manifest_path(self.path)
+        tmp = manifest.with_name(manifest.name + ".tmp")
+        tmp.write_text(json.dumps({
+            "size": self.size,
+            "chunk_size": self.chunk_size,
+            "validator": self.validator,
+            "done": sorted(self.done),
+        }))
+        os.replace(tmp, manifest)
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def finish(self) -> None:
+        """所有分块完成后把 .part 改名为目标文件并删除清单"""
+        os.fsync(self.fd)
+        self.close()
+        os.replace(part_path(self.path), self.path)
+        manifest_path(self.path).unlink(missing_ok=True)
+
+    def range_headers(self, headers: dict, start: int, end: int) -> dict:
+        headers = {**headers, "Range": f"bytes={start}-{end}", "Accept-Encoding": "identity"}
+        if self.validator:
+            # 文件在续传期间变化时服务器会返回 200 整个文件，而不是拼出一个损坏的文件
+            headers["If-Range"] = self.validator
+        return headers
+
+    def check_response(self, response: httpx.Response) -> None:
+        if response.status_code == 200:
+            raise RangeNotSupported("服务器未按 Range 返回分块")
+        response.raise_for_status()
+
+
+class DownloadStats:
+    """进程内下载吞吐统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.downloads = 0
+        self.ranged = 0
+        self.bytes = 0
+        self.resumed_bytes = 0
+        self.seconds = 0.0
+        # 只需要音轨时选用的来源：次数、实际下载量和节省的字节数
+        self.audio_sources: dict = {}
+        self.audio_bytes = 0
+        self.audio_saved_bytes = 0
+
+    def record(self, result: dict) -> None:
+        with self._lock:
+            self.downloads += 1
+            self.ranged += 1 if result["ranged"] else 0
+            self.bytes += result["downloaded"]
+            self.resumed_bytes += result["resumed"]
+            self.seconds += result["elapsed"]
+
+    def record_audio_source(self, report: dict) -> None:
+        """记录一次 audio_source_report() 的结果"""
+        with self._lock:
+            self.audio_sources[report["kind"]] = self.audio_sources.get(report["kind"], 0) + 1
+            self.audio_bytes += report["bytes"]
+            self.audio_saved_bytes += report["saved"] or 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "downloads": self.downloads,
+                "ranged": self.ranged,
+                "bytes": self.bytes,
+                "resumed_bytes": self.resumed_bytes,
+                "seconds": round(self.seconds, 3),
+                "bytes_per_second": int(self.bytes / self.seconds) if self.seconds else 0,
+                "audio_sources": dict(self.audio_sources),
+                "audio_bytes": self.audio_bytes,
+                "audio_saved_bytes": self.audio_saved_bytes,
+            }
+
+
+_download_stats = DownloadStats()
+
+
+def get_download_stats() -> DownloadStats:
+    return _download_stats
+
+
+def _result(path: Path, size: int, downloaded: int, resumed: int, started: float,
+            connections: int, ranged: bool) -> dict:
+    elapsed = time.monotonic() - started
+    result = {
+        "path": path,
+        "size": size,
+        "downloaded": downloaded,
+        "resumed": resumed,
+        "elapsed": elapsed,
+        "bytes_per_second": int(downloaded / elapsed) if elapsed > 0 else 0,
+        "connections": connections,
+        "ranged": ranged,
+    }
+    _download_stats.record(result)
+    return result
+
+
+def _cleanup_partial(path: Path) -> None:
+    part_path(path).unlink(missing_ok=True)
+    manifest_path(path).unlink(missing_ok=True)
+
+
+# ---------------------------------------------------------------------------
+# 同步版本
+# ---------------------------------------------------------------------------
+
+def _stream_to_file(response: httpx.Response, path: Path, progress: Optional[ProgressCallback]) -> int:
+    """单连接顺序下载（不支持 Range 时使用）"""
+    total = int(response.headers.get("content-length", 0))
+    written = 0
+    part = part_path(path)
+    with open(part, "wb") as f:
+        for data in response.iter_bytes(chunk_size=READ_SIZE):
+            f.write(data)
+            written += len(data)
+            if progress:
+                progress(written, total)
+    manifest_path(path).unlink(missing_ok=True)
+    os.replace(part, path)
+    return written
+
+
+def _fetch_chunk(client: httpx.Client, url: str, headers: dict, state: _RangeState, index: int,
+                 progress: Optional[ProgressCallback], response: Optional[httpx.Response] = None) -> None:
+    start, end = state.chunks[index]
+    offset = start
+    for attempt in range(DOWNLOAD_RETRIES + 1):
+        try:
+            if response is None:
+                response = client.send(
+                    client.build_request("GET", url, headers=state.range_headers(headers, offset, end)), stream=True
+                )
+            try:
+                state.check_response(response)
+                for data in response.iter_raw(chunk_size=READ_SIZE):
+                    data = data[:end + 1 - offset]
+                    if not data:
+                        break
+                    total = state.write(data, offset)
+                    offset += len(data)
+                    if progress:
+                        progress(total, state.size)
+            finally:
+                response.close()
+                response = None
+            if offset > end:
+                state.mark_done(index)
+                return
+            raise httpx.ReadError("分块数据不完整")
+        except Exception as e:
+            if attempt >= DOWNLOAD_RETRIES or not _is_retryable(e):
+                raise
+            time.sleep(DOWNLOAD_RETRY_BACKOFF * 2 ** attempt)
+
+
+def download_file(client: httpx.Client, url: str, path: Path, headers: Optional[dict] = None,
+                  connections: Optional[int] = None, chunk_size: Optional[int] = None,
+                  progress: Optional[ProgressCallback] = None) -> dict:
+    """
+    分段并行下载 url 到 path，支持断点续传
+
+    参数:
+        progress: 进度回调 progress(已下载字节数, 总字节数)，可能在多个线程中调用
+
+    返回:
+        dict: path, size, downloaded（本次下载字节数）, resumed（续传沿用的字节数）,
+        elapsed, bytes_per_second, connections, ranged
+    """
+    path = Path(path)
+    headers = dict(headers or {})
+    connections = connections or DOWNLOAD_CONNECTIONS
+    chunk_size = chunk_size or DOWNLOAD_CHUNK_SIZE
+    started = time.monotonic()
+
+    # 第一个分块的请求同时用来探测是否支持 Range 以及文件大小
+    probe = client.send(
+        client.build_request("GET", url, headers={**headers, "Range": f"bytes=0-{chunk_size - 1}",
+                                                  "Accept-Encoding": "identity"}),
+        stream=True,
+    )
+    size = parse_content_range(probe.headers.get("content-range")) if probe.status_code == 206 else None
+    if size is None:
+        try:
+            probe.raise_for_status()
+            written = _stream_to_file(probe, path, progress)
+        finally:
+            probe.close()
+        return _result(path, written, written, 0, started, 1, False)
+
+    state = _RangeState(path, size, _validator(probe.headers), chunk_size)
+    try:
+        state.open()
+        pending = state.pending()
+        workers = max(1, min(connections, len(pending)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = []
+            for index in pending:
+                if index == 0:
+                    futures.append(pool.submit(_fetch_chunk, client, url, headers, state, 0, progress, probe))
+                    probe = None
+                else:
+                    futures.append(pool.submit(_fetch_chunk, client, url, headers, state, index, progress))
+            if probe is not None:
+                probe.close()
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                pool.shutdown(wait=True, cancel_futures=True)
+                raise
+        state.finish()
+    except RangeNotSupported:
+        state.close()
+        _cleanup_partial(path)
+        with client.stream("GET", url, headers=headers) as response:
+            response.raise_for_status()
+            written = _stream_to_file(response, path, progress)
+        return _result(path, written, written, 0, started, 1, False)
+    finally:
+        if probe is not None:
+            probe.close()
+        state.close()
+    return _result(path, size, state.downloaded, state.resumed, started, workers, True)
+
+
+# ---------------------------------------------------------------------------
+# 异步版本
+# ---------------------------------------------------------------------------
+
+async def _stream_to_file_async(response: httpx.Response, path: Path,
+                                progress: Optional[AsyncProgressCallback]) -> int:
+    total = int(response.headers.get("content-length", 0))
+    written = 0
+    part = part_path(path)
+    with open(part, "wb") as f:
+        async for data in response.aiter_bytes(chunk_size=READ_SIZE):
+            f.write(data)
+            written += len(data)
+            if progress:
+                await progress(written, total)
+    manifest_path(path).unlink(missing_ok=True)
+    os.replace(part, path)
+    return written
+
+
+async def _fetch_chunk_async(client: httpx.AsyncClient, url: str, headers: dict, state: _RangeState, index: int,
+                             progress: Optional[AsyncProgressCallback],
+                             response: Optional[httpx.Response] = None) -> None:
+    start, end = state.chunks[index]
+    offset = start
+    for attempt in range(DOWNLOAD_RETRIES + 1):
+        try:
+            if response is None:
+                response = await client.send(
+                    client.build_request("GET", url, headers=state.range_headers(headers, offset, end)), stream=True
+                )
+            try:
+                state.check_response(response)
+                async for data in response.aiter_raw(chunk_size=READ_SIZE):
+                    data = data[:end + 1 - offset]
+                    if not data:
+                        break
+                    total = state.write(data, offset)
+                    offset += len(data)
+                    if progress:
+                        await progress(total, state.size)
+            finally:
+                await response.aclose()
+                response = None
+            if offset > end:
+                state.mark_done(index)
+                return
+            raise httpx.ReadError("分块数据不完整")
+        except Exception as e:
+            if attempt >= DOWNLOAD_RETRIES or not _is_retryable(e):
+                raise
+            await asyncio.sleep(DOWNLOAD_RETRY_BACKOFF * 2 ** attempt)
+
+
+async def download_file_async(client: httpx.AsyncClient, url: str, path: Path, headers: Optional[dict] = None,
+                              connections: Optional[int] = None, chunk_size: Optional[int] = None,
+                              progress: Optional[AsyncProgressCallback] = None) -> dict:
+    """download_file 的异步版本，各分块在同一个事件循环中并发下载"""
+    path = Path(path)
+    headers = dict(headers or {})
+    connections = connections or DOWNLOAD_CONNECTIONS
+    chunk_size = chunk_size or DOWNLOAD_CHUNK_SIZE
+    started = time.monotonic()
+
+    probe = await client.send(
+        client.build_request("GET", url, headers={**headers, "Range": f"bytes=0-{chunk_size - 1}",
+                                                  "Accept-Encoding": "identity"}),
+        stream=True,
+    )
+    size = parse_content_range(probe.headers.get("content-range")) if probe.status_code == 206 else None
+    if size is None:
+        try:
+            probe.raise_for_status()
+            written = await _stream_to_file_async(probe, path, progress)
+        finally:
+            await probe.aclose()
+        return _result(path, written, written, 0, started, 1, False)
+
+    state = _RangeState(path, size, _validator(probe.headers), chunk_size)
+    try:
+        state.open()
+        pending = state.pending()
+        first, probe = probe, None
+        if 0 not in pending:
+            await first.aclose()
+            first = None
+        queue = iter(pending)
+        workers = max(1, min(connections, len(pending)))
+
+        async def worker() -> None:
+            nonlocal first
+            for index in queue:
+                response, first = (first, None) if index == 0 else (None, first)
+                await _fetch_chunk_async(client, url, headers, state, index, progress, response)
+
+        tasks = [asyncio.create_task(worker()) for _ in range(workers)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if first is not None:
+                await first.aclose()
+            raise
+        state.finish()
+    except RangeNotSupported:
+        state.close()
+        _cleanup_partial(path)
+        async with client.stream("GET", url, headers=headers) as response:
+            response.raise_for_status()
+            written = await _stream_to_file_async(response, path, progress)
+        return _result(path, written, written, 0, started, 1, False)
+    finally:
+        if probe is not None:
+            await probe.aclose()
+        state.close()
+    return _result(path, size, state.downloaded, state.resumed, started, workers, True)
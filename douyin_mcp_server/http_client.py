@@ -0,0 +1,231 @@
+"""
+进程级共享 HTTP 客户端
+
+短链跳转、分享页、CDN 视频以及语音识别接口的请求都通过这里的连接池发出：
+- keep-alive 复用 TCP/TLS 连接，同一主机的后续请求不再重复握手
+- 按主机限制并发请求数，避免单个 CDN 节点占满连接池
+- 安装了 h2 时自动启用 HTTP/2
+
+环境变量:
+- DOUYIN_HTTP_TIMEOUT: 读写超时（秒），默认 30
+- DOUYIN_HTTP_CONNECT_TIMEOUT: 连接超时（秒），默认 10
+- DOUYIN_HTTP_MAX_CONNECTIONS: 连接池总连接数上限，默认 100
+- DOUYIN_HTTP_MAX_PER_HOST: 单个主机的并发请求上限，默认 10
+- DOUYIN_HTTP_KEEPALIVE_EXPIRY: 空闲连接保活时间（秒），默认 60
+- DOUYIN_HTTP2: 是否启用 HTTP/2，默认 true（未安装 h2 时自动关闭）
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+from typing import Callable, Optional
+
+import httpx
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def http2_enabled() -> bool:
+    """是否启用 HTTP/2（需要安装 h2）"""
+    if os.getenv("DOUYIN_HTTP2", "true").lower() != "true":
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def default_timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        _env_float("DOUYIN_HTTP_TIMEOUT", 30.0),
+        connect=_env_float("DOUYIN_HTTP_CONNECT_TIMEOUT", 10.0),
+    )
+
+
+def default_limits() -> httpx.Limits:
+    max_connections = _env_int("DOUYIN_HTTP_MAX_CONNECTIONS", 100)
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=_env_float("DOUYIN_HTTP_KEEPALIVE_EXPIRY", 60.0),
+    )
+
+
+def max_per_host() -> int:
+    return max(1, _env_int("DOUYIN_HTTP_MAX_PER_HOST", 10))
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """响应体关闭时归还主机并发名额"""
+
+    def __init__(self, stream: httpx.SyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            release, self._release = self._release, None
+            if release:
+                release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    """异步版本：响应体关闭时归还主机并发名额"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            release, self._release = self._release, None
+            if release:
+                release()
+
+
+class _HostLimitedTransport(httpx.HTTPTransport):
+    """在连接池之上按主机限制并发请求数"""
+
+    def __init__(self, per_host: int, **kwargs):
+        super().__init__(**kwargs)
+        self._per_host = per_host
+        self._semaphores: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            sem = self._semaphores.get(host)
+            if sem is None:
+                sem = self._semaphores[host] = threading.BoundedSemaphore(self._per_host)
+            return sem
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        sem = self._semaphore(request.url.host)
+        sem.acquire()
+        try:
+            response = super().handle_request(request)
+        except BaseException:
+            sem.release()
+            raise
+        response.stream = _ReleasingStream(response.stream, sem.release)
+        return response
+
+
+class _AsyncHostLimitedTransport(httpx.AsyncHTTPTransport):
+    """异步版本：在连接池之上按主机限制并发请求数"""
+
+    def __init__(self, per_host: int, **kwargs):
+        super().__init__(**kwargs)
+        self._per_host = per_host
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        sem = self._semaphores.get(request.url.host)
+        if sem is None:
+            sem = self._semaphores[request.url.host] = asyncio.Semaphore(self._per_host)
+        await sem.acquire()
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            sem.release()
+            raise
+        response.stream = _AsyncReleasingStream(response.stream, sem.release)
+        return response
+
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+# 异步客户端的连接只能在创建它的事件循环中使用，每个事件循环一个客户端；
+# 事件循环被回收后对应的条目随之删除
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+# 关闭旧客户端的后台任务
+_close_tasks: set = set()
+
+
+def get_client() -> httpx.Client:
+    """获取进程级共享的同步客户端"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                http2 = http2_enabled()
+                _client = httpx.Client(
+                    transport=_HostLimitedTransport(max_per_host(), http2=http2, limits=default_limits()),
+                    timeout=default_timeout(),
+                    follow_redirects=True,
+                )
+    return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """获取当前事件循环共享的异步客户端"""
+    loop = asyncio.get_running_loop()
+    with _async_clients_lock:
+        client = _async_clients.get(loop)
+        if client is not None and not client.is_closed:
+            return client
+        # 已关闭的事件循环（如 asyncio.run 结束后）留下的客户端不会再被使用，在这里关闭
+        closed = [old_loop for old_loop in list(_async_clients) if old_loop.is_closed()]
+        stale = [_async_clients.pop(old_loop) for old_loop in closed]
+        http2 = http2_enabled()
+        client = _async_clients[loop] = httpx.AsyncClient(
+            transport=_AsyncHostLimitedTransport(max_per_host(), http2=http2, limits=default_limits()),
+            timeout=default_timeout(),
+            follow_redirects=True,
+        )
+    for old in stale:
+        task = loop.create_task(_aclose_stale(old))
+        _close_tasks.add(task)
+        task.add_done_callback(_close_tasks.discard)
+    return client
+
+
+async def _aclose_stale(client: httpx.AsyncClient) -> None:
+    """关闭原事件循环已关闭的客户端：套接字照常关闭，通知原事件循环时的 RuntimeError 忽略"""
+    try:
+        await client.aclose()
+    except RuntimeError:
+        pass
+
+
+def close_client() -> None:
+    """关闭同步客户端（进程退出前调用）"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+async def aclose_async_client() -> None:
+    """关闭当前事件循环的异步客户端（服务关闭或 asyncio.run 结束前调用）"""
+    with _async_clients_lock:
+        client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,217 @@
+"""
+图集（note）作品的图片下载
+
+分享页中每张图片有若干 CDN 镜像（见 video_info.py 中的 VideoInfo.images）。
+下载时限制同时进行的图片数，某个镜像失败时换下一个；已经保存过的图片不再重复下载。
+打包下载时边下载边写 ZIP：图片本身已经压缩，按 STORED 写入，写出的字节立即发送，
+内存中最多只保留并发数量的图片，不会构建整个压缩包。
+
+环境变量：
+- DOUYIN_IMAGE_CONCURRENCY: 同时下载的图片数，默认 4
+"""
+
+import asyncio
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from .http_client import get_client, get_async_client
+
+IMAGE_CONCURRENCY = max(1, int(os.getenv("DOUYIN_IMAGE_CONCURRENCY", "4")))
+
+_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/heic": ".heic",
+    "image/avif": ".avif",
+    "image/gif": ".gif",
+}
+
+
+def image_extension(content_type: str, url: str) -> str:
+    """按响应的 Content-Type（其次是地址后缀）确定图片扩展名"""
+    ext = _EXTENSIONS.get(content_type.split(";")[0].strip().lower())
+    if ext:
+        return ext
+    suffix = Path(url.split("?")[0]).suffix.lower()
+    return suffix if suffix in _EXTENSIONS.values() or suffix == ".jpeg" else ".jpg"
+
+
+def image_stem(index: int) -> str:
+    """第 index 张图片的文件名（不含扩展名），从 01 开始"""
+    return f"{index + 1:02d}"
+
+
+def _saved_image(folder: Path, index: int) -> Optional[Path]:
+    for path in folder.glob(f"{image_stem(index)}.*"):
+        if path.suffix != ".part":
+            return path
+    return None
+
+
+def fetch_image(client: httpx.Client, urls: list, headers: Optional[dict] = None) -> tuple:
+    """下载一张图片，依次尝试各个镜像，返回 (内容, 扩展名)"""
+    error = None
+    for url in urls:
+        try:
+            # 用流式读取：内容不缓存在 Response 上，随本帧一起释放
+            with client.stream("GET", url, headers=headers) as response:
+                response.raise_for_status()
+                content = b"".join(response.iter_bytes())
+        except httpx.HTTPError as e:
+            error = e
+            continue
+        # 失败镜像的异常经 traceback 引用本帧，同样要先释放
+        error = None
+        return content, image_extension(response.headers.get("content-type", ""), url)
+    raise error
+
+
+async def fetch_image_async(client: httpx.AsyncClient, urls: list, headers: Optional[dict] = None) -> tuple:
+    """fetch_image 的异步版本"""
+    error = None
+    for url in urls:
+        try:
+            async with client.stream("GET", url, headers=headers) as response:
+                response.raise_for_status()
+                content = b"".join([chunk async for chunk in response.aiter_bytes()])
+        except httpx.HTTPError as e:
+            error = e
+            continue
+        error = None
+        return content, image_extension(response.headers.get("content-type", ""), url)
+    raise error
+
+
+def _save(folder: Path, index: int, content: bytes, ext: str) -> Path:
+    path = folder / f"{image_stem(index)}{ext}"
+    part = path.with_name(path.name + ".part")
+    part.write_bytes(content)
+    os.replace(part, path)
+    return path
+
+
+def download_images(images: list, folder: Path, headers: Optional[dict] = None,
+                    concurrency: Optional[int] = None, progress=None) -> list:
+    """
+    并发下载图集中的全部图片到 folder（01.webp、02.webp ...），已存在的图片跳过
+
+    参数:
+    - images: 每张图片的镜像地址列表
+    - progress: 可选回调 progress(已完成数, 总数)
+
+    返回:
+    - 按顺序排列的图片路径
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    client = get_client()
+    paths = [None] * len(images)
+    done = 0
+
+    def fetch(index: int) -> Path:
+        saved = _saved_image(folder, index)
+        if saved is not None:
+            return saved
+        content, ext = fetch_image(client, images[index], headers)
+        return _save(folder, index, content, ext)
+
+    with ThreadPoolExecutor(max_workers=concurrency or IMAGE_CONCURRENCY) as pool:
+        futures = {pool.submit(fetch, index): index for index in range(len(images))}
+        try:
+            for future in futures:
+                paths[futures[future]] = future.result()
+                done += 1
+                if progress:
+                    progress(done, len(images))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return paths
+
+
+async def download_images_async(images: list, folder: Path, headers: Optional[dict] = None,
+                                concurrency: Optional[int] = None) -> list:
+    """download_images 的异步版本"""
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    client = get_async_client()
+    limit = asyncio.Semaphore(concurrency or IMAGE_CONCURRENCY)
+
+    async def fetch(index: int) -> Path:
+        saved = _saved_image(folder, index)
+        if saved is not None:
+            return saved
+        async with limit:
+            content, ext = await fetch_image_async(client, images[index], headers)
+        return _save(folder, index, content, ext)
+
+    tasks = [asyncio.ensure_future(fetch(index)) for index in range(len(images))]
+    try:
+        return list(await asyncio.gather(*tasks))
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def iter_images_async(images: list, headers: Optional[dict] = None,
+                            concurrency: Optional[int] = None) -> AsyncIterator[tuple]:
+    """
+    按顺序逐张返回 (文件名, 内容)，同时最多预取 concurrency 张
+
+    调用方停止迭代（如客户端断开）时取消尚未完成的下载
+    """
+    client = get_async_client()
+    window = concurrency or IMAGE_CONCURRENCY
+    pending: list = []
+    next_index = 0
+    try:
+        while next_index < len(images) or pending:
+            while next_index < len(images) and len(pending) < window:
+                pending.append(asyncio.ensure_future(fetch_image_async(client, images[next_index], headers)))
+                next_index += 1
+            index = next_index - len(pending)
+            content, ext = await pending.pop(0)
+            yield f"{image_stem(index)}{ext}", content
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class _ZipSink:
+    """ZipFile 的输出目标：只收集写出的字节，不支持 seek（zipfile 会改用流式写法）"""
+
+    def __init__(self):
+        self._chunks: list = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def stream_images_zip(images: list, headers: Optional[dict] = None,
+                            concurrency: Optional[int] = None) -> AsyncIterator[bytes]:
+    """边下载边生成图集 ZIP，逐段返回压缩包内容（用于 StreamingResponse）"""
+    sink = _ZipSink()
+    date_time = time.localtime()[:6]
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+        async for name, content in iter_images_async(images, headers, concurrency):
+            archive.writestr(zipfile.ZipInfo(name, date_time), content)
+            yield sink.drain()
+    # 关闭时写出中央目录
+    yield sink.drain()
@@ -0,0 +1,74 @@
+"""
+识别服务限流
+
+分段并发识别时，同一识别服务（按接口主机区分）的请求共用一个令牌桶，
+同时运行的多个提取任务加起来也不会超过服务商的速率限制。
+
+环境变量:
+- DOUYIN_ASR_RATE_LIMIT: 每个识别服务每秒最多发起的请求数，默认 5，0 表示不限
+- DOUYIN_ASR_RATE_BURST: 允许的突发请求数，默认与并发数相同
+"""
+
+import asyncio
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+from .http_client import _env_float, _env_int
+
+
+class RateLimiter:
+    """令牌桶限流器，线程和协程中均可使用"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """预订一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        """阻塞直到可以发起请求"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """acquire 的异步版本"""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+_limiters: dict = {}
+_limiters_lock = threading.Lock()
+
+
+def provider_key(api_url: str) -> str:
+    """以接口主机区分识别服务"""
+    return urlsplit(api_url).netloc or api_url
+
+
+def get_rate_limiter(provider: str) -> Optional[RateLimiter]:
+    """获取识别服务共用的限流器，未启用限流时返回 None"""
+    rate = _env_float("DOUYIN_ASR_RATE_LIMIT", 5)
+    if rate <= 0:
+        return None
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            burst = _env_int("DOUYIN_ASR_RATE_BURST", _env_int("DOUYIN_ASR_CONCURRENCY", 4))
+            limiter = _limiters[provider] = RateLimiter(rate, burst)
+        return limiter
@@ -0,0 +1,273 @@
+"""
+抖音分享链接解析
+
+MCP Server、WebUI 和命令行工具共用的解析流程：
+分享文本 -> 分享链接 -> video_id -> 分享页 -> 视频信息，
+其中两步网络请求的结果都会写入持久化缓存（见 cache.py）。
+缓存未命中时，同一短链（或同一 video_id）上并发的解析只会发出一次网络请求。
+
+分享页只需要 window._ROUTER_DATA 这一段脚本：边下载边查找，脚本结束后就不再读取后面的内容，
+安装了 orjson 时用它解析 JSON。
+"""
+
+import json
+import re
+from typing import Union
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时使用标准库
+    orjson = None
+
+from .cache import VideoCache, get_video_cache
+from .http_client import get_client, get_async_client
+from .singleflight import SingleFlight
+from .video_info import VideoInfo
+
+# 请求头，模拟移动端访问
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) EdgiOS/121.0.2277.107 Version/17.0 Mobile/15E148 Safari/604.1'
+}
+
+SHARE_PAGE_URL = "https://www.iesdouyin.com/share/video/{video_id}"
+
+# 播放地址签名过期时 CDN 返回的状态码
+PLAY_URL_EXPIRED_STATUS = (403, 404, 410)
+
+# 分享页中视频信息所在的脚本
+_ROUTER_MARKER = "window._ROUTER_DATA"
+_SCRIPT_END = "</script>"
+# 找到视频信息后剩余内容不超过该大小时读完（HTTP/1.1 读完响应体的连接才能复用）
+_DRAIN_LIMIT = 64 * 1024
+
+# 已经是完整视频页地址时，无需请求短链跳转即可拿到 video_id
+_VIDEO_PAGE_PATTERN = re.compile(r'(?:douyin|iesdouyin)\.com/(?:share/)?(?:video|note)/(\d+)')
+
+
+# 进行中的 短链 -> video_id 和 video_id -> 视频信息 请求
+_link_flight = SingleFlight("share_link")
+_info_flight = SingleFlight("video_info")
+
+_URL_PATTERN = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+
+
+def extract_share_url(share_text: str) -> str:
+    """从分享文本中提取分享链接"""
+    urls = _URL_PATTERN.findall(share_text)
+    if not urls:
+        raise ValueError("未找到有效的分享链接")
+    return urls[0]
+
+
+def extract_share_urls(share_texts: list) -> list:
+    """从多条分享文本中提取全部分享链接（一条文本可包含多个链接），没有链接的文本原样保留"""
+    urls = []
+    for text in share_texts:
+        urls.extend(_URL_PATTERN.findall(text) or [text])
+    return urls
+
+
+def video_id_from_url(url: str) -> str:
+    """从跳转后的地址中取出 video_id"""
+    return url.split("?")[0].strip("/").split("/")[-1]
+
+
+def _router_json(page: Union[str, bytes, bytearray]) -> Union[str, bytes, bytearray]:
+    """取出 window._ROUTER_DATA = ... </script> 之间的 JSON 文本（str 和 bytes 通用）"""
+    text = isinstance(page, str)
+    marker = _ROUTER_MARKER if text else _ROUTER_MARKER.encode()
+    start = page.find(marker)
+    if start >= 0:
+        start = page.find("=" if text else b"=", start + len(marker))
+    if start < 0:
+        raise ValueError("从HTML中解析视频信息失败")
+    stop = page.find(_SCRIPT_END if text else _SCRIPT_END.encode(), start)
+    payload = page[start + 1:stop if stop >= 0 else len(page)].strip()
+    if not payload:
+        raise ValueError("从HTML中解析视频信息失败")
+    return payload
+
+
+def _loads(payload: Union[str, bytes, bytearray]):
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def parse_video_info(page: Union[str, bytes, bytearray], video_id: str) -> VideoInfo:
+    """
+    从分享页内容中解析完整的视频信息
+
+    参数:
+    - page: 分享页 HTML，可以是文本或原始字节（字节时无需先解码整页）
+    """
+    json_data = _loads(_router_json(page))
+    VIDEO_ID_PAGE_KEY = "video_(id)/page"
+    NOTE_ID_PAGE_KEY = "note_(id)/page"
+
+    if VIDEO_ID_PAGE_KEY in json_data["loaderData"]:
+        original_video_info = json_data["loaderData"][VIDEO_ID_PAGE_KEY]["videoInfoRes"]
+    elif NOTE_ID_PAGE_KEY in json_data["loaderData"]:
+        original_video_info = json_data["loaderData"][NOTE_ID_PAGE_KEY]["videoInfoRes"]
+    else:
+        raise Exception("无法从JSON中解析视频或图集信息")
+
+    info = VideoInfo.from_item(original_video_info["item_list"][0], video_id)
+    if not info.url and not info.images:
+        raise ValueError("分享页中没有视频播放地址")
+    return info
+
+
+def parse_share_page(page: Union[str, bytes, bytearray], video_id: str) -> dict:
+    """从分享页内容中解析视频信息，返回 VideoInfo.to_dict() 的字典（可直接写入缓存）"""
+    return parse_video_info(page, video_id).to_dict()
+
+
+class _RouterDataReader:
+    """逐块接收分享页内容，_ROUTER_DATA 所在的脚本结束后返回 True"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self._marker = _ROUTER_MARKER.encode()
+        self._end = _SCRIPT_END.encode()
+        self._start = -1
+        self._scanned = 0
+
+    def feed(self, chunk: bytes) -> bool:
+        self.buffer += chunk
+        # 每次只扫描新到的数据（加上可能跨块的标记长度）
+        if self._start < 0:
+            self._start = self.buffer.find(self._marker, max(0, self._scanned - len(self._marker)))
+            if self._start < 0:
+                self._scanned = len(self.buffer)
+                return False
+            self._scanned = self._start
+        found = self.buffer.find(self._end, max(self._start, self._scanned - len(self._end))) >= 0
+        self._scanned = len(self.buffer)
+        return found
+
+
+def _stop_early(response) -> bool:
+    """视频信息已经拿到时是否直接断开，而不是读完剩余内容"""
+    if response.http_version != "HTTP/1.1":
+        return True
+    length = response.headers.get("content-length")
+    if length is None:
+        return True
+    return int(length) - response.num_bytes_downloaded > _DRAIN_LIMIT
+
+
+def _fetch_video_id(share_url: str) -> str:
+    matched = _VIDEO_PAGE_PATTERN.search(share_url)
+    if matched:
+        video_id = matched.group(1)
+    else:
+        share_response = get_client().get(share_url, headers=HEADERS)
+        video_id = video_id_from_url(str(share_response.url))
+    get_video_cache().put_video_id(share_url, video_id)
+    return video_id
+
+
+def _fetch_info(video_id: str) -> dict:
+    reader = _RouterDataReader()
+    with get_client().stream("GET", SHARE_PAGE_URL.format(video_id=video_id), headers=HEADERS) as response:
+        response.raise_for_status()
+        found = False
+        for chunk in response.iter_bytes():
+            if not found and reader.feed(chunk):
+                found = True
+                if _stop_early(response):
+                    break
+    info = parse_share_page(reader.buffer, video_id)
+    get_video_cache().put_info(video_id, info)
+    return info
+
+
+def resolve_share_url(share_text: str, refresh: bool = False) -> dict:
+    """
+    解析分享文本，返回视频信息（优先读缓存）
+
+    参数:
+    - share_text: 抖音分享链接或包含链接的文本
+    - refresh: 跳过缓存重新解析（播放地址失效时使用）
+    """
+    share_url = extract_share_url(share_text)
+    cache = get_video_cache()
+
+    video_id = None if refresh else cache.get_video_id(share_url)
+    if video_id is None:
+        video_id = _link_flight.do(VideoCache.normalize_share_url(share_url), _fetch_video_id, share_url)
+
+    if not refresh:
+        info = cache.get_info(video_id)
+        if info is not None:
+            return info
+
+    # 多个调用方共用同一份结果，各自拿一个副本（调用方会原地更新播放地址）
+    return dict(_info_flight.do(video_id, _fetch_info, video_id))
+
+
+async def _fetch_video_id_async(share_url: str) -> str:
+    matched = _VIDEO_PAGE_PATTERN.search(share_url)
+    if matched:
+        video_id = matched.group(1)
+    else:
+        share_response = await get_async_client().get(share_url, headers=HEADERS)
+        video_id = video_id_from_url(str(share_response.url))
+    get_video_cache().put_video_id(share_url, video_id)
+    return video_id
+
+
+async def _fetch_info_async(video_id: str, parse=None) -> dict:
+    reader = _RouterDataReader()
+    async with get_async_client().stream(
+        "GET", SHARE_PAGE_URL.format(video_id=video_id), headers=HEADERS
+    ) as response:
+        response.raise_for_status()
+        found = False
+        async for chunk in response.aiter_bytes():
+            if not found and reader.feed(chunk):
+                found = True
+                if _stop_early(response):
+                    break
+    if parse is not None:
+        info = await parse(reader.buffer, video_id)
+    else:
+        info = parse_share_page(reader.buffer, video_id)
+    get_video_cache().put_info(video_id, info)
+    return info
+
+
+async def resolve_share_url_async(share_text: str, refresh: bool = False, parse=None) -> dict:
+    """
+    resolve_share_url 的异步版本
+
+    参数:
+    - parse: 可选的分享页解析协程 parse(页面字节, video_id)（如放到线程池执行），默认直接调用 parse_share_page
+    """
+    share_url = extract_share_url(share_text)
+    cache = get_video_cache()
+
+    video_id = None if refresh else cache.get_video_id(share_url)
+    if video_id is None:
+        video_id = await _link_flight.do_async(
+            VideoCache.normalize_share_url(share_url), _fetch_video_id_async, share_url)
+
+    if not refresh:
+        info = cache.get_info(video_id)
+        if info is not None:
+            return info
+
+    return dict(await _info_flight.do_async(video_id, _fetch_info_async, video_id, parse))
+
+
+def revalidate_video_info(video_id: str) -> dict:
+    """播放地址失效时重新解析分享页，刷新缓存"""
+    get_video_cache().invalidate_info(video_id)
+    return resolve_share_url(SHARE_PAGE_URL.format(video_id=video_id), refresh=True)
+
+
+async def revalidate_video_info_async(video_id: str, parse=None) -> dict:
+    """revalidate_video_info 的异步版本"""
+    get_video_cache().invalidate_info(video_id)
+    return await resolve_share_url_async(SHARE_PAGE_URL.format(video_id=video_id), refresh=True, parse=parse)
@@ -10,34 +10,120 @@
 """
 
 import os
-import re
 import json
-import requests
 import tempfile
 import asyncio
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Awaitable, Callable, List, Optional, Tuple
 import ffmpeg
-from tqdm.asyncio import tqdm
-from urllib import request
-from http import HTTPStatus
-import dashscope
+import httpx
 
 from mcp.server.fastmcp import FastMCP
 from mcp.server.fastmcp import Context
 
+from .asr import DEFAULT_DASHSCOPE_MODEL, DashScopeBackend, select_backend
+from .audio import encode_audio, get_audio_profile
+from .cache import get_media_cache, get_transcript_cache, link_or_copy
+from .download import download_file_async, get_download_stats
+from .http_client import _env_float, _env_int, get_client, get_async_client
+from .images import download_images_async
+from .resolver import (
+    HEADERS,
+    PLAY_URL_EXPIRED_STATUS,
+    extract_share_urls,
+    resolve_share_url,
+    resolve_share_url_async,
+    revalidate_video_info_async,
+)
+from .singleflight import SingleFlight
+from .video_info import audio_source_report, select_audio_source
+
 
 # 创建 MCP 服务器实例
 mcp = FastMCP("Douyin MCP Server", 
-              dependencies=["requests", "ffmpeg-python", "tqdm", "dashscope"])
-
-# 请求头，模拟移动端访问
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) EdgiOS/121.0.2277.107 Version/17.0 Mobile/15E148 Safari/604.1'
-}
+              dependencies=["httpx", "ffmpeg-python"])
 
 # 默认 API 配置
-DEFAULT_MODEL = "paraformer-v2"
+DEFAULT_MODEL = DEFAULT_DASHSCOPE_MODEL
+LANGUAGE_HINTS = ['zh', 'en']
+
+# 批量提取：并发解析分享链接数、本地识别并发数，百炼单个识别任务最多包含的地址数，
+# 以及合并提交的等待窗口（秒）：窗口内解析完成的视频在同一个识别任务中提交
+BATCH_RESOLVE_CONCURRENCY = _env_int("DOUYIN_BATCH_RESOLVE_CONCURRENCY", 8)
+BATCH_AUDIO_CONCURRENCY = _env_int("DOUYIN_BATCH_AUDIO_CONCURRENCY", 2)
+BATCH_SUBMIT_WINDOW = _env_float("DOUYIN_BATCH_SUBMIT_WINDOW", 1.0)
+DASHSCOPE_MAX_FILE_URLS = 100
+# 进行中的单视频提取，按 (video_id, 模型) 合并
+_extract_flight = SingleFlight("mcp_extract")
+# 识别时使用作品原声或码率最低的版本，而不是默认的高清视频
+SMALLEST_AUDIO_SOURCE = os.getenv("DOUYIN_AUDIO_SMALLEST_SOURCE", "true").lower() == "true"
+
+
+class _SubmitWindow:
+    """
+    把陆续就绪的识别地址合并成批量识别任务
+
+    第一个地址到达后等待 window 秒（或凑满 max_size 个）再一起提交，各地址分别等待自己的结果；
+    先提交的任务识别期间，后面就绪的地址进入下一个窗口。
+    """
+
+    def __init__(self, transcribe_many: Callable[[list], Awaitable[list]], window: float, max_size: int):
+        self.transcribe_many = transcribe_many
+        self.window = window
+        self.max_size = max_size
+        self._pending: list = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+
+    async def transcribe(self, url: str) -> str:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((url, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._submit(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _submit(self, batch: list) -> None:
+        try:
+            texts = await self.transcribe_many([url for url, _ in batch])
+        except Exception as e:
+            texts = [e] * len(batch)
+        for (_, future), text in zip(batch, texts):
+            if future.done():
+                continue
+            if isinstance(text, BaseException):
+                future.set_exception(text)
+            else:
+                future.set_result(text)
+
+    async def aclose(self) -> None:
+        """取消尚未提交的地址和进行中的识别任务"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for _, future in self._pending:
+            future.cancel()
+        self._pending = []
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def audio_source_url(video_info: dict) -> str:
+    """交给识别服务的音频来源地址"""
+    return select_audio_source(video_info, smallest=SMALLEST_AUDIO_SOURCE)['urls'][0]
 
 
 class DouyinProcessor:
@@ -47,8 +133,8 @@ class DouyinProcessor:
         self.api_key = api_key
         self.model = model or DEFAULT_MODEL
         self.temp_dir = Path(tempfile.mkdtemp())
-        # 设置阿里云百炼API密钥
-        dashscope.api_key = api_key
+        # 阿里云百炼录音文件识别（直接识别视频地址）
+        self.backend = DashScopeBackend(api_key, self.model, LANGUAGE_HINTS)
     
     def __del__(self):
         """清理临时目录"""
@@ -56,138 +142,142 @@ class DouyinProcessor:
         if hasattr(self, 'temp_dir') and self.temp_dir.exists():
             shutil.rmtree(self.temp_dir, ignore_errors=True)
     
-    def parse_share_url(self, share_text: str) -> dict:
-        """从分享文本中提取无水印视频链接"""
-        # 提取分享链接
-        urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', share_text)
-        if not urls:
-            raise ValueError("未找到有效的分享链接")
-        
-        share_url = urls[0]
-        share_response = requests.get(share_url, headers=HEADERS)
-        video_id = share_response.url.split("?")[0].strip("/").split("/")[-1]
-        share_url = f'https://www.iesdouyin.com/share/video/{video_id}'
-        
-        # 获取视频页面内容
-        response = requests.get(share_url, headers=HEADERS)
-        response.raise_for_status()
-        
-        pattern = re.compile(
-            pattern=r"window\._ROUTER_DATA\s*=\s*(.*?)</script>",
-            flags=re.DOTALL,
-        )
-        find_res = pattern.search(response.text)
-
-        if not find_res or not find_res.group(1):
-            raise ValueError("从HTML中解析视频信息失败")
-
-        # 解析JSON数据
-        json_data = json.loads(find_res.group(1).strip())
-        VIDEO_ID_PAGE_KEY = "video_(id)/page"
-        NOTE_ID_PAGE_KEY = "note_(id)/page"
-        
-        if VIDEO_ID_PAGE_KEY in json_data["loaderData"]:
-            original_video_info = json_data["loaderData"][VIDEO_ID_PAGE_KEY]["videoInfoRes"]
-        elif NOTE_ID_PAGE_KEY in json_data["loaderData"]:
-            original_video_info = json_data["loaderData"][NOTE_ID_PAGE_KEY]["videoInfoRes"]
-        else:
-            raise Exception("无法从JSON中解析视频或图集信息")
-
-        data = original_video_info["item_list"][0]
-
-        # 获取视频信息
-        video_url = data["video"]["play_addr"]["url_list"][0].replace("playwm", "play")
-        desc = data.get("desc", "").strip() or f"douyin_{video_id}"
-        
-        # 替换文件名中的非法字符
-        desc = re.sub(r'[\\/:*?"<>|]', '_', desc)
-        
-        return {
-            "url": video_url,
-            "title": desc,
-            "video_id": video_id
-        }
+    def parse_share_url(self, share_text: str, refresh: bool = False) -> dict:
+        """从分享文本中提取无水印视频链接（结果会写入持久化缓存）"""
+        return resolve_share_url(share_text, refresh=refresh)
+    
+    async def parse_share_url_async(self, share_text: str) -> dict:
+        """parse_share_url 的异步版本"""
+        return await resolve_share_url_async(share_text)
     
     async def download_video(self, video_info: dict, ctx: Context) -> Path:
         """异步下载视频到临时目录"""
         filename = f"{video_info['video_id']}.mp4"
         filepath = self.temp_dir / filename
         
-        ctx.info(f"正在下载视频: {video_info['title']}")
-        
-        response = requests.get(video_info['url'], headers=HEADERS, stream=True)
-        response.raise_for_status()
-        
-        # 获取文件大小
-        total_size = int(response.headers.get('content-length', 0))
+        await ctx.info(f"正在下载视频: {video_info['title']}")
         
-        # 异步下载文件，显示进度
-        with open(filepath, 'wb') as f:
-            downloaded = 0
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if total_size > 0:
-                        progress = downloaded / total_size
-                        await ctx.report_progress(downloaded, total_size)
-        
-        ctx.info(f"视频下载完成: {filepath}")
+        async def report(downloaded: int, total: int):
+            if total > 0:
+                await ctx.report_progress(downloaded, total)
+
+        results = []
+
+        async def fetch(path: Path):
+            client = get_async_client()
+            for attempt in range(2):
+                try:
+                    results.append(await download_file_async(client, video_info['url'], path, HEADERS,
+                                                             progress=report))
+                    return
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code not in PLAY_URL_EXPIRED_STATUS or attempt > 0:
+                        raise
+                    # 缓存中的签名地址已失效，重新解析后重试一次（已下载的分块会保留）
+                    await ctx.info("播放地址已失效，正在重新解析...")
+                    video_info.update(await revalidate_video_info_async(video_info['video_id']))
+
+        # 下载过的视频保存在本地缓存中，这里得到的是缓存文件的硬链接（或副本）
+        await get_media_cache().fetch_async(video_info['video_id'], fetch, dest=filepath)
+
+        if results:
+            speed = results[0]['bytes_per_second'] / 1024 / 1024
+            await ctx.info(f"视频下载完成: {filepath}（{speed:.1f}MB/s，{results[0]['connections']} 个连接）")
+        else:
+            await ctx.info(f"使用已缓存的视频: {filepath}")
+        return filepath
+    
+    async def download_audio_source(self, video_info: dict, ctx: Context) -> Path:
+        """下载识别用的音频来源（不写入视频缓存）；视频缓存中已有完整视频时直接使用"""
+        filepath = self.temp_dir / f"{video_info['video_id']}.source"
+        cached = get_media_cache().get(video_info['video_id'])
+        if cached is not None:
+            link_or_copy(cached, filepath)
+            source = dict(select_audio_source(video_info, smallest=SMALLEST_AUDIO_SOURCE), kind="media_cache",
+                          gear_name="")
+            report = audio_source_report(source, 0)
+        else:
+            client = get_async_client()
+            for attempt in range(2):
+                source = select_audio_source(video_info, smallest=SMALLEST_AUDIO_SOURCE)
+                try:
+                    result = await download_file_async(client, source['urls'][0], filepath, HEADERS)
+                    break
+                except httpx.HTTPStatusError as e:
+                    if e.response.status_code not in PLAY_URL_EXPIRED_STATUS or attempt > 0:
+                        raise
+                    await ctx.info("播放地址已失效，正在重新解析...")
+                    video_info.update(await revalidate_video_info_async(video_info['video_id']))
+            report = audio_source_report(source, result['downloaded'])
+        get_download_stats().record_audio_source(report)
+
+        saved = f"，节省 {report['saved'] / 1024 / 1024:.1f}MB" if report['saved'] else ""
+        await ctx.info(f"音频来源: {report['kind']}，下载 {report['bytes'] / 1024 / 1024:.1f}MB{saved}")
         return filepath
     
     def extract_audio(self, video_path: Path) -> Path:
         """从视频文件中提取音频"""
-        audio_path = video_path.with_suffix('.mp3')
+        profile = get_audio_profile()
+        audio_path = video_path.with_suffix(profile.suffix)
         
         try:
             (
-                ffmpeg
-                .input(str(video_path))
-                .output(str(audio_path), acodec='libmp3lame', q=0)
+                encode_audio(ffmpeg.input(str(video_path)), str(audio_path), profile)
                 .run(capture_stdout=True, capture_stderr=True, overwrite_output=True)
             )
             return audio_path
         except Exception as e:
             raise Exception(f"提取音频时出错: {str(e)}")
     
-    def extract_text_from_video_url(self, video_url: str) -> str:
-        """从视频URL中提取文字（使用阿里云百炼API）"""
+    async def extract_text_from_video_url(self, video_url: str, ctx: Optional[Context] = None) -> str:
+        """
+        从视频URL中提取文字（使用阿里云百炼API）
+        
+        提交任务后按指数退避轮询，等待期间不阻塞其他工具调用；
+        调用被取消时会一并取消排队中的识别任务。
+        """
+        async def report_progress(elapsed: float):
+            if ctx is not None:
+                await ctx.report_progress(elapsed, message=f"语音识别中，已等待 {elapsed:.0f} 秒")
+        
         try:
-            # 发起异步转录任务
-            task_response = dashscope.audio.asr.Transcription.async_call(
-                model=self.model,
-                file_urls=[video_url],
-                language_hints=['zh', 'en']
-            )
-            
-            # 等待转录完成
-            transcription_response = dashscope.audio.asr.Transcription.wait(
-                task=task_response.output.task_id
-            )
-            
-            if transcription_response.status_code == HTTPStatus.OK:
-                # 获取转录结果
-                for transcription in transcription_response.output['results']:
-                    url = transcription['transcription_url']
-                    result = json.loads(request.urlopen(url).read().decode('utf8'))
-                    
-                    # 保存结果到临时文件
-                    temp_json_path = self.temp_dir / 'transcription.json'
-                    with open(temp_json_path, 'w') as f:
-                        json.dump(result, f, indent=4, ensure_ascii=False)
-                    
-                    # 提取文本内容
-                    if 'transcripts' in result and len(result['transcripts']) > 0:
-                        return result['transcripts'][0]['text']
-                    else:
-                        return "未识别到文本内容"
-                        
-            else:
-                raise Exception(f"转录失败: {transcription_response.output.message}")
-                
+            result = await self.backend.transcribe_async(video_url, progress=report_progress)
+            return result['text']
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             raise Exception(f"提取文字时出错: {str(e)}")
     
+    async def extract_texts_from_video_urls(self, video_urls: List[str]) -> list:
+        """
+        批量识别视频URL：按百炼单任务上限分组提交，各组并发等待
+        
+        返回:
+        - 与 video_urls 顺序一致的列表，每项为文本或 Exception
+        """
+        chunks = [video_urls[i:i + DASHSCOPE_MAX_FILE_URLS] for i in range(0, len(video_urls), DASHSCOPE_MAX_FILE_URLS)]
+        chunk_results = await asyncio.gather(
+            *(self.backend.transcribe_many_async(chunk) for chunk in chunks),
+            return_exceptions=True,
+        )
+        texts = []
+        for chunk, results in zip(chunks, chunk_results):
+            if isinstance(results, BaseException):
+                texts.extend([results] * len(chunk))
+            else:
+                texts.extend(r if isinstance(r, Exception) else r['text'] for r in results)
+        return texts
+    
+    async def extract_text_locally(self, video_info: dict, backend, ctx: Context) -> str:
+        """下载音频来源、提取音频后交给本地识别后端"""
+        video_path = await self.download_audio_source(video_info, ctx)
+        audio_path = None
+        try:
+            audio_path = await asyncio.to_thread(self.extract_audio, video_path)
+            return (await backend.transcribe_async(audio_path))['text']
+        finally:
+            self.cleanup_files(*[p for p in (video_path, audio_path) if p is not None])
+    
     def cleanup_files(self, *file_paths: Path):
         """清理指定的文件"""
         for file_path in file_paths:
@@ -215,6 +305,12 @@ def get_douyin_download_link(share_link: str) -> str:
             "video_id": video_info["video_id"],
             "title": video_info["title"],
             "download_url": video_info["url"],
+            "mirrors": video_info.get("urls", []),
+            "duration": video_info.get("duration", 0),
+            "author": video_info.get("author", ""),
+            "cover": video_info.get("cover", ""),
+            # 图集作品每张图片的下载地址（取第一个镜像）
+            "images": [urls[0] for urls in video_info.get("images", [])],
             "description": f"视频标题: {video_info['title']}",
             "usage_tip": "可以直接使用此链接下载无水印视频"
         }, ensure_ascii=False, indent=2)
@@ -226,10 +322,53 @@ def get_douyin_download_link(share_link: str) -> str:
         }, ensure_ascii=False, indent=2)
 
 
+@mcp.tool()
+async def download_douyin_images(
+    share_link: str,
+    output_dir: str = "./output",
+    ctx: Context = None
+) -> str:
+    """
+    下载抖音图集作品的全部图片
+    
+    参数:
+    - share_link: 抖音图集分享链接或包含链接的文本
+    - output_dir: 保存目录（可选，默认 ./output），图片保存在其中以作品ID命名的文件夹
+    
+    返回:
+    - 包含图片路径列表的JSON字符串
+    """
+    try:
+        processor = DouyinProcessor("")
+        video_info = await processor.parse_share_url_async(share_link)
+        if not video_info.get("images"):
+            raise ValueError("该作品不是图集，请使用视频下载链接")
+        
+        folder = Path(output_dir).expanduser() / video_info["video_id"]
+        await ctx.info(f"正在下载 {len(video_info['images'])} 张图片...")
+        paths = await download_images_async(video_info["images"], folder, HEADERS)
+        
+        return json.dumps({
+            "status": "success",
+            "video_id": video_info["video_id"],
+            "title": video_info["title"],
+            "folder": str(folder.resolve()),
+            "images": [str(path.resolve()) for path in paths]
+        }, ensure_ascii=False, indent=2)
+        
+    except Exception as e:
+        await ctx.error(f"下载图集失败: {str(e)}")
+        return json.dumps({
+            "status": "error",
+            "error": f"下载图集失败: {str(e)}"
+        }, ensure_ascii=False, indent=2)
+
+
 @mcp.tool()
 async def extract_douyin_text(
     share_link: str,
     model: Optional[str] = None,
+    use_cache: bool = True,
     ctx: Context = None
 ) -> str:
     """
@@ -238,6 +377,7 @@ async def extract_douyin_text(
     参数:
     - share_link: 抖音分享链接或包含链接的文本
     - model: 语音识别模型（可选，默认使用paraformer-v2）
+    - use_cache: 是否使用文案缓存（可选，默认 true；设为 false 强制重新识别）
     
     返回:
     - 提取的文本内容
@@ -253,21 +393,131 @@ async def extract_douyin_text(
         processor = DouyinProcessor(api_key, model)
         
         # 解析视频链接
-        ctx.info("正在解析抖音分享链接...")
-        video_info = processor.parse_share_url(share_link)
+        await ctx.info("正在解析抖音分享链接...")
+        video_info = await processor.parse_share_url_async(share_link)
+        
+        # 文案缓存按实际使用的识别后端区分，本地模型和远程模型的结果互不复用
+        backend = select_backend(processor.backend, video_info.get('duration'))
+        transcript_cache = get_transcript_cache()
+        if use_cache:
+            cached_text = transcript_cache.get_by_video(video_info['video_id'], backend.model_key, LANGUAGE_HINTS)
+            if cached_text is not None:
+                await ctx.info("命中文案缓存")
+                return cached_text
         
-        # 直接使用视频URL进行文本提取
-        ctx.info("正在从视频中提取文本...")
-        text_content = processor.extract_text_from_video_url(video_info['url'])
+        async def transcribe() -> str:
+            if backend.accepts_url:
+                # 直接使用视频URL进行文本提取
+                await ctx.info("正在从视频中提取文本...")
+                text = await processor.extract_text_from_video_url(audio_source_url(video_info), ctx)
+            else:
+                await ctx.info("短视频，使用本地模型识别...")
+                text = await processor.extract_text_locally(video_info, backend, ctx)
+            transcript_cache.put(video_info['video_id'], backend.model_key, text, LANGUAGE_HINTS)
+            return text
+
+        # 同一视频正在被其他调用提取时，等待那次的结果
+        flight_key = (video_info['video_id'], backend.model_key)
+        if _extract_flight.in_flight(flight_key):
+            await ctx.info("该视频正在提取中，等待结果...")
+        text_content = await _extract_flight.do_async(flight_key, transcribe)
         
-        ctx.info("文本提取完成!")
+        await ctx.info("文本提取完成!")
         return text_content
         
     except Exception as e:
-        ctx.error(f"处理过程中出现错误: {str(e)}")
+        await ctx.error(f"处理过程中出现错误: {str(e)}")
         raise Exception(f"提取抖音视频文本失败: {str(e)}")
 
 
+@mcp.tool()
+async def extract_douyin_text_batch(
+    share_links: List[str],
+    model: Optional[str] = None,
+    use_cache: bool = True,
+    ctx: Context = None
+) -> str:
+    """
+    批量从抖音分享链接提取视频中的文本内容
+    
+    参数:
+    - share_links: 抖音分享链接或分享文本列表（一条文本中有多个链接时逐个处理）
+    - model: 语音识别模型（可选，默认使用paraformer-v2）
+    - use_cache: 是否使用文案缓存（可选，默认 true）
+    
+    返回:
+    - JSON 数组，每项包含 share_link、status、video_id、title、text、cached、error，
+      顺序与展开后的链接一致；相同视频只识别一次
+    
+    解析 → 识别两个阶段流水线执行：每个链接解析完成后立即进入识别，不等待其他链接；
+    未命中缓存的视频按短时间窗口合并为百炼批量任务提交，每个结果完成时即报告进度。
+    
+    注意: 需要设置环境变量 API_KEY
+    """
+    api_key = os.getenv('API_KEY')
+    if not api_key:
+        raise ValueError("未设置环境变量 API_KEY，请在配置中添加阿里云百炼API密钥")
+    
+    processor = DouyinProcessor(api_key, model)
+    transcript_cache = get_transcript_cache()
+    links = extract_share_urls(share_links)
+    results = [
+        {"share_link": link, "status": "error", "video_id": "", "title": "", "text": "", "cached": False, "error": ""}
+        for link in links
+    ]
+    resolve_limit = asyncio.Semaphore(BATCH_RESOLVE_CONCURRENCY)
+    local_limit = asyncio.Semaphore(BATCH_AUDIO_CONCURRENCY)
+    remote = _SubmitWindow(processor.extract_texts_from_video_urls, BATCH_SUBMIT_WINDOW, DASHSCOPE_MAX_FILE_URLS)
+    videos = {}
+    
+    async def transcribe(video_info: dict, backend) -> tuple:
+        # 命中文案缓存的视频直接返回；缓存按实际使用的后端区分
+        cached_text = transcript_cache.get_by_video(video_info['video_id'], backend.model_key, LANGUAGE_HINTS) if use_cache else None
+        if cached_text is not None:
+            return cached_text, True
+        if backend.accepts_url:
+            text = await remote.transcribe(audio_source_url(video_info))
+        else:
+            # 短视频按配置交给本地模型
+            async with local_limit:
+                text = await processor.extract_text_locally(video_info, backend, ctx)
+        transcript_cache.put(video_info['video_id'], backend.model_key, text, LANGUAGE_HINTS)
+        return text, False
+    
+    async def run(index: int, link: str) -> int:
+        result = results[index]
+        try:
+            async with resolve_limit:
+                video_info = await processor.parse_share_url_async(link)
+            result.update(video_id=video_info["video_id"], title=video_info["title"])
+            backend = select_backend(processor.backend, video_info.get('duration'))
+            task = videos.get(video_info["video_id"])
+            if task is None:
+                # 批次内按 video_id 去重；与其他调用同时提取同一视频时也只识别一次
+                task = videos[video_info["video_id"]] = asyncio.ensure_future(_extract_flight.do_async(
+                    (video_info['video_id'], backend.model_key), transcribe, video_info, backend))
+            text, cached = await asyncio.shield(task)
+            result.update(status="success", text=text, cached=cached)
+        except Exception as e:
+            result["error"] = str(e)
+        return index
+    
+    await ctx.info(f"正在处理 {len(links)} 个分享链接...")
+    tasks = [asyncio.ensure_future(run(index, link)) for index, link in enumerate(links)]
+    try:
+        for finished, next_result in enumerate(asyncio.as_completed(tasks), 1):
+            result = results[await next_result]
+            title = result["title"] or result["share_link"]
+            await ctx.report_progress(finished, len(links),
+                                      message=f"{'完成' if result['status'] == 'success' else '失败'}: {title}")
+    finally:
+        for task in [*tasks, *videos.values()]:
+            task.cancel()
+        await asyncio.gather(*tasks, *videos.values(), return_exceptions=True)
+        await remote.aclose()
+    return json.dumps(results, ensure_ascii=False, indent=2)
+
+
 @mcp.tool()
 def parse_douyin_video_info(share_link: str) -> str:
     """
@@ -287,6 +537,7 @@ def parse_douyin_video_info(share_link: str) -> str:
             "video_id": video_info["video_id"],
             "title": video_info["title"],
             "download_url": video_info["url"],
+            "images": [urls[0] for urls in video_info.get("images", [])],
             "status": "success"
         }, ensure_ascii=False, indent=2)
         
@@ -337,8 +588,10 @@ def douyin_text_extraction_guide() -> str:
 
 ## 工具说明
 - `extract_douyin_text`: 完整的文本提取流程（需要API密钥）
+- `extract_douyin_text_batch`: 批量提取多个链接的文本，相同视频只识别一次（需要API密钥）
 - `get_douyin_download_link`: 获取无水印视频下载链接（无需API密钥）
 - `parse_douyin_video_info`: 仅解析视频基本信息
+- `download_douyin_images`: 下载图集作品的全部图片（无需API密钥）
 - `douyin://video/{video_id}`: 获取指定视频的详细信息
 
 ## Claude Desktop 配置示例
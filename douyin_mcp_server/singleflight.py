@@ -0,0 +1,100 @@
+"""
+请求合并（single-flight）
+
+同一个键上已经有相同的调用在进行时，后来的调用不再重复执行，而是等待这次调用的结果
+（或异常）。用于热门链接被大量并发解析、同一视频被同时提取等场景。
+只在进程内生效；结果会分发给所有等待方，可变对象需要调用方自行复制。
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """按键合并进行中的调用，同步和异步调用分别合并"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.counters = {"calls": 0, "executions": 0, "coalesced": 0}
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+        self._futures: dict = {}
+        _registry[name] = self
+
+    def in_flight(self, key: Hashable) -> bool:
+        """该键上是否有调用正在进行"""
+        with self._lock:
+            return key in self._calls or any(k[1] == key for k in self._futures)
+
+    def _count(self, leader: bool) -> None:
+        self.counters["calls"] += 1
+        self.counters["executions" if leader else "coalesced"] += 1
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """执行 fn(*args, **kwargs)；同一键上已有调用在进行时等待它的结果"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count(leader)
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def do_async(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        do 的异步版本
+
+        调用在独立的任务中执行，某个等待方被取消不会影响其他等待方
+        """
+        flight_key = (asyncio.get_running_loop(), key)
+        with self._lock:
+            future = self._futures.get(flight_key)
+            leader = future is None
+            if leader:
+                future = self._futures[flight_key] = asyncio.ensure_future(fn(*args, **kwargs))
+                future.add_done_callback(lambda f: self._finish(flight_key, f))
+            self._count(leader)
+        return await asyncio.shield(future)
+
+    def _finish(self, flight_key: tuple, future: asyncio.Future) -> None:
+        with self._lock:
+            self._futures.pop(flight_key, None)
+        # 所有等待方都已取消时也要取走异常，避免 "exception was never retrieved" 警告
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counters, "in_flight": len(self._calls) + len(self._futures)}
+
+
+_registry: dict[str, SingleFlight] = {}
+
+
+def singleflight_stats() -> dict:
+    """所有合并器的调用统计，按名称分组"""
+    return {name: flight.stats() for name, flight in _registry.items()}
@@ -0,0 +1,127 @@
+"""
+SQLite 连接池
+
+每次访问都 sqlite3.connect() 需要重新打开文件、读取 schema，已编译的语句也随连接一起丢弃。
+SQLitePool 维护少量长连接：
+- WAL 模式，读写互不阻塞；synchronous=NORMAL，提交时不再每次 fsync（WAL 检查点时才同步）
+- 多个写入方由 busy_timeout 排队等待，写事务以 BEGIN IMMEDIATE 开始，避免读锁升级时死锁
+- 每个连接保留语句缓存（cached_statements），同一条 SQL 重复执行时不再重新编译
+
+用法:
+- connection(): 借出一个连接（自动提交模式），用完归还；同一线程内嵌套借用时复用同一个连接
+- transaction(): 借出连接并开启写事务，正常结束时提交，抛出异常时回滚；嵌套时并入外层事务
+- run(): 在连接池自己的线程池中执行同步函数，供 async 代码调用，不阻塞事件循环
+"""
+
+import asyncio
+import functools
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+
+class SQLitePool:
+    """固定大小的 SQLite 连接池"""
+
+    def __init__(self, db_path: Path, size: int = 4, busy_timeout: float = 5.0, cached_statements: int = 256):
+        self.db_path = Path(db_path)
+        self.size = max(1, size)
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self.counters = {"borrows": 0, "waits": 0}
+        self._lock = threading.Lock()
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._connections: list[sqlite3.Connection] = []
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="sqlite")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = len(self._connections) < self.size
+            if create:
+                conn = self._connect()
+                self._connections.append(conn)
+            else:
+                self.counters["waits"] += 1
+        return conn if create else self._idle.get()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """借出一个连接，同一线程内嵌套调用时返回已借出的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self._acquire()
+        with self._lock:
+            self.counters["borrows"] += 1
+        self._local.conn = conn
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            # 不能带着未结束的事务（和写锁）归还
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """在一个写事务中执行，正常结束提交，异常时回滚"""
+        with self.connection() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """在连接池的线程中执行 fn(*args, **kwargs)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "size": self.size,
+                "connections": len(self._connections),
+                "idle": self._idle.qsize(),
+            }
+
+    def close(self) -> None:
+        """等待正在执行的调用结束后关闭全部连接"""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
@@ -0,0 +1,217 @@
+"""
+视频信息记录
+
+分享页 item_list[0] 中除播放地址外，还有时长、各清晰度（bit_rate）、作者、封面、
+背景音乐和图集图片等信息。VideoInfo 用 __slots__ 保存这些字段，
+select_audio_source() 据此为只需要文案的场景选择下载量最小的来源。
+to_dict() / from_dict() 用于写入缓存和接口返回：始终包含 url、title、video_id、duration
+（与旧版解析结果兼容）以及镜像地址和清晰度列表（重新解析后 dict.update 能整体替换过期地址），
+其余字段为空时省略。
+"""
+
+import re
+from typing import Optional
+
+
+def _url_list(addr: Optional[dict]) -> list:
+    """取出 url_list 中的全部镜像地址（去掉水印）"""
+    if not addr:
+        return []
+    return [url.replace("playwm", "play") for url in addr.get("url_list") or [] if url]
+
+
+def _is_original_sound(music: dict, author: dict, duration: float) -> bool:
+    """背景音乐是否就是作品自身的原声（借用的音乐不能代替视频音轨）"""
+    if not music or not (music.get("is_original_sound") or "原声" in music.get("title", "")):
+        return False
+    owner_matches = (
+        (music.get("sec_uid") and music.get("sec_uid") == author.get("sec_uid"))
+        or (music.get("owner_id") and music.get("owner_id") == author.get("uid"))
+    )
+    # 原声截取过的片段比视频短，不能用来识别全文
+    music_duration = music.get("duration") or 0
+    return bool(owner_matches) and (not duration or not music_duration or music_duration >= duration - 1)
+
+
+def sanitize_title(desc: str, video_id: str) -> str:
+    """视频描述用作标题和文件名，替换文件名中的非法字符"""
+    desc = (desc or "").strip() or f"douyin_{video_id}"
+    return re.sub(r'[\\/:*?"<>|]', '_', desc)
+
+
+class BitRate:
+    """一个清晰度版本"""
+
+    __slots__ = ("gear_name", "bit_rate", "width", "height", "size", "codec", "urls")
+
+    def __init__(self, gear_name: str = "", bit_rate: int = 0, width: int = 0, height: int = 0,
+                 size: int = 0, codec: str = "", urls: Optional[list] = None):
+        self.gear_name = gear_name
+        self.bit_rate = bit_rate
+        self.width = width
+        self.height = height
+        # 文件大小（字节），分享页未给出时为 0
+        self.size = size
+        self.codec = codec
+        self.urls = urls or []
+
+    @classmethod
+    def from_item(cls, item: dict) -> "BitRate":
+        addr = item.get("play_addr") or {}
+        return cls(
+            gear_name=item.get("gear_name", ""),
+            bit_rate=item.get("bit_rate", 0),
+            width=addr.get("width", 0),
+            height=addr.get("height", 0),
+            size=addr.get("data_size", 0),
+            codec="h265" if item.get("is_h265") else "h264",
+            urls=_url_list(addr),
+        )
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BitRate":
+        return cls(**{name: data[name] for name in cls.__slots__ if name in data})
+
+    def __repr__(self) -> str:
+        return f"BitRate({self.gear_name!r}, {self.bit_rate}, {self.width}x{self.height})"
+
+
+class VideoInfo:
+    """分享页解析出的视频（或图集）信息"""
+
+    __slots__ = (
+        "video_id", "title", "url", "duration",
+        "urls", "size", "bit_rates", "width", "height",
+        "author", "author_id", "cover",
+        "music_title", "music_url", "music_original", "images",
+    )
+
+    # to_dict() 中始终保留的字段
+    _REQUIRED = ("url", "title", "video_id", "duration", "urls", "bit_rates")
+
+    def __init__(self, video_id: str, title: str = "", url: str = "", duration: float = 0,
+                 urls: Optional[list] = None, size: int = 0, bit_rates: Optional[list] = None,
+                 width: int = 0, height: int = 0, author: str = "", author_id: str = "", cover: str = "",
+                 music_title: str = "", music_url: str = "", music_original: bool = False,
+                 images: Optional[list] = None):
+        self.video_id = video_id
+        self.title = title
+        # 默认播放地址（最高清晰度），即 urls[0]
+        self.url = url
+        # 时长（秒），已知时无需再 ffprobe
+        self.duration = duration
+        # 默认播放地址的全部 CDN 镜像
+        self.urls = urls or ([url] if url else [])
+        # 默认播放地址的文件大小（字节），分享页未给出时为 0
+        self.size = size
+        # 各清晰度版本，list[BitRate]
+        self.bit_rates = bit_rates or []
+        self.width = width
+        self.height = height
+        self.author = author
+        self.author_id = author_id
+        self.cover = cover
+        self.music_title = music_title
+        self.music_url = music_url
+        # 背景音乐是否为作品原声（此时 music_url 可以代替视频音轨用于识别）
+        self.music_original = music_original
+        # 图集图片，每张图片一个镜像地址列表
+        self.images = images or []
+
+    @classmethod
+    def from_item(cls, item: dict, video_id: str) -> "VideoInfo":
+        """由分享页 item_list[0] 构造"""
+        video = item.get("video") or {}
+        play_addr = video.get("play_addr") or {}
+        urls = _url_list(play_addr)
+        author = item.get("author") or {}
+        music = item.get("music") or {}
+        cover = _url_list(video.get("cover") or video.get("origin_cover"))
+        music_urls = _url_list(music.get("play_url"))
+        images = [_url_list(image) for image in item.get("images") or []]
+        duration = video.get("duration", 0) / 1000
+        return cls(
+            video_id=video_id,
+            title=sanitize_title(item.get("desc", ""), video_id),
+            url=urls[0] if urls else "",
+            duration=duration,
+            urls=urls,
+            size=play_addr.get("data_size", 0),
+            bit_rates=[BitRate.from_item(b) for b in video.get("bit_rate") or []],
+            width=video.get("width", 0),
+            height=video.get("height", 0),
+            author=author.get("nickname", ""),
+            author_id=author.get("sec_uid", ""),
+            cover=cover[0] if cover else "",
+            music_title=music.get("title", ""),
+            music_url=music_urls[0] if music_urls else "",
+            music_original=_is_original_sound(music, author, duration),
+            images=[image for image in images if image],
+        )
+
+    @property
+    def is_image_set(self) -> bool:
+        """是否为图集（note）作品"""
+        return bool(self.images)
+
+    def to_dict(self) -> dict:
+        """转为可 JSON 序列化的字典，省略空字段"""
+        data = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if name == "bit_rates":
+                value = [b.to_dict() for b in value]
+            if value or name in self._REQUIRED:
+                data[name] = value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "VideoInfo":
+        """由 to_dict() 的结果（或只有 url/title/video_id 的旧缓存）构造"""
+        fields = {name: data[name] for name in cls.__slots__ if name in data}
+        fields["bit_rates"] = [BitRate.from_dict(b) for b in fields.get("bit_rates") or []]
+        return cls(**fields)
+
+    def __repr__(self) -> str:
+        return f"VideoInfo({self.video_id!r}, {self.title!r}, duration={self.duration})"
+
+
+def select_audio_source(video_info: dict, smallest: bool = True) -> dict:
+    """
+    为只需要音轨（识别文案）的场景选择下载量最小的来源
+
+    依次考虑：作品原声的音乐地址、码率最低的清晰度版本、默认播放地址（smallest=False 时只用默认播放地址）。
+
+    返回:
+    - {'kind': 'music' / 'bit_rate' / 'default', 'urls': 镜像地址列表, 'gear_name': 清晰度名称,
+       'size': 预计大小, 'full_size': 默认播放地址大小}（大小未知时为 0）
+    """
+    info = VideoInfo.from_dict(video_info)
+    full_size = info.size or next((b.size for b in info.bit_rates if info.url in b.urls), 0)
+    source = {"kind": "default", "urls": info.urls, "gear_name": "", "size": full_size, "full_size": full_size}
+    if not smallest:
+        return source
+    if info.music_original and info.music_url:
+        source.update(kind="music", urls=[info.music_url], size=0)
+        return source
+    renditions = [b for b in info.bit_rates if b.urls]
+    if renditions:
+        lowest = min(renditions, key=lambda b: (b.bit_rate or float("inf"), b.size or float("inf")))
+        if lowest.urls != info.urls:
+            source.update(kind="bit_rate", urls=lowest.urls, gear_name=lowest.gear_name, size=lowest.size)
+    return source
+
+
+def audio_source_report(source: dict, downloaded: int) -> dict:
+    """记录一次音频来源的实际下载量，以及相对默认播放地址节省的字节数（默认大小未知时为 None）"""
+    full_size = source.get("full_size") or 0
+    return {
+        "kind": source["kind"],
+        "gear_name": source.get("gear_name", ""),
+        "bytes": downloaded,
+        "full_size": full_size,
+        "saved": max(0, full_size - downloaded) if full_size else None,
+    }
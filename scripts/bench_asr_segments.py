@@ -0,0 +1,139 @@
+"""
+分段并发识别（douyin-video/scripts/douyin_downloader.py）的耗时基准
+
+用 ffmpeg 生成一段带间隔静音的测试音频，在本地启动一个模拟识别接口（每个请求固定延迟），
+按不同的 DOUYIN_ASR_CONCURRENCY 分段识别，报告各并发数下的耗时、同时进行的请求数和相对串行的加速比。
+片段顺序、503 重试和限流由 tests/test_asr_segments.py 检查。
+
+用法:
+    python scripts/bench_asr_segments.py [--segments 8] [--latency 0.3]
+"""
+
+import argparse
+import functools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "douyin-video" / "scripts"))
+
+# 只测量并发带来的加速，不限流
+os.environ["DOUYIN_ASR_RATE_LIMIT"] = "0"
+
+import douyin_downloader as d  # noqa: E402
+
+CLIP_SECONDS = 120
+
+
+class StubASR:
+    """模拟的识别接口：记录同时进行的请求数"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.reset()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                with stub.lock:
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                try:
+                    time.sleep(stub.latency)
+                    name = body.split(b'filename="', 1)[1].split(b'"', 1)[0].decode()
+                    out = json.dumps({"text": f"[{name}]"}).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(out)))
+                    self.end_headers()
+                    self.wfile.write(out)
+                finally:
+                    with stub.lock:
+                        stub.active -= 1
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1/audio/transcriptions"
+
+    def reset(self) -> None:
+        self.active = 0
+        self.max_active = 0
+
+
+def make_audio(processor: "d.DouyinProcessor") -> tuple:
+    """生成测试音频（每 5 秒有 1 秒静音），按流式提取的方式转码，返回 (音频路径, 音频信息)"""
+    source = processor.temp_dir / "source.wav"
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", f"sine=frequency=440:duration={CLIP_SECONDS}",
+         "-af", "volume='if(lt(mod(t,5),4),1,0)':eval=frame", str(source)],
+        check=True,
+    )
+
+    def chunks():
+        with open(source, "rb") as f:
+            while chunk := f.read(65536):
+                yield chunk
+
+    audio_path = processor.temp_dir / "audio.mp3"
+    return audio_path, d.transcode_stream(chunks(), audio_path, processor.audio_profile)
+
+
+def make_processor(url: str, temp_dir: Path, segments: int) -> "d.DouyinProcessor":
+    """在 temp_dir 中分段的处理器，片段时长调小，让测试音频分成约 segments 段"""
+    processor = d.DouyinProcessor("test-key", api_base_url=url)
+    processor.temp_dir.rmdir()
+    processor.temp_dir = temp_dir
+    temp_dir.mkdir(exist_ok=True)
+    seconds = CLIP_SECONDS / segments + 1
+    processor.split_audio = functools.partial(
+        d.DouyinProcessor.split_audio, processor, segment_duration=seconds)
+    processor.split_audio_async = functools.partial(
+        d.DouyinProcessor.split_audio_async, processor, segment_duration=seconds)
+    return processor
+
+
+def count_segments(text: str) -> int:
+    return len(text.strip("[]").split("]["))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--segments", type=int, default=8, help="分段数")
+    parser.add_argument("--latency", type=float, default=0.3, help="模拟接口每个请求的耗时（秒）")
+    args = parser.parse_args()
+
+    stub = StubASR(args.latency)
+    with tempfile.TemporaryDirectory() as tmp:
+        processor = make_processor(stub.url, Path(tmp), args.segments)
+        audio_path, info = make_audio(processor)
+        # 测试音频很短，把单次识别的上限调小以触发分段
+        d.MAX_AUDIO_DURATION = 10
+
+        walls = {}
+        for concurrency in (1, 4, 8):
+            d.ASR_CONCURRENCY = concurrency
+            stub.reset()
+            start = time.perf_counter()
+            text = processor.extract_text_from_audio(audio_path, show_progress=False, audio_info=dict(info))
+            walls[concurrency] = time.perf_counter() - start
+            print(f"并发 {concurrency}: {count_segments(text)} 段, {walls[concurrency]:.2f}s, "
+                  f"同时请求最多 {stub.max_active}, 加速 {walls[1] / walls[concurrency]:.1f}x")
+
+    stub.server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
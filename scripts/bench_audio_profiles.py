@@ -0,0 +1,79 @@
+"""
+音频配置（douyin_mcp_server/audio.py 中的 AUDIO_PROFILES）的编码耗时和体积对比
+
+用 ffmpeg 生成一段测试视频（44.1kHz 双声道 AAC，faststart），像流式提取那样按块喂给 transcode_stream，
+报告每种配置的编码耗时、输出体积、采样率和声道，以及相对 mp3-hq（旧行为）的比例。
+输出时长、采样率和 moov 在文件尾时的报错由 tests/test_audio_profiles.py 检查。
+
+测试音频是合成的正弦波而不是人声，opus 等编码器的耗时和体积与真实视频会有差别。
+
+用法:
+    python scripts/bench_audio_profiles.py [--seconds 300]
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from douyin_mcp_server.audio import AUDIO_PROFILES, READ_CHUNK_SIZE, transcode_stream  # noqa: E402
+
+
+def make_video(path: Path, seconds: int) -> None:
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-y",
+         "-f", "lavfi", "-i", f"testsrc=size=320x240:rate=25:duration={seconds}",
+         "-f", "lavfi", "-i", f"sine=frequency=220:beep_factor=4:duration={seconds}",
+         "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-ar", "44100", "-ac", "2", "-shortest",
+         "-movflags", "+faststart", str(path)],
+        check=True,
+    )
+
+
+def chunks(path: Path):
+    with open(path, "rb") as f:
+        while chunk := f.read(READ_CHUNK_SIZE):
+            yield chunk
+
+
+def audio_stream(path: Path) -> tuple:
+    """输出文件的 (采样率, 声道)，从 ffmpeg -i 的日志中读取（不依赖 ffprobe）"""
+    stderr = subprocess.run(["ffmpeg", "-hide_banner", "-i", str(path)], capture_output=True).stderr.decode()
+    matched = re.search(r"Audio: .*?, (\d+) Hz, (\w+)", stderr)
+    return (int(matched.group(1)), matched.group(2)) if matched else (0, "-")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=int, default=300, help="测试视频时长（秒）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        video = tmp / "video.mp4"
+        make_video(video, args.seconds)
+        print(f"测试视频 {args.seconds} 秒, {video.stat().st_size // 1024} KB")
+
+        results = {}
+        for name, profile in AUDIO_PROFILES.items():
+            output = tmp / f"{name}{profile.suffix}"
+            start = time.perf_counter()
+            info = transcode_stream(chunks(video), output, profile)
+            elapsed = time.perf_counter() - start
+            results[name] = (elapsed, info["size"])
+            # Opus 解码时总是报告 48kHz，编码前的采样率只记录在文件头中
+            sample_rate, channels = audio_stream(output)
+            print(f"{name:8s} {elapsed:6.2f}s {info['size'] // 1024:7d} KB  {sample_rate}Hz {channels}")
+
+        hq_time, hq_size = results["mp3-hq"]
+        for name, (elapsed, size) in results.items():
+            print(f"{name:8s} 相对 mp3-hq: 耗时 {elapsed / hq_time:4.2f}x, 体积 {size / hq_size:4.2f}x")
+
+
+if __name__ == "__main__":
+    main()
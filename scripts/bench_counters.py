@@ -0,0 +1,67 @@
+"""
+写回计数器（douyin_mcp_server/counters.py）的 incr 耗时基准
+
+报告单线程 incr 的耗时，以及定期写入任务运行时多个线程同时 incr 的吞吐和写入次数。
+start() / stop() 与 incr 并发时不丢失计数由 tests/test_counters.py 检查。
+
+用法:
+    python scripts/bench_counters.py [--threads 8] [--seconds 2]
+"""
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from douyin_mcp_server.counters import WriteBehindCounters  # noqa: E402
+
+
+def bench_incr_cost(n: int = 200_000) -> None:
+    counters = WriteBehindCounters(lambda deltas: None, max_pending=n + 1)
+    start = time.perf_counter()
+    for _ in range(n):
+        counters.incr("page_views")
+    print(f"单线程 incr: {(time.perf_counter() - start) / n * 1e6:.2f} µs/次")
+
+
+async def bench_concurrent(threads: int, seconds: float) -> None:
+    counters = WriteBehindCounters(lambda deltas: None, interval=0.5, max_pending=1000)
+    stop = threading.Event()
+    done = [0] * threads
+
+    def worker(index: int) -> None:
+        while not stop.is_set():
+            for _ in range(100):
+                counters.incr(index % 3)
+            done[index] += 100
+
+    counters.start()
+    workers = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    await asyncio.sleep(seconds)
+    stop.set()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    await counters.stop()
+    total = sum(done)
+    print(f"{threads} 个线程并发 incr: {total} 次（{total / elapsed:.0f} 次/秒），写入 {counters.counters['flushes']} 次")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=2, help="并发 incr 的持续时间")
+    args = parser.parse_args()
+    bench_incr_cost()
+    asyncio.run(bench_concurrent(args.threads, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+视频下载代理（web/app.py 的 /api/video/download）的吞吐和内存基准
+
+在本地启动一个模拟 CDN，并在线程中用 uvicorn 运行 WebUI（临时数据库和缓存目录），
+报告 1 / 8 / 32 个并发完整下载的总吞吐，以及进程内存峰值的增长（响应体逐块转发，
+内存不应随视频大小和并发数增长）。Range、If-Range、HEAD 和 416 的转发由 tests/test_download_proxy.py 检查。
+
+用法:
+    python scripts/bench_download_proxy.py [--size-mb 24] [--port 18790]
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "web"))
+
+# 缓存和数据库都放在临时目录，不影响 web/ 下的文件
+os.environ["DOUYIN_CACHE_DIR"] = tempfile.mkdtemp()
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+import app as web  # noqa: E402
+
+FILENAME = "测试 视频.mp4"
+
+
+class StubCDN:
+    """返回完整文件的模拟 CDN"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        cdn = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "video/mp4")
+                self.send_header("Content-Length", str(len(cdn.data)))
+                self.end_headers()
+                try:
+                    for offset in range(0, len(cdn.data), 65536):
+                        self.wfile.write(cdn.data[offset:offset + 65536])
+                except OSError:
+                    pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/video.mp4"
+
+
+def rss_mb() -> float:
+    """当前进程的常驻内存（MB），从 /proc 读取（仅 Linux）"""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 1024 / 1024
+
+
+async def download(client: httpx.AsyncClient, params: dict) -> int:
+    size = 0
+    async with client.stream("GET", "/api/video/download", params=params) as response:
+        async for chunk in response.aiter_raw():
+            size += len(chunk)
+    return size
+
+
+async def bench_throughput(base_url: str, cdn: StubCDN) -> None:
+    params = {"url": cdn.url, "filename": FILENAME}
+    for concurrency in (1, 8, 32):
+        before = peak = rss_mb()
+        async with httpx.AsyncClient(base_url=base_url, timeout=120,
+                                     limits=httpx.Limits(max_connections=concurrency)) as client:
+            start = time.perf_counter()
+            downloads = asyncio.gather(*(download(client, params) for _ in range(concurrency)))
+            while not downloads.done():
+                peak = max(peak, rss_mb())
+                await asyncio.wait([downloads], timeout=0.05)
+            sizes = downloads.result()
+            elapsed = time.perf_counter() - start
+        total_mb = sum(sizes) / 1024 / 1024
+        growth = peak - before
+        print(f"并发 {concurrency:2d}: {total_mb / elapsed:6.0f} MB/s，共 {total_mb:.0f} MB，"
+              f"内存峰值增长 {growth:.0f} MB（整段缓冲时约为 {total_mb:.0f} MB）")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=24, help="模拟视频的大小（MB）")
+    parser.add_argument("--port", type=int, default=18790)
+    args = parser.parse_args()
+
+    cdn = StubCDN(os.urandom(args.size_mb * 1024 * 1024))
+    web.DB_PATH = Path(tempfile.mkdtemp()) / "stats.db"
+    server = uvicorn.Server(uvicorn.Config(web.app, host="127.0.0.1", port=args.port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        asyncio.run(bench_throughput(base_url, cdn))
+    finally:
+        server.should_exit = True
+        thread.join()
+        cdn.server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+WebUI 提取流程（web/app.py）进行中的接口延迟基准
+
+在本地启动模拟的分享页、CDN 和识别接口（都故意放慢），在线程中用 uvicorn 运行 WebUI（临时数据库，不写缓存），
+同时发起多个 /api/video/extract 请求，期间每隔 50ms 请求一次 /api/health，
+报告提取总耗时和 /api/health 在空闲时与提取进行中的延迟分布。
+事件循环不被阻塞由 tests/test_event_loop.py 检查。
+
+用法:
+    python scripts/bench_event_loop.py [--requests 8] [--seconds 60] [--port 18791]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "web"))
+
+# 不读写持久化缓存，每次都完整走一遍提取流程；不限制识别请求速率
+os.environ["DOUYIN_CACHE"] = "false"
+os.environ["DOUYIN_ASR_RATE_LIMIT"] = "0"
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+import app as web  # noqa: E402
+import douyin_downloader  # noqa: E402
+from douyin_mcp_server import resolver  # noqa: E402
+
+ASR_LATENCY = 1.0
+CDN_RATE = 2 * 1024 * 1024
+
+
+class Stubs:
+    """模拟的分享页（约 500 KB，分块慢速发送）、CDN（限速）和识别接口（固定延迟）"""
+
+    def __init__(self, video: bytes, duration_ms: int):
+        stubs = self
+        self.video = video
+        padding = "".join(f"<script>var p{i}='{'x' * 1000}';</script>" for i in range(500))
+
+        def page(video_id: str) -> bytes:
+            item = {
+                "desc": f"测试视频 {video_id}",
+                "video": {"play_addr": {"url_list": [f"{stubs.base}/video/{video_id}.mp4"]}, "duration": duration_ms},
+            }
+            router = {"loaderData": {"video_(id)/page": {"videoInfoRes": {"item_list": [item]}}}}
+            return (padding + f"<script>window._ROUTER_DATA = {json.dumps(router)}</script></html>").encode()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def send_body(self, body: bytes, content_type: str, chunk: int, delay: float) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    for offset in range(0, len(body), chunk):
+                        self.wfile.write(body[offset:offset + chunk])
+                        time.sleep(delay)
+                except OSError:
+                    pass
+
+            def do_GET(self):
+                if self.path.startswith("/share/video/"):
+                    self.send_body(page(self.path.rstrip("/").split("/")[-1]), "text/html", 16384, 0.01)
+                else:
+                    self.send_body(stubs.video, "video/mp4", 65536, 65536 / CDN_RATE)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                time.sleep(ASR_LATENCY)
+                self.send_body(json.dumps({"text": "模拟识别结果"}).encode(), "application/json", 65536, 0)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+
+
+def make_video(path: Path, seconds: int) -> None:
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-y",
+         "-f", "lavfi", "-i", f"testsrc=size=320x240:rate=25:duration={seconds}",
+         "-f", "lavfi", "-i", f"sine=frequency=220:beep_factor=4:duration={seconds}",
+         "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest", "-movflags", "+faststart", str(path)],
+        check=True,
+    )
+
+
+def probe_health(client: httpx.Client, stop: threading.Event) -> list:
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        client.get("/api/health").raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        stop.wait(0.05)
+    return latencies
+
+
+def summary(latencies: list) -> str:
+    latencies = sorted(latencies)
+    return (f"{len(latencies)} 次, p50 {latencies[len(latencies) // 2]:.1f} ms, "
+            f"p99 {latencies[int(len(latencies) * 0.99)]:.1f} ms, 最大 {latencies[-1]:.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=8, help="同时进行的提取请求数")
+    parser.add_argument("--seconds", type=int, default=60, help="测试视频时长（秒）")
+    parser.add_argument("--port", type=int, default=18791)
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp())
+    make_video(tmp / "video.mp4", args.seconds)
+    stubs = Stubs((tmp / "video.mp4").read_bytes(), args.seconds * 1000)
+    resolver.SHARE_PAGE_URL = stubs.base + "/share/video/{video_id}"
+    douyin_downloader.DEFAULT_API_BASE_URL = stubs.base + "/v1/audio/transcriptions"
+    web.DB_PATH = tmp / "stats.db"
+
+    server = uvicorn.Server(uvicorn.Config(web.app, host="127.0.0.1", port=args.port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{args.port}", timeout=300) as client:
+            stop = threading.Event()
+            threading.Timer(2, stop.set).start()
+            idle = probe_health(client, stop)
+            print(f"空闲时 /api/health: {summary(idle)}")
+
+            def extract(i: int) -> dict:
+                share = f"https://www.iesdouyin.com/share/video/{7300000000000000000 + i}/"
+                return client.post("/api/video/extract",
+                                   json={"url": share, "api_key": "test-key", "no_cache": True}).json()
+
+            stop = threading.Event()
+            with ThreadPoolExecutor(args.requests + 1) as pool:
+                probe = pool.submit(probe_health, client, stop)
+                start = time.perf_counter()
+                results = list(pool.map(extract, range(args.requests)))
+                elapsed = time.perf_counter() - start
+                stop.set()
+                busy = probe.result()
+    finally:
+        server.should_exit = True
+        thread.join()
+        stubs.server.shutdown()
+        web.close_db()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    failed = sum(1 for result in results if not result["success"])
+    print(f"{args.requests} 个提取请求（{args.seconds} 秒视频，失败 {failed} 个）用时 {elapsed:.1f}s")
+    print(f"提取期间 /api/health: {summary(busy)}")
+
+
+if __name__ == "__main__":
+    main()
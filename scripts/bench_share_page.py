@@ -0,0 +1,125 @@
+"""
+分享页解析（douyin_mcp_server/resolver.py）的耗时基准
+
+生成一个合成的分享页（前后各有大量无关脚本，中间是 window._ROUTER_DATA），对比旧写法
+（整页解码后用 DOTALL 正则截取，再 json.loads）和 parse_share_page 在 bytes / str 输入、
+使用或不使用 orjson 时的单次耗时，并报告按不同块大小边读边解析时读取的字节数。
+解析结果一致和提前停止读取由 tests/test_share_page.py 检查。
+
+用法:
+    python scripts/bench_share_page.py [--rounds 200]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# 不读写持久化缓存
+os.environ["DOUYIN_CACHE"] = "false"
+
+from douyin_mcp_server import resolver  # noqa: E402
+from douyin_mcp_server.video_info import VideoInfo  # noqa: E402
+
+VIDEO_ID = "7300000000000000000"
+
+
+def make_page() -> str:
+    """合成分享页：约 120 KB 的前置脚本、约 100 KB 的 _ROUTER_DATA、约 300 KB 的后续脚本"""
+    rng = random.Random(1)
+
+    def blob(n: int) -> str:
+        return "".join(rng.choice("abcdefghij ") for _ in range(n))
+
+    item = {
+        "aweme_id": VIDEO_ID,
+        "desc": "测试 视频 #话题",
+        "video": {
+            "play_addr": {"url_list": ["https://aweme.snssdk.com/aweme/v1/playwm/?video_id=v0"]},
+            "duration": 31500,
+            "bit_rate": [
+                {"gear_name": f"g{i}", "bit_rate": 1000 * i,
+                 "play_addr": {"url_list": [f"https://cdn.example.com/{i}/" + blob(200)] * 3}}
+                for i in range(8)
+            ],
+        },
+        "author": {"nickname": "作者", "avatar": {"url_list": [blob(300)] * 3}},
+        "comments": [{"text": blob(200), "user": {"name": blob(40)}} for _ in range(300)],
+    }
+    router = {"loaderData": {
+        "video_(id)/page": {"videoInfoRes": {"item_list": [item]}},
+        "other": {"items": [blob(100) for _ in range(200)]},
+    }}
+    head = "<html><head>" + "".join(f"<script>var a{i}='{blob(1000)}';</script>" for i in range(120))
+    tail = "".join(f"<script>var t{i}='{blob(1000)}';</script>" for i in range(300)) + "</body></html>"
+    return head + "<script>window._ROUTER_DATA = " + json.dumps(router, ensure_ascii=False) + "</script>" + tail
+
+
+_OLD_PATTERN = re.compile(r"window\._ROUTER_DATA\s*=\s*(.*?)</script>", re.DOTALL)
+
+
+def old_parse_share_page(data: bytes, video_id: str) -> dict:
+    """改动之前的写法：解码整页，正则截取后用标准库 json 解析"""
+    json_data = json.loads(_OLD_PATTERN.search(data.decode()).group(1).strip())
+    item = json_data["loaderData"]["video_(id)/page"]["videoInfoRes"]["item_list"][0]
+    return VideoInfo.from_item(item, video_id).to_dict()
+
+
+def bench(fn, rounds: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def bench_parse(data: bytes, html: str, rounds: int) -> None:
+    baseline = bench(lambda: old_parse_share_page(data, VIDEO_ID), rounds)
+    print(f"{'旧写法（解码 + 正则 + json）':36s} {baseline:7.3f} ms")
+
+    orjson = resolver.orjson
+    decoders = [("json", None)]
+    if orjson is None:
+        print("未安装 orjson，跳过 orjson 的对比")
+    else:
+        decoders.append(("orjson", orjson))
+    try:
+        for name, module in decoders:
+            resolver.orjson = module
+            for kind, page in (("bytes", data), ("str", html)):
+                label = f"parse_share_page（{kind} + {name}）"
+                ms = bench(lambda: resolver.parse_share_page(page, VIDEO_ID), rounds)
+                print(f"{label:36s} {ms:7.3f} ms  {baseline / ms:5.1f}x")
+    finally:
+        resolver.orjson = orjson
+
+
+def report_reader(data: bytes) -> None:
+    for size in (1, 7, 4096, 65536):
+        reader = resolver._RouterDataReader()
+        for offset in range(0, len(data), size):
+            if reader.feed(data[offset:offset + size]):
+                break
+        print(f"块大小 {size:5d}: 读取 {len(reader.buffer) // 1024} KB 后停止（整页 {len(data) // 1024} KB）")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200, help="每种写法解析的次数")
+    args = parser.parse_args()
+
+    html = make_page()
+    data = html.encode()
+    print(f"合成分享页 {len(data) // 1024} KB")
+    bench_parse(data, html, args.rounds)
+    report_reader(data)
+
+
+if __name__ == "__main__":
+    main()
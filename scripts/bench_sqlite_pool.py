@@ -0,0 +1,137 @@
+"""
+SQLite 连接池（douyin_mcp_server/sqlite_pool.py）的并发读写基准
+
+在临时数据库上让多个线程同时执行写事务（读取后加一再写回）和只读查询，报告吞吐、读写各自的 p99 延迟、
+错误数和最终计数，并与每次调用都 sqlite3.connect() 的写法（web/app.py 改用连接池之前的做法）对比。
+正确性（不丢失更新）由 tests/test_sqlite_pool.py 检查。
+
+用法:
+    python scripts/bench_sqlite_pool.py [--threads 8] [--calls 3000] [--pool-size 4]
+"""
+
+import argparse
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from douyin_mcp_server.sqlite_pool import SQLitePool  # noqa: E402
+
+ROWS = 100
+
+
+def init_db(path: Path) -> None:
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE counters (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.executemany("INSERT INTO counters(id, value) VALUES(?, 0)", [(i,) for i in range(ROWS)])
+
+
+def run_pool(path: Path, threads: int, calls: int, pool_size: int) -> dict:
+    pool = SQLitePool(path, size=pool_size)
+
+    def write() -> None:
+        with pool.transaction() as conn:
+            row_id = random.randrange(ROWS)
+            value = conn.execute("SELECT value FROM counters WHERE id = ?", (row_id,)).fetchone()[0]
+            # 嵌套的 transaction() 并入外层事务
+            with pool.transaction() as inner:
+                inner.execute("UPDATE counters SET value = ? WHERE id = ?", (value + 1, row_id))
+
+    def read() -> None:
+        with pool.connection() as conn:
+            conn.execute("SELECT SUM(value) FROM counters").fetchone()
+
+    try:
+        result = measure(write, read, threads, calls)
+        with pool.connection() as conn:
+            result["total"] = conn.execute("SELECT SUM(value) FROM counters").fetchone()[0]
+        result["pool"] = pool.stats()
+    finally:
+        pool.close()
+    return result
+
+
+def run_connect(path: Path, threads: int, calls: int) -> dict:
+    """每次调用打开一个新连接（默认的回滚日志模式和隐式事务）"""
+
+    def write() -> None:
+        conn = sqlite3.connect(path, timeout=5)
+        try:
+            row_id = random.randrange(ROWS)
+            conn.execute("BEGIN IMMEDIATE")
+            value = conn.execute("SELECT value FROM counters WHERE id = ?", (row_id,)).fetchone()[0]
+            conn.execute("UPDATE counters SET value = ? WHERE id = ?", (value + 1, row_id))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def read() -> None:
+        conn = sqlite3.connect(path, timeout=5)
+        try:
+            conn.execute("SELECT SUM(value) FROM counters").fetchone()
+        finally:
+            conn.close()
+
+    result = measure(write, read, threads, calls)
+    with sqlite3.connect(path) as conn:
+        result["total"] = conn.execute("SELECT SUM(value) FROM counters").fetchone()[0]
+    return result
+
+
+def measure(write, read, threads: int, calls: int) -> dict:
+    latencies = {"write": [], "read": []}
+    errors = []
+
+    def call(i: int) -> None:
+        kind, fn = ("write", write) if i % 2 == 0 else ("read", read)
+        start = time.perf_counter()
+        try:
+            fn()
+        except sqlite3.Error as e:
+            errors.append(e)
+            return
+        latencies[kind].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(call, range(calls)))
+    elapsed = time.perf_counter() - start
+    return {"elapsed": elapsed, "latencies": latencies, "errors": errors}
+
+
+def report(name: str, result: dict, calls: int) -> None:
+    parts = [f"{name:10s} {calls / result['elapsed']:7.0f} 次/秒"]
+    for kind, values in result["latencies"].items():
+        values.sort()
+        if values:
+            parts.append(f"{kind} p99 {values[int(len(values) * 0.99)] * 1e3:6.2f} ms")
+    parts.append(f"错误 {len(result['errors'])}")
+    parts.append(f"计数 {result['total']}")
+    print("  ".join(parts))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SQLite 连接池的并发读写基准")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=3000, help="总调用次数（读写各半）")
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    directory = Path(tempfile.mkdtemp())
+    init_db(directory / "connect.db")
+    init_db(directory / "pool.db")
+
+    baseline = run_connect(directory / "connect.db", args.threads, args.calls)
+    report("connect()", baseline, args.calls)
+    result = run_pool(directory / "pool.db", args.threads, args.calls, args.pool_size)
+    report("SQLitePool", result, args.calls)
+    print(f"写事务 {(args.calls + 1) // 2} 次；连接池: {result['pool']}")
+
+
+if __name__ == "__main__":
+    main()
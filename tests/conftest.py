@@ -0,0 +1,22 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# web/app.py 和 douyin_downloader.py 不在包内，按脚本运行时的方式加入搜索路径
+for path in (ROOT, ROOT / "web", ROOT / "douyin-video" / "scripts"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+
+@pytest.fixture
+def web(tmp_path, monkeypatch):
+    """使用临时数据库的 WebUI 应用模块"""
+    import app as web
+
+    monkeypatch.setattr(web, "DB_PATH", tmp_path / "stats.db")
+    web.init_stats_db()
+    yield web
+    web.close_db()
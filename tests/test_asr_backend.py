@@ -0,0 +1,72 @@
+"""识别后端基类（douyin_mcp_server/asr.py 的 ASRBackend）"""
+
+import asyncio
+import time
+
+import pytest
+
+from douyin_mcp_server.asr import ASRBackend
+
+
+class PendingBackend(ASRBackend):
+    """提交后一直不结束的识别任务"""
+
+    name = "pending"
+    poll_interval = 0.01
+    max_poll_interval = 0.02
+
+    def __init__(self):
+        self.cancelled = []
+
+    def submit(self, source):
+        return {"id": source}
+
+    def poll(self, job):
+        return None
+
+    async def cancel_async(self, job):
+        self.cancelled.append(job["id"])
+
+
+def test_backend_must_implement_submit_and_poll():
+    class Incomplete(ASRBackend):
+        def submit(self, source):
+            return source
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_wait_raises_after_deadline():
+    backend = PendingBackend()
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        backend.wait(backend.submit("a"), timeout=0.1)
+    assert time.monotonic() - start < 1
+
+
+def test_wait_async_raises_after_deadline_and_cancels_job():
+    backend = PendingBackend()
+    progress = []
+
+    async def report(elapsed):
+        progress.append(elapsed)
+
+    async def main():
+        with pytest.raises(TimeoutError):
+            await backend.wait_async(backend.submit("a"), progress=report, timeout=0.1)
+        # 服务端任务在后台取消
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert backend.cancelled == ["a"]
+    assert progress and max(progress) < 0.1
+
+
+def test_wait_uses_default_deadline(monkeypatch):
+    from douyin_mcp_server import asr
+
+    monkeypatch.setattr(asr, "ASR_WAIT_TIMEOUT", 0.05)
+    backend = PendingBackend()
+    with pytest.raises(TimeoutError):
+        backend.transcribe("a")
@@ -0,0 +1,187 @@
+"""分段并发识别（douyin_downloader.py）和识别服务限流（douyin_mcp_server/ratelimit.py）"""
+
+import asyncio
+import functools
+import json
+import shutil
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import douyin_downloader as d
+from douyin_mcp_server import ratelimit
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="需要 ffmpeg")
+
+CLIP_SECONDS = 60
+SEGMENTS = 6
+LATENCY = 0.2
+
+
+class StubASR:
+    """模拟的识别接口：返回片段文件名，记录每个请求的开始时间和同时进行的请求数"""
+
+    def __init__(self):
+        self.fail_every = 0
+        self.lock = threading.Lock()
+        self.reset()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                with stub.lock:
+                    stub.calls += 1
+                    fail = stub.fail_every and stub.calls % stub.fail_every == 0
+                    stub.started.append(time.monotonic())
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                try:
+                    if fail:
+                        self.send_response(503)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    time.sleep(LATENCY)
+                    name = body.split(b'filename="', 1)[1].split(b'"', 1)[0].decode()
+                    out = json.dumps({"text": f"[{name}]"}).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(out)))
+                    self.end_headers()
+                    self.wfile.write(out)
+                finally:
+                    with stub.lock:
+                        stub.active -= 1
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1/audio/transcriptions"
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.started = []
+
+
+@pytest.fixture(scope="module")
+def stub():
+    stub = StubASR()
+    yield stub
+    stub.server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    # 测试音频很短，把单次识别的上限调小以触发分段；默认不限流
+    monkeypatch.setattr(d, "MAX_AUDIO_DURATION", 10)
+    monkeypatch.setattr(d, "ASR_RETRY_BACKOFF", 0.05)
+    monkeypatch.setattr(d, "ASR_CONCURRENCY", 4)
+    monkeypatch.setattr(ratelimit, "_limiters", {})
+    monkeypatch.setenv("DOUYIN_ASR_RATE_LIMIT", "0")
+
+
+def make_processor(url, temp_dir):
+    """在 temp_dir 中分段的处理器，片段时长调小，让测试音频分成约 SEGMENTS 段"""
+    processor = d.DouyinProcessor("test-key", api_base_url=url)
+    processor.temp_dir.rmdir()
+    processor.temp_dir = temp_dir
+    temp_dir.mkdir(exist_ok=True)
+    seconds = CLIP_SECONDS / SEGMENTS + 1
+    processor.split_audio = functools.partial(d.DouyinProcessor.split_audio, processor, segment_duration=seconds)
+    processor.split_audio_async = functools.partial(
+        d.DouyinProcessor.split_audio_async, processor, segment_duration=seconds)
+    return processor
+
+
+@pytest.fixture
+def audio(stub, tmp_path):
+    """测试音频（每 5 秒有 1 秒静音），按流式提取的方式转码，返回 (处理器, 音频路径, 音频信息)"""
+    processor = make_processor(stub.url, tmp_path / "work")
+    source = tmp_path / "source.wav"
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", f"sine=frequency=440:duration={CLIP_SECONDS}",
+         "-af", "volume='if(lt(mod(t,5),4),1,0)':eval=frame", str(source)],
+        check=True,
+    )
+
+    def chunks():
+        with open(source, "rb") as f:
+            while chunk := f.read(65536):
+                yield chunk
+
+    audio_path = tmp_path / "audio.mp3"
+    return processor, audio_path, d.transcode_stream(chunks(), audio_path, processor.audio_profile)
+
+
+def segment_names(text):
+    names = text.strip("[]").split("][")
+    assert names == sorted(names), f"片段顺序错乱: {names}"
+    assert len(names) > 1, "没有分段"
+    return names
+
+
+def test_segments_keep_order_within_concurrency(stub, audio, monkeypatch):
+    processor, audio_path, info = audio
+    walls = {}
+    for concurrency in (1, 4):
+        monkeypatch.setattr(d, "ASR_CONCURRENCY", concurrency)
+        stub.reset()
+        start = time.perf_counter()
+        segment_names(processor.extract_text_from_audio(audio_path, show_progress=False, audio_info=dict(info)))
+        walls[concurrency] = time.perf_counter() - start
+        assert stub.max_active <= concurrency
+    assert walls[4] * 2 < walls[1], f"并发 4 相对串行的加速不足 2 倍: {walls}"
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_failed_segments_are_retried(stub, audio, mode):
+    processor, audio_path, info = audio
+    stub.reset()
+    expected = segment_names(processor.extract_text_from_audio(audio_path, show_progress=False, audio_info=dict(info)))
+
+    # 每 3 个请求返回一次 503：重试后结果不变
+    stub.fail_every = 3
+    stub.reset()
+    try:
+        if mode == "sync":
+            text = processor.extract_text_from_audio(audio_path, show_progress=False, audio_info=dict(info))
+        else:
+            text = asyncio.run(processor.extract_text_from_audio_async(audio_path, audio_info=dict(info)))
+    finally:
+        stub.fail_every = 0
+    assert segment_names(text) == expected
+    assert stub.calls > len(expected)
+
+
+def test_rate_limit_is_shared_across_tasks(stub, audio, tmp_path, monkeypatch, rate=6, burst=2):
+    processor, audio_path, info = audio
+    monkeypatch.setenv("DOUYIN_ASR_RATE_LIMIT", str(rate))
+    monkeypatch.setenv("DOUYIN_ASR_RATE_BURST", str(burst))
+    monkeypatch.setattr(d, "ASR_CONCURRENCY", 8)
+    stub.reset()
+    texts = []
+
+    def extract(index):
+        # 两个提取任务（各自的临时目录）同时识别，共用同一接口的限流器
+        task = make_processor(stub.url, tmp_path / f"task{index}")
+        texts.append(task.extract_text_from_audio(audio_path, show_progress=False, audio_info=dict(info)))
+
+    threads = [threading.Thread(target=extract, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(texts) == 2 and segment_names(texts[0]) == segment_names(texts[1])
+    started = sorted(stub.started)
+    assert (len(started) - burst) / (started[-1] - started[0]) <= rate * 1.1
+    # 任意 1 秒内的请求数不超过 rate + burst
+    assert max(sum(1 for t in started if s <= t < s + 1) for s in started) <= rate + burst
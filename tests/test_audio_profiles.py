@@ -0,0 +1,76 @@
+"""音频配置（douyin_mcp_server/audio.py 的 AUDIO_PROFILES）和流式转码"""
+
+import re
+import shutil
+import subprocess
+
+import ffmpeg
+import pytest
+
+from douyin_mcp_server.audio import AUDIO_PROFILES, READ_CHUNK_SIZE, transcode_stream
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="需要 ffmpeg")
+
+SECONDS = 10
+
+
+def make_video(path, seconds=SECONDS, faststart=True):
+    """44.1kHz 双声道 AAC 的测试视频"""
+    command = [
+        "ffmpeg", "-v", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc=size=160x120:rate=10:duration={seconds}",
+        "-f", "lavfi", "-i", f"sine=frequency=220:beep_factor=4:duration={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-ar", "44100", "-ac", "2", "-shortest",
+    ]
+    if faststart:
+        command += ["-movflags", "+faststart"]
+    subprocess.run(command + [str(path)], check=True)
+    return path
+
+
+def chunks(path):
+    with open(path, "rb") as f:
+        while chunk := f.read(READ_CHUNK_SIZE):
+            yield chunk
+
+
+def audio_stream(path):
+    """输出文件的 (采样率, 声道)，从 ffmpeg -i 的日志中读取（不依赖 ffprobe）"""
+    stderr = subprocess.run(["ffmpeg", "-hide_banner", "-i", str(path)], capture_output=True).stderr.decode()
+    matched = re.search(r"Audio: .*?, (\d+) Hz, (\w+)", stderr)
+    assert matched, f"{path.name}: 没有音频流"
+    return int(matched.group(1)), matched.group(2)
+
+
+@pytest.fixture(scope="module")
+def video(tmp_path_factory):
+    return make_video(tmp_path_factory.mktemp("audio") / "video.mp4")
+
+
+@pytest.mark.parametrize("name", list(AUDIO_PROFILES))
+def test_profile_output(video, tmp_path, name):
+    profile = AUDIO_PROFILES[name]
+    output = tmp_path / f"{name}{profile.suffix}"
+    info = transcode_stream(chunks(video), output, profile)
+
+    assert abs(info["duration"] - SECONDS) < 1
+    assert info["size"] == output.stat().st_size
+    if profile.output_args.get("ar") == 16000:
+        # 识别用的配置必须是 16kHz 单声道；Opus 解码时总是报告 48kHz，编码前的采样率只记录在文件头中
+        expected = 48000 if profile.output_args["acodec"] == "libopus" else 16000
+        assert audio_stream(output) == (expected, "mono")
+
+
+def test_mp3_16k_smaller_than_mp3_hq(video, tmp_path):
+    sizes = {
+        name: transcode_stream(chunks(video), tmp_path / f"{name}.mp3", AUDIO_PROFILES[name])["size"]
+        for name in ("mp3-16k", "mp3-hq")
+    }
+    assert sizes["mp3-16k"] < sizes["mp3-hq"]
+
+
+def test_moov_at_end_fails_from_pipe(tmp_path):
+    # 调用方据此改为先下载再提取，而不是得到空音频
+    video = make_video(tmp_path / "moov_at_end.mp4", faststart=False)
+    with pytest.raises(ffmpeg.Error):
+        transcode_stream(chunks(video), tmp_path / "broken.mp3", AUDIO_PROFILES["mp3-16k"])
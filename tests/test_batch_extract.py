@@ -0,0 +1,78 @@
+"""MCP 批量提取（server.extract_douyin_text_batch）的流水线和合并提交"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from douyin_mcp_server import server
+from douyin_mcp_server.cache import NullTranscriptCache
+
+# 各链接的解析耗时（秒）；最后一个链接与第一个是同一视频
+RESOLVE_DELAYS = {"https://v.douyin.com/a/": 0.0, "https://v.douyin.com/b/": 0.05,
+                  "https://v.douyin.com/c/": 0.6, "https://v.douyin.com/d/": 0.6}
+VIDEO_IDS = {"https://v.douyin.com/a/": "1", "https://v.douyin.com/b/": "2",
+             "https://v.douyin.com/c/": "3", "https://v.douyin.com/d/": "1"}
+
+
+class FakeBackend:
+    accepts_url = True
+    model_key = "fake"
+
+
+class FakeProcessor:
+    submitted = []
+
+    def __init__(self, api_key, model=None):
+        self.backend = FakeBackend()
+
+    async def parse_share_url_async(self, link):
+        await asyncio.sleep(RESOLVE_DELAYS[link])
+        video_id = VIDEO_IDS[link]
+        return {"video_id": video_id, "title": f"视频 {video_id}", "url": f"http://cdn/{video_id}.mp4"}
+
+    async def extract_texts_from_video_urls(self, urls):
+        self.submitted.append((time.perf_counter(), list(urls)))
+        await asyncio.sleep(0.05)
+        return [Exception("识别失败") if url.endswith("/2.mp4") else f"文案 {url}" for url in urls]
+
+
+class FakeContext:
+    def __init__(self):
+        self.progress = []
+
+    async def info(self, message):
+        pass
+
+    async def report_progress(self, progress, total=None, message=None):
+        self.progress.append((time.perf_counter(), progress, total, message))
+
+
+@pytest.fixture(autouse=True)
+def fake_processor(monkeypatch):
+    FakeProcessor.submitted = []
+    monkeypatch.setenv("API_KEY", "test-key")
+    monkeypatch.setattr(server, "DouyinProcessor", FakeProcessor)
+    monkeypatch.setattr(server, "get_transcript_cache", NullTranscriptCache)
+    monkeypatch.setattr(server, "BATCH_SUBMIT_WINDOW", 0.1)
+
+
+def test_batch_pipelines_resolve_and_submit():
+    ctx = FakeContext()
+    start = time.perf_counter()
+    results = json.loads(asyncio.run(server.extract_douyin_text_batch(list(RESOLVE_DELAYS), ctx=ctx)))
+
+    assert [result["status"] for result in results] == ["success", "error", "success", "success"]
+    assert results[0]["text"] == results[3]["text"] == "文案 http://cdn/1.mp4"
+    assert results[1]["error"] == "识别失败"
+
+    # 先解析完成的视频在一个窗口内合并提交，不等待解析较慢的链接；相同视频只提交一次
+    batches = [urls for _, urls in FakeProcessor.submitted]
+    assert batches == [["http://cdn/1.mp4", "http://cdn/2.mp4"], ["http://cdn/3.mp4"]]
+    assert FakeProcessor.submitted[0][0] - start < 0.5
+
+    # 每个结果完成时即报告进度
+    assert [progress for _, progress, _, _ in ctx.progress] == [1, 2, 3, 4]
+    assert ctx.progress[0][0] - start < 0.5
+    assert ctx.progress[-1][3] in ("完成: 视频 1", "完成: 视频 3")
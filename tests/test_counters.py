@@ -0,0 +1,81 @@
+"""写回计数器（douyin_mcp_server/counters.py）"""
+
+import asyncio
+import threading
+import time
+
+from douyin_mcp_server.counters import WriteBehindCounters
+
+
+def test_stop_flushes_pending_counts():
+    flushed = []
+    counters = WriteBehindCounters(flushed.append, interval=60, max_pending=1000)
+
+    async def main():
+        counters.start()
+        for _ in range(5):
+            counters.incr("page_views")
+        counters.incr("api", 2)
+        await counters.stop()
+
+    asyncio.run(main())
+    totals = {}
+    for deltas in flushed:
+        for key, n in deltas.items():
+            totals[key] = totals.get(key, 0) + n
+    assert totals == {"page_views": 5, "api": 2}
+    assert counters.pending() == {}
+
+
+def test_concurrent_incr_during_start_stop(threads=4, cycles=50):
+    """多个线程持续 incr（几乎每次都唤醒写入），同时事件循环反复 start() / stop()"""
+    flushed = {}
+    flushed_lock = threading.Lock()
+
+    def flush(deltas: dict) -> None:
+        with flushed_lock:
+            for key, n in deltas.items():
+                flushed[key] = flushed.get(key, 0) + n
+
+    counters = WriteBehindCounters(flush, interval=0.01, max_pending=1, shards=4)
+    stop = threading.Event()
+    done = [0] * threads
+    thread_errors = []
+
+    def worker(index: int) -> None:
+        try:
+            while not stop.is_set():
+                for _ in range(20):
+                    counters.incr(index % 3)
+                    done[index] += 1
+                # 留出时间给事件循环，否则唤醒回调会积压
+                time.sleep(0.0002)
+        except BaseException as e:
+            thread_errors.append(e)
+
+    async def main():
+        loop_errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda _, context: loop_errors.append(context))
+        workers = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(threads)]
+        for thread in workers:
+            thread.start()
+        try:
+            for _ in range(cycles):
+                counters.start()
+                await asyncio.sleep(0.001)
+                # 不用 wait_for：超时后取消 stop() 同样会卡住
+                stopping = asyncio.ensure_future(counters.stop())
+                finished, _ = await asyncio.wait({stopping}, timeout=5)
+                assert finished, "stop() 超过 5 秒没有返回，定期写入的任务没有结束"
+                stopping.result()
+        finally:
+            stop.set()
+            for thread in workers:
+                thread.join()
+        await asyncio.sleep(0.05)
+        return loop_errors
+
+    assert asyncio.run(main()) == []
+    assert thread_errors == []
+    # 不丢失也不重复
+    assert sum(flushed.values()) + sum(counters.pending().values()) == sum(done)
@@ -0,0 +1,117 @@
+"""视频下载代理（web/app.py 的 /api/video/download，不带 video_id）的 Range 转发"""
+
+import asyncio
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+ETAG = '"v1"'
+FILENAME = "测试 视频.mp4"
+DATA = bytes(range(256)) * 1024
+
+
+@pytest.fixture
+def cdn():
+    """支持 Range / If-Range / HEAD 的模拟 CDN，记录收到的 Range 请求头"""
+    ranges = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(len(DATA)))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+
+        def do_GET(self):
+            size = len(DATA)
+            start, end, status = 0, size - 1, 200
+            range_header = self.headers.get("Range")
+            ranges.append(range_header)
+            if range_header and self.headers.get("If-Range", ETAG) == ETAG:
+                matched = re.match(r"bytes=(\d+)-(\d*)", range_header)
+                start = int(matched.group(1))
+                if start >= size:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                end = min(int(matched.group(2) or size - 1), size - 1)
+                status = 206
+            self.send_response(status)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", ETAG)
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.end_headers()
+            self.wfile.write(DATA[start:end + 1])
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/video.mp4", ranges
+    server.shutdown()
+
+
+@pytest.fixture
+def request_proxy(web, cdn):
+    url, _ = cdn
+
+    def request(method="GET", headers=None):
+        async def send():
+            transport = httpx.ASGITransport(app=web.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.request(method, "/api/video/download",
+                                            params={"url": url, "filename": FILENAME}, headers=headers)
+
+        return asyncio.run(send())
+
+    return request
+
+
+def test_full_download_uses_rfc5987_filename(request_proxy):
+    response = request_proxy()
+    assert response.status_code == 200 and response.content == DATA
+    assert "filename*=UTF-8''" in response.headers["content-disposition"]
+
+
+def test_range_is_forwarded(request_proxy, cdn):
+    _, ranges = cdn
+    response = request_proxy(headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 100-199/{len(DATA)}"
+    assert response.content == DATA[100:200]
+    # 不会为了一个片段拉取整个文件
+    assert ranges == ["bytes=100-199"]
+
+
+def test_if_range(request_proxy):
+    response = request_proxy(headers={"Range": "bytes=100-199", "If-Range": ETAG})
+    assert response.status_code == 206
+    response = request_proxy(headers={"Range": "bytes=100-199", "If-Range": '"old"'})
+    assert response.status_code == 200 and response.content == DATA
+
+
+def test_head(request_proxy):
+    response = request_proxy("HEAD")
+    assert response.status_code == 200 and response.content == b""
+    assert int(response.headers["content-length"]) == len(DATA)
+    assert response.headers["etag"] == ETAG
+
+
+def test_unsatisfiable_range(request_proxy):
+    response = request_proxy(headers={"Range": f"bytes={len(DATA) + 5}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(DATA)}"
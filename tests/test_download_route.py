@@ -0,0 +1,94 @@
+"""WebUI 视频下载（/api/video/download?video_id=...）未缓存时的并发请求"""
+
+import asyncio
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from douyin_mcp_server import cache as cache_module
+from douyin_mcp_server.cache import MediaCache, VideoCache
+
+DATA = bytes(range(256)) * 4096
+
+
+@pytest.fixture
+def cdn():
+    """逐块慢速返回 DATA 的模拟 CDN，fail 为 True 时发送一半后断开"""
+    state = {"hits": 0, "fail": False}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            state["hits"] += 1
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(len(DATA)))
+            self.end_headers()
+            step = len(DATA) // 8
+            for offset in range(0, len(DATA), step):
+                if state["fail"] and offset >= len(DATA) // 2:
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+                self.wfile.write(DATA[offset:offset + step])
+                time.sleep(0.02)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    state["url"] = f"http://127.0.0.1:{server.server_port}/video.mp4"
+    yield state
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def video_cache(tmp_path, monkeypatch, cdn):
+    """临时的视频信息和文件缓存，视频 1、2 视为本服务解析过"""
+    video_cache = VideoCache(tmp_path / "cache.db")
+    monkeypatch.setattr(cache_module, "_video_cache", video_cache)
+    monkeypatch.setattr(cache_module, "_media_cache", MediaCache(tmp_path / "media", tmp_path / "cache.db"))
+    for video_id in ("1", "2"):
+        video_cache.put_info(video_id, {"video_id": video_id, "url": cdn["url"], "urls": [cdn["url"]], "title": "t"})
+    return video_cache
+
+
+async def request_all(web, video_id, url, headers_list):
+    transport = httpx.ASGITransport(app=web.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+        params = {"url": url, "video_id": video_id}
+        return await asyncio.gather(*(client.get("/api/video/download", params=params, headers=headers)
+                                      for headers in headers_list))
+
+
+def test_cold_requests_share_one_download(web, cdn):
+    headers_list = [{}, {}, {"Range": "bytes=0-"}, {"Range": "bytes=100-199"}]
+    responses = asyncio.run(request_all(web, "1", cdn["url"], headers_list))
+
+    assert cdn["hits"] == 1
+    assert [response.status_code for response in responses] == [200, 200, 200, 206]
+    assert all(response.content == DATA for response in responses[:3])
+    assert responses[3].content == DATA[100:200]
+    media_cache = cache_module.get_media_cache()
+    assert media_cache.get("1").read_bytes() == DATA
+
+    # 已缓存：不再请求 CDN
+    response, = asyncio.run(request_all(web, "1", cdn["url"], [{"Range": "bytes=5-9"}]))
+    assert response.status_code == 206 and response.content == DATA[5:10]
+    assert cdn["hits"] == 1
+
+
+def test_failed_download_leaves_no_partial_file(web, cdn):
+    cdn["fail"] = True
+    response, = asyncio.run(request_all(web, "2", cdn["url"], [{"Range": "bytes=100-199"}]))
+
+    assert response.status_code == 502
+    media_cache = cache_module.get_media_cache()
+    assert media_cache.get("2") is None
+    assert list(media_cache.directory.iterdir()) == []
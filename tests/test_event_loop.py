@@ -0,0 +1,123 @@
+"""WebUI 提取流程（/api/video/extract）不阻塞事件循环"""
+
+import asyncio
+import json
+import shutil
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+import douyin_downloader
+from douyin_mcp_server import cache as cache_module
+from douyin_mcp_server import ratelimit, resolver
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="需要 ffmpeg")
+
+SECONDS = 5
+ASR_LATENCY = 0.5
+
+
+@pytest.fixture
+def stubs(tmp_path, monkeypatch):
+    """模拟的分享页（分块慢速发送）、CDN（限速）和识别接口（固定延迟），不读写缓存、不限流"""
+    video_path = tmp_path / "video.mp4"
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-y",
+         "-f", "lavfi", "-i", f"testsrc=size=160x120:rate=10:duration={SECONDS}",
+         "-f", "lavfi", "-i", f"sine=frequency=220:beep_factor=4:duration={SECONDS}",
+         "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest", "-movflags", "+faststart",
+         str(video_path)],
+        check=True,
+    )
+    video = video_path.read_bytes()
+    padding = "".join(f"<script>var p{i}='{'x' * 1000}';</script>" for i in range(200))
+    base = []
+
+    def page(video_id: str) -> bytes:
+        item = {
+            "desc": f"测试视频 {video_id}",
+            "video": {"play_addr": {"url_list": [f"{base[0]}/video/{video_id}.mp4"]}, "duration": SECONDS * 1000},
+        }
+        router = {"loaderData": {"video_(id)/page": {"videoInfoRes": {"item_list": [item]}}}}
+        return (padding + f"<script>window._ROUTER_DATA = {json.dumps(router)}</script></html>").encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def send_body(self, body: bytes, content_type: str, chunk: int, delay: float) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                for offset in range(0, len(body), chunk):
+                    self.wfile.write(body[offset:offset + chunk])
+                    time.sleep(delay)
+            except OSError:
+                pass
+
+        def do_GET(self):
+            if self.path.startswith("/share/video/"):
+                self.send_body(page(self.path.rstrip("/").split("/")[-1]), "text/html", 16384, 0.01)
+            else:
+                self.send_body(video, "video/mp4", 16384, 0.01)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(ASR_LATENCY)
+            self.send_body(json.dumps({"text": "模拟识别结果"}).encode(), "application/json", 65536, 0)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base.append(f"http://127.0.0.1:{server.server_port}")
+
+    monkeypatch.setenv("DOUYIN_CACHE", "false")
+    monkeypatch.setenv("DOUYIN_ASR_RATE_LIMIT", "0")
+    for name in ("_video_cache", "_transcript_cache", "_media_cache"):
+        monkeypatch.setattr(cache_module, name, None)
+    monkeypatch.setattr(ratelimit, "_limiters", {})
+    monkeypatch.setattr(resolver, "SHARE_PAGE_URL", base[0] + "/share/video/{video_id}")
+    monkeypatch.setattr(douyin_downloader, "DEFAULT_API_BASE_URL", base[0] + "/v1/audio/transcriptions")
+    yield
+    server.shutdown()
+
+
+def test_extract_does_not_block_health(web, stubs, requests=3):
+    async def main():
+        transport = httpx.ASGITransport(app=web.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+            latencies = []
+            done = asyncio.Event()
+
+            async def probe():
+                while not done.is_set():
+                    start = time.perf_counter()
+                    (await client.get("/api/health")).raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                    await asyncio.sleep(0.05)
+
+            async def extract(i: int) -> dict:
+                share = f"https://www.iesdouyin.com/share/video/{7300000000000000000 + i}/"
+                response = await client.post("/api/video/extract",
+                                             json={"url": share, "api_key": "test-key", "no_cache": True})
+                return response.json()
+
+            probe_task = asyncio.create_task(probe())
+            results = await asyncio.gather(*(extract(i) for i in range(requests)))
+            done.set()
+            await probe_task
+            return results, latencies
+
+    results, latencies = asyncio.run(main())
+    assert [result.get("error") for result in results if not result["success"]] == []
+    assert all(result["text"] == "模拟识别结果" for result in results)
+    # 同步调用阻塞事件循环时，/api/health 要等到整个提取结束（数秒）才会返回
+    assert len(latencies) > 5 and max(latencies) < 0.5, f"/api/health 最长等待 {max(latencies) * 1000:.0f} ms"
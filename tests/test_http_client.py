@@ -0,0 +1,88 @@
+"""共享 HTTP 客户端（douyin_mcp_server/http_client.py）的异步客户端"""
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from douyin_mcp_server import http_client
+
+
+@pytest.fixture
+def server_url():
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+
+
+def test_async_client_reused_within_loop():
+    async def main():
+        first = http_client.get_async_client()
+        second = http_client.get_async_client()
+        await http_client.aclose_async_client()
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first is second and first.is_closed
+
+
+def test_client_of_closed_loop_is_closed_on_next_loop(server_url):
+    async def request():
+        # 留下一个 keep-alive 连接，旧客户端随之引用旧事件循环
+        client = http_client.get_async_client()
+        (await client.get(server_url)).raise_for_status()
+        return client
+
+    old = asyncio.run(request())
+    assert not old.is_closed
+
+    async def main():
+        client = http_client.get_async_client()
+        # 旧客户端在当前事件循环的后台任务中关闭
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        await http_client.aclose_async_client()
+        return client
+
+    new = asyncio.run(main())
+    assert new is not old
+    assert old.is_closed
+    assert old not in http_client._async_clients.values()
+
+
+def test_running_loops_get_separate_clients():
+    ready = threading.Barrier(2)
+    clients = []
+
+    def run():
+        async def main():
+            client = http_client.get_async_client()
+            # 两个事件循环同时运行时各自的客户端都不被替换
+            await asyncio.to_thread(ready.wait)
+            clients.append((client, http_client.get_async_client() is client))
+            await http_client.aclose_async_client()
+
+        asyncio.run(main())
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [same for _, same in clients] == [True, True]
+    assert clients[0][0] is not clients[1][0]
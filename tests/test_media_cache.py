@@ -0,0 +1,111 @@
+"""视频文件缓存（douyin_mcp_server/cache.py 的 MediaCache）的并发下载合并和临时文件"""
+
+import asyncio
+
+import pytest
+
+from douyin_mcp_server.cache import MediaCache
+
+DATA = b"0123456789" * 1000
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return MediaCache(tmp_path / "media", tmp_path / "cache.db")
+
+
+def leftovers(cache):
+    return sorted(path.name for path in cache.directory.iterdir() if path.name != "1.mp4")
+
+
+def test_concurrent_fetch_async_downloads_once(cache):
+    calls = []
+
+    async def fetch(path):
+        calls.append(path)
+        await asyncio.sleep(0.05)
+        path.write_bytes(DATA)
+
+    async def main():
+        return await asyncio.gather(*(cache.fetch_async("1", fetch) for _ in range(5)))
+
+    paths = asyncio.run(main())
+    assert len(calls) == 1
+    assert calls[0] != cache.path("1"), "应先写入临时文件"
+    assert all(path == cache.path("1") and path.read_bytes() == DATA for path in paths)
+    assert cache.counters["misses"] == 1 and cache.counters["coalesced"] == 4
+    assert leftovers(cache) == []
+
+
+def test_failed_fetch_removes_partial_file(cache):
+    def fetch(path):
+        path.write_bytes(DATA[:100])
+        path.with_name(path.name + ".part").write_bytes(b"x")
+        raise OSError("connection reset")
+
+    with pytest.raises(OSError):
+        cache.fetch("1", fetch)
+    assert cache.get("1") is None
+    assert not cache.path("1").exists()
+    assert leftovers(cache) == []
+
+
+def test_cancelled_fill_removes_partial_file(cache):
+    async def fetch(path):
+        path.write_bytes(DATA[:100])
+        await asyncio.sleep(10)
+
+    async def main():
+        fill = cache.start_fill_async("1", fetch)
+        await asyncio.sleep(0.05)
+        fill.future.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await fill.future
+
+    asyncio.run(main())
+    assert cache.get("1") is None
+    assert list(cache.directory.iterdir()) == []
+
+
+def test_tail_reads_while_downloading(cache):
+    async def fetch(path):
+        with open(path, "wb") as f:
+            for offset in range(0, len(DATA), 1000):
+                f.write(DATA[offset:offset + 1000])
+                f.flush()
+                await asyncio.sleep(0.01)
+
+    async def main():
+        fill = cache.start_fill_async("1", fetch, sequential=True)
+        joined = cache.start_fill_async("1", fetch, sequential=True)
+        assert joined is fill
+        first = None
+        body = b""
+        async for chunk in cache.tail("1", fill, chunk_size=1000, interval=0.005):
+            if first is None:
+                first = fill.done.is_set()
+            body += chunk
+        return first, body
+
+    finished_at_first_chunk, body = asyncio.run(main())
+    assert body == DATA
+    assert finished_at_first_chunk is False, "应在下载结束前开始返回数据"
+    assert cache.get("1").read_bytes() == DATA
+
+
+def test_tail_raises_when_download_fails(cache):
+    async def fetch(path):
+        path.write_bytes(DATA[:100])
+        await asyncio.sleep(0.02)
+        raise OSError("connection reset")
+
+    async def main():
+        fill = cache.start_fill_async("1", fetch, sequential=True)
+        body = b""
+        with pytest.raises(RuntimeError):
+            async for chunk in cache.tail("1", fill, interval=0.005):
+                body += chunk
+        return body
+
+    assert asyncio.run(main()) == DATA[:100]
+    assert list(cache.directory.iterdir()) == []
@@ -0,0 +1,67 @@
+"""测评额度（web/app.py 的 consume_quiz_attempt、广告票据和免费次数缓存）"""
+
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+APP_KEY = "chuangye"
+
+
+@pytest.fixture(autouse=True)
+def ad_secret(monkeypatch):
+    monkeypatch.setenv("QUIZ_AD_UNLOCK_SECRET", "test")
+
+
+def test_concurrent_consume_never_overspends(web, devices=20, taps=10, threads=8, credits=3):
+    web.update_app_setting(APP_KEY, 1, True)
+    for d in range(devices):
+        for _ in range(credits):
+            web.unlock_quiz_by_ad(f"dev{d}", APP_KEY)
+
+    barrier = threading.Barrier(threads)
+
+    def tap(i: int) -> bool:
+        if i < threads:
+            barrier.wait()
+        return web.consume_quiz_attempt(f"dev{i % devices}", APP_KEY)[0]
+
+    with ThreadPoolExecutor(threads) as pool:
+        granted = sum(pool.map(tap, range(devices * taps)))
+    assert granted == devices * (1 + credits)
+    with sqlite3.connect(web.DB_PATH) as conn:
+        bad = conn.execute("SELECT COUNT(*) FROM app_quota WHERE ad_credits < 0 OR free_used > 1").fetchone()[0]
+    assert bad == 0
+
+
+def test_ad_credits_usable_with_zero_free_limit(web):
+    web.update_app_setting(APP_KEY, 1, True)
+    web.consume_quiz_attempt("zero", APP_KEY)
+    for _ in range(2):
+        web.unlock_quiz_by_ad("zero", APP_KEY)
+    web.update_app_setting(APP_KEY, 0, True)
+
+    assert [web.consume_quiz_attempt("zero", APP_KEY)[0] for _ in range(3)] == [True, True, False]
+    assert not web.consume_quiz_attempt("zero-new", APP_KEY)[0]
+
+
+def test_ad_ticket_redeemed_once(web, threads=8):
+    ticket = web.create_ad_ticket("replay", APP_KEY)
+    with ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(
+            lambda _: web.redeem_ad_ticket("replay", APP_KEY, ticket["ticket_id"], ticket["signature"]),
+            range(threads),
+        ))
+    assert sum(result is not None for result in results) == 1
+
+
+def test_free_limit_cache_ignores_unknown_app_keys(web):
+    with web.get_db().connection() as conn:
+        assert [web.get_app_free_limit(conn, f"unknown-{i}") for i in range(100)] == [1] * 100
+        web.get_app_free_limit(conn, APP_KEY)
+    assert set(web._free_limits) == {APP_KEY}
+
+    web.update_app_setting(APP_KEY, 5, True)
+    with web.get_db().connection() as conn:
+        assert web.get_app_free_limit(conn, APP_KEY) == 5
@@ -0,0 +1,23 @@
+"""识别服务限流（douyin_mcp_server/ratelimit.py）的配置"""
+
+import pytest
+
+from douyin_mcp_server import ratelimit
+
+
+@pytest.fixture(autouse=True)
+def limiters(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_limiters", {})
+
+
+def test_invalid_env_values_fall_back_to_defaults(monkeypatch):
+    monkeypatch.setenv("DOUYIN_ASR_RATE_LIMIT", "fast")
+    monkeypatch.setenv("DOUYIN_ASR_RATE_BURST", "")
+    monkeypatch.setenv("DOUYIN_ASR_CONCURRENCY", "4")
+    limiter = ratelimit.get_rate_limiter("api.example.com")
+    assert (limiter.rate, limiter.burst) == (5, 4)
+
+
+def test_zero_rate_disables_limiting(monkeypatch):
+    monkeypatch.setenv("DOUYIN_ASR_RATE_LIMIT", "0")
+    assert ratelimit.get_rate_limiter("api.example.com") is None
@@ -0,0 +1,116 @@
+"""分享页解析（douyin_mcp_server/resolver.py）和边下载边解析"""
+
+import asyncio
+import http.server
+import json
+import re
+import socketserver
+import threading
+import time
+
+import pytest
+
+from douyin_mcp_server import resolver
+from douyin_mcp_server.video_info import VideoInfo
+
+VIDEO_ID = "7300000000000000000"
+
+
+def make_page() -> str:
+    """合成分享页：前面约 40 KB 的脚本、中间是 window._ROUTER_DATA、后面约 300 KB 的脚本"""
+    item = {
+        "aweme_id": VIDEO_ID,
+        "desc": "测试 视频 #话题",
+        "video": {
+            "play_addr": {"url_list": ["https://aweme.snssdk.com/aweme/v1/playwm/?video_id=v0"]},
+            "duration": 31500,
+            "bit_rate": [
+                {"gear_name": f"g{i}", "bit_rate": 1000 * i,
+                 "play_addr": {"url_list": [f"https://cdn.example.com/{i}/video.mp4"] * 3}}
+                for i in range(4)
+            ],
+        },
+        "author": {"nickname": "作者"},
+    }
+    router = {"loaderData": {"video_(id)/page": {"videoInfoRes": {"item_list": [item]}}}}
+    head = "<html><head>" + "".join(f"<script>var a{i}='{'x' * 1000}';</script>" for i in range(40))
+    tail = "".join(f"<script>var t{i}='{'y' * 1000}';</script>" for i in range(300)) + "</body></html>"
+    return head + "<script>window._ROUTER_DATA = " + json.dumps(router, ensure_ascii=False) + "</script>" + tail
+
+
+PAGE = make_page().encode()
+ROUTER_END = PAGE.index(b"</script>", PAGE.index(b"window._ROUTER_DATA")) + len(b"</script>")
+
+
+def old_parse_share_page(data: bytes, video_id: str) -> dict:
+    """改动之前的写法：解码整页，正则截取后用标准库 json 解析"""
+    matched = re.search(r"window\._ROUTER_DATA\s*=\s*(.*?)</script>", data.decode(), re.DOTALL)
+    item = json.loads(matched.group(1).strip())["loaderData"]["video_(id)/page"]["videoInfoRes"]["item_list"][0]
+    return VideoInfo.from_item(item, video_id).to_dict()
+
+
+@pytest.mark.parametrize("use_orjson", [False, True])
+@pytest.mark.parametrize("page", [PAGE, PAGE.decode()], ids=["bytes", "str"])
+def test_parse_matches_full_page_regex(page, use_orjson, monkeypatch):
+    if use_orjson:
+        if resolver.orjson is None:
+            pytest.skip("未安装 orjson")
+    else:
+        monkeypatch.setattr(resolver, "orjson", None)
+    assert resolver.parse_share_page(page, VIDEO_ID) == old_parse_share_page(PAGE, VIDEO_ID)
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096, 65536])
+def test_reader_stops_after_router_script(size):
+    reader = resolver._RouterDataReader()
+    for offset in range(0, len(PAGE), size):
+        if reader.feed(PAGE[offset:offset + size]):
+            break
+    assert ROUTER_END <= len(reader.buffer) < ROUTER_END + size
+    assert resolver.parse_share_page(reader.buffer, VIDEO_ID)["video_id"] == VIDEO_ID
+
+
+@pytest.fixture
+def share_server(monkeypatch):
+    """逐块慢速发送 PAGE 的本地分享页，记录实际发出的字节数"""
+    sent = [0]
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(PAGE)))
+            self.end_headers()
+            try:
+                for offset in range(0, len(PAGE), 16384):
+                    self.wfile.write(PAGE[offset:offset + 16384])
+                    sent[0] += len(PAGE[offset:offset + 16384])
+                    time.sleep(0.002)
+            except OSError:
+                pass
+
+    class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+        daemon_threads = True
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(resolver, "SHARE_PAGE_URL", f"http://127.0.0.1:{server.server_address[1]}/share/video/{{video_id}}")
+    yield sent
+    server.shutdown()
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_fetch_stops_reading_after_router_script(share_server, mode):
+    if mode == "sync":
+        info = resolver._fetch_info(VIDEO_ID)
+    else:
+        info = asyncio.run(resolver._fetch_info_async(VIDEO_ID))
+    # 等服务端发现连接已断开
+    time.sleep(0.3)
+    assert info["video_id"] == VIDEO_ID
+    assert share_server[0] < len(PAGE), "读完了整页"
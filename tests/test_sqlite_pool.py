@@ -0,0 +1,51 @@
+"""SQLite 连接池（douyin_mcp_server/sqlite_pool.py）的并发读写"""
+
+import random
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from douyin_mcp_server.sqlite_pool import SQLitePool
+
+ROWS = 20
+
+
+@pytest.fixture
+def pool(tmp_path):
+    with sqlite3.connect(tmp_path / "pool.db") as conn:
+        conn.execute("CREATE TABLE counters (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.executemany("INSERT INTO counters(id, value) VALUES(?, 0)", [(i,) for i in range(ROWS)])
+    pool = SQLitePool(tmp_path / "pool.db", size=4)
+    yield pool
+    pool.close()
+
+
+def test_concurrent_transactions_do_not_lose_updates(pool, threads=8, calls=600):
+    def call(i: int) -> None:
+        if i % 2:
+            with pool.connection() as conn:
+                conn.execute("SELECT SUM(value) FROM counters").fetchone()
+            return
+        with pool.transaction() as conn:
+            row_id = random.randrange(ROWS)
+            value = conn.execute("SELECT value FROM counters WHERE id = ?", (row_id,)).fetchone()[0]
+            # 嵌套的 transaction() 并入外层事务
+            with pool.transaction() as inner:
+                inner.execute("UPDATE counters SET value = ? WHERE id = ?", (value + 1, row_id))
+
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(call, range(calls)))
+
+    with pool.connection() as conn:
+        assert conn.execute("SELECT SUM(value) FROM counters").fetchone()[0] == calls // 2
+    assert pool.stats()["connections"] <= pool.size
+
+
+def test_failed_transaction_rolls_back(pool):
+    with pytest.raises(RuntimeError):
+        with pool.transaction() as conn:
+            conn.execute("UPDATE counters SET value = 1")
+            raise RuntimeError
+    with pool.connection() as conn:
+        assert conn.execute("SELECT SUM(value) FROM counters").fetchone()[0] == 0
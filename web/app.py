@@ -9,44 +9,108 @@
     # 访问 http://localhost:8080
 """
 
+import asyncio
+import base64
+import functools
 import hashlib
 import hmac
 import json
 import os
+import shutil
 import sqlite3
 import sys
-from datetime import datetime, timezone
+import threading
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
 from uuid import uuid4
 
-# 添加项目路径
+# 添加项目路径（项目根目录提供 douyin_mcp_server 包，未安装时也能直接运行）
+sys.path.insert(0, str(Path(__file__).parent.parent))
 sys.path.insert(0, str(Path(__file__).parent.parent / "douyin-video" / "scripts"))
 
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 import uvicorn
-import requests
+import httpx
 
 # 导入抖音处理模块
-from douyin_downloader import get_video_info, extract_text, HEADERS
+from douyin_downloader import (
+    get_video_info_async, extract_text_async, extract_text_batch_async, HEADERS,
+    DouyinProcessor, STREAM_AUDIO, is_retryable_error, stream_video_file_async,
+)
+from douyin_mcp_server.http_client import get_async_client, aclose_async_client, close_client
+from douyin_mcp_server.counters import WriteBehindCounters
+from douyin_mcp_server.cache import get_media_cache, get_transcript_cache, get_video_cache
+from douyin_mcp_server.download import get_download_stats
+from douyin_mcp_server.images import stream_images_zip
+from douyin_mcp_server.resolver import SHARE_PAGE_URL, extract_share_urls
+from douyin_mcp_server.singleflight import singleflight_stats
+from douyin_mcp_server.sqlite_pool import SQLitePool
 
 app = FastAPI(title="抖音文案提取器", version="1.0.0")
 templates = Jinja2Templates(directory=Path(__file__).parent / "templates")
 DB_PATH = Path(__file__).parent / "stats.db"
+# 旧版稿件队列文件，启动时一次性导入 stats.db 的 xhs_posts 表
 XHS_QUEUE_PATH = Path(__file__).parent / "xhs_posts.json"
 XHS_ENV_PATH = Path(__file__).parent.parent / ".env.xhs.local"
-
-
-def _get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# 视频解析缓存默认与 stats.db 放在同一目录
+os.environ.setdefault("DOUYIN_CACHE_DIR", str(Path(__file__).parent))
+# 单次批量提取最多处理的链接数
+BATCH_MAX_LINKS = int(os.getenv("DOUYIN_BATCH_MAX_LINKS", "50"))
+# 后台提取任务：中间文件目录、并发数和失败重试次数
+JOB_DIR = Path(os.getenv("DOUYIN_JOB_DIR", str(Path(__file__).parent / "jobs")))
+JOB_WORKERS = max(1, int(os.getenv("DOUYIN_JOB_WORKERS", "2")))
+JOB_MAX_ATTEMPTS = max(1, int(os.getenv("DOUYIN_JOB_MAX_ATTEMPTS", "3")))
+JOB_RETRY_BACKOFF = 5.0
+# SSE 连接空闲时发送心跳的间隔，避免被代理当作超时断开
+JOB_EVENT_KEEPALIVE = 15.0
+# 视频代理转发给 CDN 的请求头，以及回传给浏览器的响应头
+PROXY_REQUEST_HEADERS = ("range", "if-range")
+PROXY_RESPONSE_HEADERS = ("content-length", "content-range", "accept-ranges", "content-encoding", "etag", "last-modified")
+# stats.db 连接池大小（同时也是执行数据库操作的线程数）
+DB_POOL_SIZE = max(1, int(os.getenv("DOUYIN_DB_POOL_SIZE", "4")))
+# 访问计数先在内存中累加，每隔 STATS_FLUSH_INTERVAL 秒（或累计 STATS_FLUSH_MAX_PENDING 次）写入一次
+STATS_FLUSH_INTERVAL = float(os.getenv("DOUYIN_STATS_FLUSH_INTERVAL", "5"))
+STATS_FLUSH_MAX_PENDING = max(1, int(os.getenv("DOUYIN_STATS_FLUSH_MAX_PENDING", "1000")))
+# /api/stats 返回最近几天的每日计数
+STATS_DAILY_DAYS = 7
+# 列表接口（/api/xhs/posts、/api/quiz/apps）每页默认和最多返回的条数
+PAGE_SIZE = 50
+PAGE_MAX = 200
+# ETag 中的进程标识：重启后（数据库可能已替换）客户端缓存的 ETag 全部失效
+ETAG_EPOCH = uuid4().hex[:8]
+
+# 下面的数据库函数都是同步的，async 处理函数通过 get_db().run(...) 在连接池线程中调用
+_db: Optional[SQLitePool] = None
+_db_lock = threading.Lock()
+
+
+def get_db() -> SQLitePool:
+    """获取 stats.db 的连接池（首次调用时创建）"""
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                _db = SQLitePool(DB_PATH, size=DB_POOL_SIZE)
+    return _db
+
+
+def close_db() -> None:
+    global _db
+    with _db_lock:
+        if _db is not None:
+            _db.close()
+            _db = None
 
 
 def init_stats_db() -> None:
-    with _get_conn() as conn:
+    with get_db().transaction() as conn:
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS metrics (
@@ -58,6 +122,16 @@ def init_stats_db() -> None:
         conn.execute(
             "INSERT OR IGNORE INTO metrics(key, value) VALUES('page_views', 0)"
         )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS daily_metrics (
+                day TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, key)
+            )
+            """
+        )
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS app_quota (
@@ -93,6 +167,8 @@ def init_stats_db() -> None:
             )
             """
         )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_app_settings_order ON app_settings(category, app_key)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_app_settings_enabled ON app_settings(enabled, category, app_key)")
         conn.executemany(
             "INSERT OR IGNORE INTO app_settings(app_key, category, title, free_limit, enabled) VALUES(?, ?, ?, ?, 1)",
             [
@@ -102,34 +178,326 @@ def init_stats_db() -> None:
                 ("city_persona", "人格测评", "你的城市人格", 1),
             ],
         )
-        conn.commit()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS extract_jobs (
+                job_id TEXT PRIMARY KEY,
+                share_link TEXT NOT NULL,
+                use_cache INTEGER NOT NULL DEFAULT 1,
+                status TEXT NOT NULL DEFAULT 'queued',
+                stage TEXT NOT NULL DEFAULT '',
+                video_info TEXT,
+                video_path TEXT,
+                audio_path TEXT,
+                audio_info TEXT,
+                text TEXT,
+                cached INTEGER NOT NULL DEFAULT 0,
+                error TEXT NOT NULL DEFAULT '',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_extract_jobs_status ON extract_jobs(status, created_at)"
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS xhs_posts (
+                id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                content TEXT NOT NULL,
+                cover_url TEXT NOT NULL DEFAULT '',
+                status TEXT NOT NULL DEFAULT 'queued',
+                created_at TEXT NOT NULL,
+                published_at TEXT NOT NULL DEFAULT ''
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_xhs_posts_created ON xhs_posts(created_at, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_xhs_posts_status ON xhs_posts(status, created_at, id)")
+        # 各状态的稿件数由触发器在同一事务中维护，/api/xhs/status 不再扫描稿件
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS xhs_post_counts (
+                status TEXT PRIMARY KEY,
+                count INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS xhs_posts_count_insert AFTER INSERT ON xhs_posts BEGIN
+                INSERT INTO xhs_post_counts(status, count) VALUES(NEW.status, 1)
+                ON CONFLICT(status) DO UPDATE SET count = count + 1;
+            END
+            """
+        )
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS xhs_posts_count_update AFTER UPDATE OF status ON xhs_posts
+            WHEN OLD.status != NEW.status BEGIN
+                UPDATE xhs_post_counts SET count = count - 1 WHERE status = OLD.status;
+                INSERT INTO xhs_post_counts(status, count) VALUES(NEW.status, 1)
+                ON CONFLICT(status) DO UPDATE SET count = count + 1;
+            END
+            """
+        )
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS xhs_posts_count_delete AFTER DELETE ON xhs_posts BEGIN
+                UPDATE xhs_post_counts SET count = count - 1 WHERE status = OLD.status;
+            END
+            """
+        )
+        # 表的修改版本号，由触发器在每次增删改时递增，用作列表接口的 ETag
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS table_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        for table in VERSIONED_TABLES:
+            conn.execute("INSERT OR IGNORE INTO table_versions(name, version) VALUES(?, 0)", (table,))
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                conn.execute(
+                    f"""
+                    CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+                        UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+                    END
+                    """
+                )
+
+
+# 由触发器记录修改版本号的表
+VERSIONED_TABLES = ("xhs_posts", "app_settings")
+
+
+def get_table_version(name: str) -> int:
+    with get_db().connection() as conn:
+        row = conn.execute("SELECT version FROM table_versions WHERE name = ?", (name,)).fetchone()
+        return int(row["version"]) if row else 0
+
+
+def table_etag(name: str, *extra) -> str:
+    """列表接口的 ETag：表的修改版本号不变时内容不变"""
+    return '"' + "-".join(str(part) for part in (name, ETAG_EPOCH, get_table_version(name), *extra)) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """请求的 If-None-Match 是否包含 etag（忽略弱校验前缀 W/）"""
+    header = request.headers.get("if-none-match", "")
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def etag_response(data: dict, etag: str) -> JSONResponse:
+    # no-cache：浏览器可以缓存，但每次使用前都要用 If-None-Match 重新验证
+    return JSONResponse(data, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def encode_cursor(values: tuple) -> str:
+    """分页游标：上一页最后一条记录的排序键"""
+    raw = json.dumps(list(values), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> Optional[tuple]:
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        values = None
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(v, str) for v in values):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    return tuple(values)
+
+
+def page_limit(limit: int) -> int:
+    return min(max(1, limit), PAGE_MAX)
+
+
+# 计数的键为 (名称, UTC 日期)，写入时同时累加 metrics 中的总数和 daily_metrics 中的当天数。
+# 名称：page_views 为主页访问量，requests:<路由> 为各接口的请求数
+def write_metric_deltas(deltas: dict) -> None:
+    totals: dict[str, int] = {}
+    for (name, _), n in deltas.items():
+        totals[name] = totals.get(name, 0) + n
+    with get_db().transaction() as conn:
+        conn.executemany(
+            "INSERT INTO metrics(key, value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+            totals.items(),
+        )
+        conn.executemany(
+            """
+            INSERT INTO daily_metrics(day, key, value) VALUES(?, ?, ?)
+            ON CONFLICT(day, key) DO UPDATE SET value = value + excluded.value
+            """,
+            [(day, name, n) for (name, day), n in deltas.items()],
+        )
+
+
+metric_counters = WriteBehindCounters(
+    write_metric_deltas, interval=STATS_FLUSH_INTERVAL, max_pending=STATS_FLUSH_MAX_PENDING
+)
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def count_metric(name: str, n: int = 1) -> None:
+    """计数加 n（只写内存，由 metric_counters 定期写入 stats.db）"""
+    metric_counters.incr((name, _today()), n)
+
 
+def get_metric(name: str) -> int:
+    """计数的当前总数：stats.db 中的值加上尚未写入的增量"""
+    def read() -> int:
+        with get_db().connection() as conn:
+            row = conn.execute("SELECT value FROM metrics WHERE key = ?", (name,)).fetchone()
+            return int(row["value"]) if row else 0
 
-def increment_page_views() -> int:
-    with _get_conn() as conn:
-        conn.execute("UPDATE metrics SET value = value + 1 WHERE key = 'page_views'")
-        row = conn.execute("SELECT value FROM metrics WHERE key = 'page_views'").fetchone()
-        conn.commit()
-        return int(row["value"]) if row else 0
+    stored, pending = metric_counters.snapshot(read)
+    return stored + sum(n for (key, _), n in pending.items() if key == name)
 
 
-def get_page_views() -> int:
-    with _get_conn() as conn:
-        row = conn.execute("SELECT value FROM metrics WHERE key = 'page_views'").fetchone()
-        return int(row["value"]) if row else 0
+def get_metrics(days: int = STATS_DAILY_DAYS) -> dict:
+    """全部计数的总数和最近 days 天的每日计数（含尚未写入的增量）"""
+    since = (datetime.now(timezone.utc).date() - timedelta(days=days - 1)).isoformat()
 
+    def read() -> tuple:
+        with get_db().connection() as conn:
+            totals = conn.execute("SELECT key, value FROM metrics").fetchall()
+            daily = conn.execute("SELECT day, key, value FROM daily_metrics WHERE day >= ?", (since,)).fetchall()
+        return totals, daily
 
-def load_xhs_posts() -> list[dict]:
-    if not XHS_QUEUE_PATH.exists():
-        return []
+    (totals_rows, daily_rows), pending = metric_counters.snapshot(read)
+    totals = {r["key"]: int(r["value"]) for r in totals_rows}
+    daily: dict[str, dict[str, int]] = {}
+    for r in daily_rows:
+        daily.setdefault(r["day"], {})[r["key"]] = int(r["value"])
+    for (name, day), n in pending.items():
+        totals[name] = totals.get(name, 0) + n
+        if day >= since:
+            day_counts = daily.setdefault(day, {})
+            day_counts[name] = day_counts.get(name, 0) + n
+    return {"totals": totals, "daily": dict(sorted(daily.items(), reverse=True))}
+
+
+XHS_POST_FIELDS = ("id", "title", "content", "cover_url", "status", "created_at", "published_at")
+XHS_POST_COLUMNS = ", ".join(XHS_POST_FIELDS)
+# 可以发布的稿件状态（发布失败的稿件可以重新发布）
+XHS_POST_STATUSES = ("queued", "published", "failed")
+XHS_PUBLISHABLE = ("queued", "failed")
+
+
+def import_xhs_posts_json(path: Path) -> int:
+    """
+    把旧版 xhs_posts.json 中的稿件导入 xhs_posts 表（一次性）
+
+    已存在的 id 跳过；导入后文件重命名为 xhs_posts.json.imported，之后不再读取。返回导入的稿件数
+    """
+    if not path.exists():
+        return 0
     try:
-        return json.loads(XHS_QUEUE_PATH.read_text())
-    except Exception:
-        return []
+        posts = json.loads(path.read_text())
+    except (OSError, ValueError) as e:
+        print(f"[XHS] 无法读取 {path}，跳过导入: {e}")
+        return 0
+    rows = [
+        (
+            str(post.get("id") or uuid4()),
+            post.get("title", ""),
+            post.get("content", ""),
+            post.get("cover_url", ""),
+            post.get("status") or "queued",
+            post.get("created_at", ""),
+            post.get("published_at", ""),
+        )
+        for post in posts if isinstance(post, dict)
+    ]
+    with get_db().transaction() as conn:
+        imported = conn.executemany(
+            f"INSERT OR IGNORE INTO xhs_posts({XHS_POST_COLUMNS}) VALUES(?, ?, ?, ?, ?, ?, ?)", rows
+        ).rowcount
+    path.rename(path.with_name(path.name + ".imported"))
+    return imported
+
+
+def get_xhs_post_counts() -> dict[str, int]:
+    with get_db().connection() as conn:
+        return {r["status"]: int(r["count"]) for r in conn.execute("SELECT status, count FROM xhs_post_counts")}
+
+
+def list_xhs_posts(status: str = "", limit: int = PAGE_SIZE, after: Optional[tuple] = None) -> dict:
+    """
+    按创建时间倒序分页列出稿件（可按状态筛选），走 (created_at, id) / (status, created_at, id) 索引
+
+    after 为上一页最后一条的 (created_at, id)，翻页不随页数变慢。
+    返回 {'items': [...], 'next_cursor': 下一页游标（没有下一页时为 None）}
+    """
+    conditions, params = [], []
+    if status:
+        conditions.append("status = ?")
+        params.append(status)
+    if after:
+        conditions.append("(created_at, id) < (?, ?)")
+        params.extend(after)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with get_db().connection() as conn:
+        rows = conn.execute(
+            f"SELECT {XHS_POST_COLUMNS} FROM xhs_posts {where} ORDER BY created_at DESC, id DESC LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+    items = [dict(r) for r in rows[:limit]]
+    more = len(rows) > limit
+    return {"items": items, "next_cursor": encode_cursor((items[-1]["created_at"], items[-1]["id"])) if more else None}
+
 
+def create_xhs_post_row(title: str, content: str, cover_url: str) -> dict:
+    post = {
+        "id": str(uuid4()),
+        "title": title,
+        "content": content,
+        "cover_url": cover_url,
+        "status": "queued",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "published_at": "",
+    }
+    with get_db().transaction() as conn:
+        conn.execute(f"INSERT INTO xhs_posts({XHS_POST_COLUMNS}) VALUES(?, ?, ?, ?, ?, ?, ?)", tuple(post.values()))
+    return post
 
-def save_xhs_posts(posts: list[dict]) -> None:
-    XHS_QUEUE_PATH.write_text(json.dumps(posts, ensure_ascii=False, indent=2))
+
+def transition_xhs_post(post_id: str, status: str, published_at: str = "") -> tuple[Optional[dict], bool]:
+    """
+    把可发布状态的稿件改为 status（条件更新，并发发布同一稿件时只有一次成功）
+
+    返回 (稿件, 是否更新)；稿件不存在时为 (None, False)
+    """
+    with get_db().transaction() as conn:
+        row = conn.execute(
+            f"""
+            UPDATE xhs_posts SET status = ?, published_at = ?
+            WHERE id = ? AND status IN ({", ".join("?" * len(XHS_PUBLISHABLE))})
+            RETURNING {XHS_POST_COLUMNS}
+            """,
+            (status, published_at, post_id, *XHS_PUBLISHABLE),
+        ).fetchone()
+        if row is not None:
+            return dict(row), True
+        row = conn.execute(f"SELECT {XHS_POST_COLUMNS} FROM xhs_posts WHERE id = ?", (post_id,)).fetchone()
+        return (dict(row) if row else None), False
 
 
 def xhs_cookie_configured() -> bool:
@@ -139,60 +507,113 @@ def xhs_cookie_configured() -> bool:
     return "XHS_COOKIE=" in raw and len(raw.split("XHS_COOKIE=", 1)[1].strip()) > 20
 
 
-def _ensure_quiz_row(conn: sqlite3.Connection, device_id: str, app_key: str) -> None:
-    conn.execute(
-        """
-        INSERT OR IGNORE INTO app_quota(device_id, app_key, free_used, ad_credits, updated_at)
-        VALUES(?, ?, 0, 0, ?)
-        """,
-        (device_id, app_key, datetime.now(timezone.utc).isoformat()),
-    )
+APP_SETTING_STATUSES = {"enabled": 1, "disabled": 0}
+
 
+def get_app_settings(status: str = "", limit: int = PAGE_SIZE, after: Optional[tuple] = None) -> dict:
+    """
+    按 (category, app_key) 顺序分页列出应用设置
 
-def get_app_settings() -> list[dict]:
-    with _get_conn() as conn:
+    status 为 enabled / disabled 时只列出启用 / 停用的应用；after 为上一页最后一条的 (category, app_key)。
+    返回 {'items': [...], 'next_cursor': 下一页游标（没有下一页时为 None）}
+    """
+    conditions, params = [], []
+    if status:
+        conditions.append("enabled = ?")
+        params.append(APP_SETTING_STATUSES[status])
+    if after:
+        conditions.append("(category, app_key) > (?, ?)")
+        params.extend(after)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    with get_db().connection() as conn:
         rows = conn.execute(
-            "SELECT app_key, category, title, free_limit, enabled FROM app_settings ORDER BY category, app_key"
+            f"SELECT app_key, category, title, free_limit, enabled FROM app_settings {where} "
+            "ORDER BY category, app_key LIMIT ?",
+            (*params, limit + 1),
         ).fetchall()
-        return [dict(r) for r in rows]
+    items = [dict(r) for r in rows[:limit]]
+    more = len(rows) > limit
+    return {"items": items, "next_cursor": encode_cursor((items[-1]["category"], items[-1]["app_key"])) if more else None}
+
+
+# app_settings.free_limit 的内存缓存，修改设置后清空（服务以单进程运行）。
+# 清空时递增版本号，避免清空前开始的查询把旧值写回缓存。
+# 只缓存 app_settings 中存在的应用，请求中任意的 app_key 不会让缓存无限增长
+_free_limits: dict[str, int] = {}
+_free_limits_version = 0
+_free_limits_lock = threading.Lock()
 
 
 def get_app_free_limit(conn: sqlite3.Connection, app_key: str) -> int:
+    with _free_limits_lock:
+        free_limit = _free_limits.get(app_key)
+        version = _free_limits_version
+    if free_limit is not None:
+        return free_limit
     row = conn.execute("SELECT free_limit FROM app_settings WHERE app_key = ?", (app_key,)).fetchone()
-    return int(row["free_limit"]) if row else 1
+    if row is None:
+        return 1
+    free_limit = int(row["free_limit"])
+    with _free_limits_lock:
+        if version == _free_limits_version:
+            _free_limits[app_key] = free_limit
+    return free_limit
+
+
+def invalidate_free_limits() -> None:
+    global _free_limits_version
+    with _free_limits_lock:
+        _free_limits.clear()
+        _free_limits_version += 1
+
+
+def update_app_setting(app_key: str, free_limit: int, enabled: bool) -> None:
+    with get_db().transaction() as conn:
+        conn.execute(
+            "UPDATE app_settings SET free_limit = ?, enabled = ? WHERE app_key = ?",
+            (max(0, free_limit), 1 if enabled else 0, app_key),
+        )
+    # 提交之后再清空，之后读到的一定是新值
+    invalidate_free_limits()
+
+
+def _quiz_quota(device_id: str, app_key: str, free_limit: int, free_used: int, ad_credits: int) -> dict:
+    free_remaining = max(0, free_limit - free_used)
+    return {
+        "device_id": device_id,
+        "app_key": app_key,
+        "free_limit": free_limit,
+        "free_remaining": free_remaining,
+        "ad_credits": ad_credits,
+        "can_play": (free_remaining + ad_credits) > 0,
+    }
 
 
 def get_quiz_quota(device_id: str, app_key: str = "chuangye") -> dict:
-    with _get_conn() as conn:
-        _ensure_quiz_row(conn, device_id, app_key)
+    # 只读：还没有额度记录的设备按未使用计算，记录在第一次消耗或解锁时创建
+    with get_db().connection() as conn:
         free_limit = get_app_free_limit(conn, app_key)
         row = conn.execute(
             "SELECT free_used, ad_credits FROM app_quota WHERE device_id = ? AND app_key = ?",
             (device_id, app_key),
         ).fetchone()
-        free_used = int(row["free_used"]) if row else 0
-        ad_credits = int(row["ad_credits"]) if row else 0
-        free_remaining = max(0, free_limit - free_used)
-        can_play = (free_remaining + ad_credits) > 0
-        return {
-            "device_id": device_id,
-            "app_key": app_key,
-            "free_limit": free_limit,
-            "free_remaining": free_remaining,
-            "ad_credits": ad_credits,
-            "can_play": can_play,
-        }
+    free_used = int(row["free_used"]) if row else 0
+    ad_credits = int(row["ad_credits"]) if row else 0
+    return _quiz_quota(device_id, app_key, free_limit, free_used, ad_credits)
 
 
 def unlock_quiz_by_ad(device_id: str, app_key: str = "chuangye") -> dict:
-    with _get_conn() as conn:
-        _ensure_quiz_row(conn, device_id, app_key)
-        conn.execute(
-            "UPDATE app_quota SET ad_credits = ad_credits + 1, updated_at = ? WHERE device_id = ? AND app_key = ?",
-            (datetime.now(timezone.utc).isoformat(), device_id, app_key),
-        )
-        conn.commit()
-    return get_quiz_quota(device_id, app_key)
+    with get_db().transaction() as conn:
+        free_limit = get_app_free_limit(conn, app_key)
+        row = conn.execute(
+            """
+            INSERT INTO app_quota(device_id, app_key, free_used, ad_credits, updated_at) VALUES(?, ?, 0, 1, ?)
+            ON CONFLICT(device_id, app_key) DO UPDATE SET ad_credits = ad_credits + 1, updated_at = excluded.updated_at
+            RETURNING free_used, ad_credits
+            """,
+            (device_id, app_key, datetime.now(timezone.utc).isoformat()),
+        ).fetchone()
+    return _quiz_quota(device_id, app_key, free_limit, int(row["free_used"]), int(row["ad_credits"]))
 
 
 def _ad_unlock_secret() -> str:
@@ -210,12 +631,11 @@ def create_ad_ticket(device_id: str, app_key: str = "chuangye") -> dict:
         raise HTTPException(status_code=400, detail="QUIZ_AD_UNLOCK_SECRET 未配置")
     ticket_id = str(uuid4())
     signature = _sign_ad_ticket(device_id, app_key, ticket_id)
-    with _get_conn() as conn:
+    with get_db().transaction() as conn:
         conn.execute(
             "INSERT INTO ad_tickets(ticket_id, device_id, app_key, signature, used, created_at) VALUES(?, ?, ?, ?, 0, ?)",
             (ticket_id, device_id, app_key, signature, datetime.now(timezone.utc).isoformat()),
         )
-        conn.commit()
     return {"ticket_id": ticket_id, "signature": signature}
 
 
@@ -223,52 +643,249 @@ def verify_and_consume_ad_ticket(device_id: str, app_key: str, ticket_id: str, s
     expected = _sign_ad_ticket(device_id, app_key, ticket_id)
     if not hmac.compare_digest(expected, signature):
         return False
-    with _get_conn() as conn:
-        row = conn.execute(
-            "SELECT used FROM ad_tickets WHERE ticket_id = ? AND device_id = ? AND app_key = ?",
+    # 条件更新：同一张票据并发提交时只有一次能把 used 从 0 改为 1
+    with get_db().transaction() as conn:
+        cursor = conn.execute(
+            "UPDATE ad_tickets SET used = 1 WHERE ticket_id = ? AND device_id = ? AND app_key = ? AND used = 0",
             (ticket_id, device_id, app_key),
-        ).fetchone()
-        if not row or int(row["used"]) == 1:
-            return False
-        conn.execute("UPDATE ad_tickets SET used = 1 WHERE ticket_id = ?", (ticket_id,))
-        conn.commit()
-    return True
+        )
+        return cursor.rowcount == 1
+
+
+def redeem_ad_ticket(device_id: str, app_key: str, ticket_id: str, signature: str) -> Optional[dict]:
+    """校验并作废广告票据，同时增加一次广告额度（同一事务）；票据无效时返回 None"""
+    with get_db().transaction():
+        if not verify_and_consume_ad_ticket(device_id, app_key, ticket_id, signature):
+            return None
+        return unlock_quiz_by_ad(device_id, app_key)
 
 
 def consume_quiz_attempt(device_id: str, app_key: str = "chuangye") -> tuple[bool, dict]:
-    with _get_conn() as conn:
-        _ensure_quiz_row(conn, device_id, app_key)
+    """
+    消耗一次测评次数：先用免费次数，用完后用广告额度
+
+    在一个写事务中用条件 UPDATE ... RETURNING 完成判断和扣减，并发请求不会多扣：
+    - 已有记录：免费次数未用完时 free_used + 1，否则广告额度 - 1；两者都用完时不更新
+    - 没有记录的新设备：插入已用 1 次免费次数的记录（免费次数为 0 时不插入，即不能消耗）
+    没有返回行即表示额度已经用完，此时 free_remaining 和 ad_credits 都为 0
+    """
+    params = {"device_id": device_id, "app_key": app_key, "now": datetime.now(timezone.utc).isoformat()}
+    with get_db().transaction() as conn:
+        free_limit = params["free_limit"] = get_app_free_limit(conn, app_key)
         row = conn.execute(
-            "SELECT free_used, ad_credits FROM app_quota WHERE device_id = ? AND app_key = ?",
-            (device_id, app_key),
+            """
+            UPDATE app_quota SET
+                free_used = free_used + (free_used < :free_limit),
+                ad_credits = ad_credits - (free_used >= :free_limit),
+                updated_at = :now
+            WHERE device_id = :device_id AND app_key = :app_key
+              AND (free_used < :free_limit OR ad_credits > 0)
+            RETURNING free_used, ad_credits
+            """,
+            params,
         ).fetchone()
-        free_limit = get_app_free_limit(conn, app_key)
-        free_used = int(row["free_used"]) if row else 0
-        ad_credits = int(row["ad_credits"]) if row else 0
+        if row is None:
+            # 已有记录但额度用完时冲突，不插入
+            row = conn.execute(
+                """
+                INSERT INTO app_quota(device_id, app_key, free_used, ad_credits, updated_at)
+                SELECT :device_id, :app_key, 1, 0, :now WHERE :free_limit > 0
+                ON CONFLICT(device_id, app_key) DO NOTHING
+                RETURNING free_used, ad_credits
+                """,
+                params,
+            ).fetchone()
+    if row is None:
+        return False, _quiz_quota(device_id, app_key, free_limit, free_limit, 0)
+    return True, _quiz_quota(device_id, app_key, free_limit, int(row["free_used"]), int(row["ad_credits"]))
+
+
+# 提取任务的阶段按完成顺序依次为 resolved → downloaded → audio_extracted → transcribed，
+# 每完成一个阶段就写入 stats.db，服务重启后从最后完成的阶段继续
+JOB_JSON_FIELDS = ("video_info", "audio_info")
+JOB_FINISHED = ("succeeded", "failed")
+
+
+def create_extract_job(share_link: str, use_cache: bool = True) -> str:
+    job_id = uuid4().hex
+    now = datetime.now(timezone.utc).isoformat()
+    with get_db().transaction() as conn:
+        conn.execute(
+            "INSERT INTO extract_jobs(job_id, share_link, use_cache, created_at, updated_at) VALUES(?, ?, ?, ?, ?)",
+            (job_id, share_link, 1 if use_cache else 0, now, now),
+        )
+    return job_id
 
-        if free_used < free_limit:
-            conn.execute(
-                "UPDATE app_quota SET free_used = free_used + 1, updated_at = ? WHERE device_id = ? AND app_key = ?",
-                (datetime.now(timezone.utc).isoformat(), device_id, app_key),
-            )
-            conn.commit()
-            return True, get_quiz_quota(device_id, app_key)
 
-        if ad_credits > 0:
-            conn.execute(
-                "UPDATE app_quota SET ad_credits = ad_credits - 1, updated_at = ? WHERE device_id = ? AND app_key = ?",
-                (datetime.now(timezone.utc).isoformat(), device_id, app_key),
-            )
-            conn.commit()
-            return True, get_quiz_quota(device_id, app_key)
+def get_extract_job(job_id: str) -> Optional[dict]:
+    with get_db().connection() as conn:
+        row = conn.execute("SELECT * FROM extract_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    if not row:
+        return None
+    job = dict(row)
+    for field in JOB_JSON_FIELDS:
+        job[field] = json.loads(job[field]) if job[field] else None
+    return job
+
+
+def _write_extract_job(job_id: str, fields: dict) -> None:
+    for field in JOB_JSON_FIELDS:
+        if fields.get(field) is not None:
+            fields[field] = json.dumps(fields[field], ensure_ascii=False)
+    fields["updated_at"] = datetime.now(timezone.utc).isoformat()
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    with get_db().transaction() as conn:
+        conn.execute(f"UPDATE extract_jobs SET {columns} WHERE job_id = ?", (*fields.values(), job_id))
+
+
+async def update_extract_job(job_id: str, **fields) -> None:
+    """更新任务字段，并唤醒等待该任务进度的 SSE 连接"""
+    await get_db().run(_write_extract_job, job_id, fields)
+    for waiter in _job_waiters.get(job_id, ()):
+        waiter.set()
 
-    return False, get_quiz_quota(device_id, app_key)
+
+def list_unfinished_extract_jobs() -> list[str]:
+    with get_db().connection() as conn:
+        rows = conn.execute(
+            "SELECT job_id FROM extract_jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+        ).fetchall()
+        return [r["job_id"] for r in rows]
+
+
+# 任务队列只保存 job_id，任务状态以 stats.db 为准
+_job_queue: Optional[asyncio.Queue] = None
+_job_workers: list[asyncio.Task] = []
+# 前端传入的 API Key 只保存在内存中，不落盘；重启后改用环境变量 API_KEY
+_job_api_keys: dict[str, str] = {}
+_job_waiters: dict[str, set[asyncio.Event]] = {}
+
+
+async def _advance_extract_job(job: dict, processor: DouyinProcessor, job_dir: Path, attempts: int) -> None:
+    """从任务最后完成的阶段继续执行到识别完成"""
+    job_id = job["job_id"]
+    stage = job["stage"]
+    video_info = job["video_info"]
+    video_path = Path(job["video_path"]) if job["video_path"] else None
+    audio_path = Path(job["audio_path"]) if job["audio_path"] else None
+    audio_info = job["audio_info"]
+    transcript_cache = get_transcript_cache()
+
+    # 中间文件丢失（如换了机器）时退回到解析完成，重新下载
+    if stage == "downloaded" and not (video_path and video_path.exists()):
+        stage = "resolved"
+    if stage == "audio_extracted" and not (audio_path and audio_path.exists()):
+        stage = "resolved"
+
+    # 重试时重新解析一次，避免用到已经过期的下载地址
+    if not stage or (stage == "resolved" and attempts > 1):
+        video_info = await processor.parse_share_url_async(job["share_link"], refresh=attempts > 1)
+        stage = "resolved"
+        await update_extract_job(job_id, stage=stage, video_info=video_info)
+
+    if stage != "audio_extracted" and job["use_cache"]:
+        text = transcript_cache.get_by_video(video_info["video_id"], processor.model_key(video_info.get("duration")))
+        if text is not None:
+            await update_extract_job(job_id, status="succeeded", stage="transcribed", text=text, cached=1, error="")
+            return
+
+    if stage == "resolved" and STREAM_AUDIO:
+        try:
+            temp_audio, audio_info = await processor.stream_audio_async(video_info)
+            audio_path = Path(shutil.move(str(temp_audio), str(job_dir / temp_audio.name)))
+            stage = "audio_extracted"
+            await update_extract_job(job_id, stage=stage, audio_path=str(audio_path), audio_info=audio_info)
+        except Exception:
+            # 边下边转失败（如 moov 在文件末尾）时改为先下载再提取
+            pass
+
+    source = None
+    if stage == "resolved":
+        # 只下载识别需要的最小来源（作品原声或最低码率版本）
+        video_path, source = await processor.download_audio_source_async(video_info, job_dir)
+        stage = "downloaded"
+        await update_extract_job(job_id, stage=stage, video_path=str(video_path))
+
+    if stage == "downloaded":
+        audio_path, audio_info = await processor.prepare_audio_async(video_info, video_path)
+        if source is not None:
+            audio_info["source"] = source
+        processor.cleanup_files(video_path)
+        stage = "audio_extracted"
+        await update_extract_job(job_id, stage=stage, video_path=None, audio_path=str(audio_path), audio_info=audio_info)
+
+    audio_hash = audio_info["sha256"]
+    text = transcript_cache.get_by_audio(audio_hash, processor.audio_model_key(audio_info)) if job["use_cache"] else None
+    cached = text is not None
+    if not cached:
+        text = await processor.extract_text_from_audio_async(audio_path, audio_info=audio_info)
+    transcript_cache.put(video_info["video_id"], processor.audio_model_key(audio_info), text, audio_hash=audio_hash)
+    await update_extract_job(job_id, status="succeeded", stage="transcribed", text=text, cached=1 if cached else 0, error="")
+
+
+async def run_extract_job(job_id: str) -> None:
+    job = await get_db().run(get_extract_job, job_id)
+    if not job or job["status"] in JOB_FINISHED:
+        return
+
+    api_key = _job_api_keys.get(job_id) or os.getenv("API_KEY", "")
+    if not api_key:
+        await update_extract_job(job_id, status="failed", error="服务重启后 API Key 已失效，请重新提交任务")
+        return
+
+    attempts = job["attempts"] + 1
+    await update_extract_job(job_id, status="running", attempts=attempts)
+    job_dir = JOB_DIR / job_id
+    job_dir.mkdir(parents=True, exist_ok=True)
+    processor = DouyinProcessor(api_key)
+    try:
+        await _advance_extract_job(job, processor, job_dir, attempts)
+    except Exception as e:
+        # 网络错误、429 和 5xx 稍后从当前阶段重试，其余错误直接失败
+        if attempts < JOB_MAX_ATTEMPTS and is_retryable_error(e):
+            await update_extract_job(job_id, status="queued", error=str(e))
+            delay = JOB_RETRY_BACKOFF * 2 ** (attempts - 1)
+            asyncio.get_running_loop().call_later(delay, _job_queue.put_nowait, job_id)
+            return
+        await update_extract_job(job_id, status="failed", error=str(e))
+
+    # 任务结束后清理中间文件；被取消（服务关闭）时保留，重启后继续
+    _job_api_keys.pop(job_id, None)
+    shutil.rmtree(job_dir, ignore_errors=True)
+
+
+async def extract_job_worker() -> None:
+    while True:
+        job_id = await _job_queue.get()
+        try:
+            await run_extract_job(job_id)
+        except Exception as e:
+            print(f"[Job] {job_id} 执行出错: {e}")
+        finally:
+            _job_queue.task_done()
+
+
+async def start_extract_job_workers() -> None:
+    """启动任务 worker，并把上次未完成的任务重新入队"""
+    global _job_queue
+    _job_queue = asyncio.Queue()
+    for job_id in await get_db().run(list_unfinished_extract_jobs):
+        _job_queue.put_nowait(job_id)
+    _job_workers.extend(asyncio.create_task(extract_job_worker()) for _ in range(JOB_WORKERS))
+
+
+async def stop_extract_job_workers() -> None:
+    for task in _job_workers:
+        task.cancel()
+    await asyncio.gather(*_job_workers, return_exceptions=True)
+    _job_workers.clear()
 
 
 class VideoRequest(BaseModel):
     """视频请求模型"""
     url: str
     api_key: str = ""  # 可选，从前端传入
+    no_cache: bool = False  # 忽略文案缓存，强制重新识别
 
 
 class VideoInfoResponse(BaseModel):
@@ -277,6 +894,11 @@ class VideoInfoResponse(BaseModel):
     video_id: str = ""
     title: str = ""
     download_url: str = ""
+    duration: float = 0  # 秒
+    author: str = ""
+    cover: str = ""
+    mirrors: list[str] = []  # 下载地址的全部 CDN 镜像
+    images: list[str] = []  # 图集作品每张图片的地址（取第一个镜像）
     error: str = ""
 
 
@@ -287,9 +909,61 @@ class ExtractResponse(BaseModel):
     title: str = ""
     text: str = ""
     download_url: str = ""
+    cached: bool = False
+    # 识别用音频的来源、下载字节数和相对默认视频节省的字节数（命中文案缓存时为空）
+    audio_source: Optional[dict] = None
     error: str = ""
 
 
+class BatchVideoRequest(BaseModel):
+    """批量提取请求"""
+    urls: list[str]
+    api_key: str = ""
+    no_cache: bool = False
+
+
+class BatchExtractItem(ExtractResponse):
+    """批量提取中单个链接的结果"""
+    index: int
+    share_link: str
+
+
+class JobResponse(BaseModel):
+    """后台提取任务状态"""
+    success: bool
+    job_id: str = ""
+    status: str = ""  # queued / running / succeeded / failed
+    stage: str = ""  # 最后完成的阶段
+    video_id: str = ""
+    title: str = ""
+    text: str = ""
+    download_url: str = ""
+    cached: bool = False
+    attempts: int = 0
+    error: str = ""
+    created_at: str = ""
+    updated_at: str = ""
+
+
+def extract_job_response(job: dict) -> JobResponse:
+    info = job["video_info"] or {}
+    return JobResponse(
+        success=job["status"] != "failed",
+        job_id=job["job_id"],
+        status=job["status"],
+        stage=job["stage"],
+        video_id=info.get("video_id", ""),
+        title=info.get("title", ""),
+        text=job["text"] or "",
+        download_url=info.get("url", ""),
+        cached=bool(job["cached"]),
+        attempts=job["attempts"],
+        error=job["error"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+    )
+
+
 class XHSPostRequest(BaseModel):
     title: str
     content: str
@@ -314,15 +988,50 @@ class AppSettingPatchRequest(BaseModel):
     enabled: bool = True
 
 
+class RequestCounterMiddleware:
+    """按路由统计请求数（只在内存中计数，见 count_metric）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # 路由匹配后 scope 中才有 route
+            route = scope.get("route") if scope["type"] == "http" else None
+            if route is not None:
+                count_metric(f"requests:{route.path}")
+
+
+app.add_middleware(RequestCounterMiddleware)
+
+
 @app.on_event("startup")
 async def startup_event():
-    init_stats_db()
+    await get_db().run(init_stats_db)
+    imported = await get_db().run(import_xhs_posts_json, XHS_QUEUE_PATH)
+    if imported:
+        print(f"[XHS] 已从 {XHS_QUEUE_PATH.name} 导入 {imported} 篇稿件")
+    metric_counters.start()
+    await start_extract_job_workers()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_extract_job_workers()
+    await aclose_async_client()
+    close_client()
+    # 关闭前写入内存中的计数
+    await metric_counters.stop()
+    close_db()
 
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     """主页面"""
-    page_views = increment_page_views()
+    count_metric("page_views")
+    page_views = await get_db().run(get_metric, "page_views")
     return templates.TemplateResponse("index.html", {"request": request, "page_views": page_views})
 
 
@@ -353,24 +1062,42 @@ async def health_check():
 @app.get("/api/stats")
 async def stats():
     """站点统计"""
+    metrics = await get_db().run(get_metrics)
+    today = metrics["daily"].get(_today(), {})
     return {
-        "page_views": get_page_views()
+        "page_views": metrics["totals"].get("page_views", 0),
+        "page_views_today": today.get("page_views", 0),
+        "requests": {
+            name.split(":", 1)[1]: value for name, value in metrics["totals"].items() if name.startswith("requests:")
+        },
+        "daily": metrics["daily"],
+        "metric_counters": metric_counters.stats(),
+        "video_cache": get_video_cache().stats(),
+        "transcript_cache": get_transcript_cache().stats(),
+        "media_cache": get_media_cache().stats(),
+        "download": get_download_stats().stats(),
+        "singleflight": singleflight_stats(),
+        "db": get_db().stats(),
     }
 
 
 @app.get("/api/quiz/apps")
-async def quiz_apps():
-    return {"items": get_app_settings()}
+async def quiz_apps(request: Request, status: str = "", limit: int = PAGE_SIZE, cursor: str = ""):
+    """应用设置列表，支持 status（enabled / disabled）筛选和游标分页；内容未变化时返回 304"""
+    if status and status not in APP_SETTING_STATUSES:
+        raise HTTPException(status_code=400, detail="status 只能是 enabled 或 disabled")
+    after, limit = decode_cursor(cursor, 2), page_limit(limit)
+    # 同一张表的不同页、不同筛选条件内容不同，ETag 中带上规范化后的查询参数
+    etag = await get_db().run(table_etag, "app_settings", status, limit, cursor)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    page = await get_db().run(get_app_settings, status, limit, after)
+    return etag_response(page, etag)
 
 
 @app.post("/api/quiz/apps/setting")
 async def quiz_apps_setting(req: AppSettingPatchRequest):
-    with _get_conn() as conn:
-        conn.execute(
-            "UPDATE app_settings SET free_limit = ?, enabled = ? WHERE app_key = ?",
-            (max(0, req.free_limit), 1 if req.enabled else 0, req.app_key.strip()),
-        )
-        conn.commit()
+    await get_db().run(update_app_setting, req.app_key.strip(), req.free_limit, req.enabled)
     return {"success": True}
 
 
@@ -385,100 +1112,104 @@ async def quiz_ad_config():
 
 @app.get("/api/quiz/quota/{app_key}/{device_id}")
 async def quiz_quota(app_key: str, device_id: str):
-    return get_quiz_quota(device_id, app_key)
+    return await get_db().run(get_quiz_quota, device_id, app_key)
 
 
 @app.post("/api/quiz/ad-ticket")
 async def quiz_ad_ticket(req: QuizDeviceRequest):
-    ticket = create_ad_ticket(req.device_id.strip(), req.app_key.strip())
+    ticket = await get_db().run(create_ad_ticket, req.device_id.strip(), req.app_key.strip())
     return {"success": True, **ticket}
 
 
 @app.post("/api/quiz/unlock-ad")
 async def quiz_unlock_ad(req: QuizDeviceRequest):
-    return unlock_quiz_by_ad(req.device_id.strip(), req.app_key.strip())
+    return await get_db().run(unlock_quiz_by_ad, req.device_id.strip(), req.app_key.strip())
 
 
 @app.post("/api/quiz/unlock-ad-verify")
 async def quiz_unlock_ad_verify(req: QuizAdVerifyRequest):
-    ok = verify_and_consume_ad_ticket(req.device_id.strip(), req.app_key.strip(), req.ticket_id.strip(), req.signature.strip())
-    if not ok:
+    quota = await get_db().run(
+        redeem_ad_ticket, req.device_id.strip(), req.app_key.strip(), req.ticket_id.strip(), req.signature.strip()
+    )
+    if quota is None:
         return {"success": False, "error": "广告票据校验失败"}
-    quota = unlock_quiz_by_ad(req.device_id.strip(), req.app_key.strip())
     return {"success": True, "quota": quota}
 
 
 @app.post("/api/quiz/consume")
 async def quiz_consume(req: QuizDeviceRequest):
-    consumed, quota = consume_quiz_attempt(req.device_id.strip(), req.app_key.strip())
+    consumed, quota = await get_db().run(consume_quiz_attempt, req.device_id.strip(), req.app_key.strip())
     return {"success": consumed, "quota": quota}
 
 
 @app.get("/api/xhs/status")
-async def xhs_status():
-    posts = load_xhs_posts()
-    queued = len([p for p in posts if p.get("status") == "queued"])
-    published = len([p for p in posts if p.get("status") == "published"])
-    return {
-        "cookie_configured": xhs_cookie_configured(),
-        "queued": queued,
-        "published": published,
-        "total": len(posts)
-    }
+async def xhs_status(request: Request):
+    cookie_configured = xhs_cookie_configured()
+    etag = await get_db().run(table_etag, "xhs_posts", int(cookie_configured))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    counts = await get_db().run(get_xhs_post_counts)
+    return etag_response({
+        "cookie_configured": cookie_configured,
+        "queued": counts.get("queued", 0),
+        "published": counts.get("published", 0),
+        "total": sum(counts.values())
+    }, etag)
 
 
 @app.get("/api/xhs/posts")
-async def xhs_posts():
-    posts = load_xhs_posts()
-    return {"items": sorted(posts, key=lambda p: p.get("created_at", ""), reverse=True)}
+async def xhs_posts(request: Request, status: str = "", limit: int = PAGE_SIZE, cursor: str = ""):
+    """稿件列表，按创建时间倒序，支持 status 筛选和游标分页；内容未变化时返回 304"""
+    status = status.strip()
+    if status and status not in XHS_POST_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status 只能是 {' / '.join(XHS_POST_STATUSES)}")
+    after, limit = decode_cursor(cursor, 2), page_limit(limit)
+    etag = await get_db().run(table_etag, "xhs_posts", status, limit, cursor)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    page = await get_db().run(list_xhs_posts, status, limit, after)
+    return etag_response(page, etag)
 
 
 @app.post("/api/xhs/posts")
 async def create_xhs_post(req: XHSPostRequest):
-    posts = load_xhs_posts()
-    now = datetime.now(timezone.utc).isoformat()
-    post = {
-        "id": str(uuid4()),
-        "title": req.title.strip(),
-        "content": req.content.strip(),
-        "cover_url": req.cover_url.strip(),
-        "status": "queued",
-        "created_at": now,
-        "published_at": ""
-    }
-    posts.append(post)
-    save_xhs_posts(posts)
+    post = await get_db().run(create_xhs_post_row, req.title.strip(), req.content.strip(), req.cover_url.strip())
     return {"success": True, "item": post}
 
 
 @app.post("/api/xhs/publish/{post_id}")
 async def publish_xhs_post(post_id: str):
-    posts = load_xhs_posts()
-    idx = next((i for i, p in enumerate(posts) if p.get("id") == post_id), -1)
-    if idx < 0:
-        raise HTTPException(status_code=404, detail="未找到稿件")
-
     if not xhs_cookie_configured():
-        posts[idx]["status"] = "failed"
-        save_xhs_posts(posts)
+        post, _ = await get_db().run(transition_xhs_post, post_id, "failed")
+        if post is None:
+            raise HTTPException(status_code=404, detail="未找到稿件")
         return {"success": False, "error": "XHS_COOKIE 未配置"}
 
-    posts[idx]["status"] = "published"
-    posts[idx]["published_at"] = datetime.now(timezone.utc).isoformat()
-    save_xhs_posts(posts)
-    return {"success": True, "item": posts[idx]}
+    post, updated = await get_db().run(
+        transition_xhs_post, post_id, "published", datetime.now(timezone.utc).isoformat()
+    )
+    if post is None:
+        raise HTTPException(status_code=404, detail="未找到稿件")
+    if not updated:
+        return {"success": False, "error": "稿件已发布", "item": post}
+    return {"success": True, "item": post}
 
 
 @app.post("/api/video/info", response_model=VideoInfoResponse)
 async def get_info(req: VideoRequest):
     """获取视频信息（无需 API_KEY）"""
     try:
-        info = get_video_info(req.url)
+        info = await get_video_info_async(req.url)
         return VideoInfoResponse(
             success=True,
             video_id=info["video_id"],
             title=info["title"],
-            download_url=info["url"]
+            download_url=info["url"],
+            duration=info.get("duration", 0),
+            author=info.get("author", ""),
+            cover=info.get("cover", ""),
+            mirrors=info.get("urls", []),
+            images=[urls[0] for urls in info.get("images", [])]
         )
     except Exception as e:
         return VideoInfoResponse(success=False, error=str(e))
@@ -496,23 +1227,188 @@ async def extract_transcript(req: VideoRequest):
         )
 
     try:
-        result = extract_text(req.url, api_key=api_key, show_progress=False)
+        result = await extract_text_async(req.url, api_key=api_key, use_cache=not req.no_cache)
         return ExtractResponse(
             success=True,
             video_id=result["video_info"]["video_id"],
             title=result["video_info"]["title"],
             text=result["text"],
-            download_url=result["video_info"]["url"]
+            download_url=result["video_info"]["url"],
+            cached=result["cached"],
+            audio_source=result["audio_source"]
         )
     except Exception as e:
         return ExtractResponse(success=False, error=str(e))
 
 
-@app.get("/api/video/download")
-async def download_video(url: str, filename: str = "video.mp4"):
-    """代理下载视频（解决跨域和请求头问题）"""
-    print(f"[Download] URL: {url}")
-    print(f"[Download] Filename: {filename}")
+@app.post("/api/video/extract/batch")
+async def extract_transcript_batch(req: BatchVideoRequest):
+    """
+    批量提取视频文案（需要 API_KEY）
+
+    以 NDJSON 流式返回，每完成一个链接输出一行 BatchExtractItem（按完成顺序，index 为链接位置）
+    """
+    api_key = req.api_key or os.getenv("API_KEY", "")
+    if not api_key:
+        return ExtractResponse(success=False, error="请先配置 API Key")
+
+    share_links = extract_share_urls(req.urls)
+    if not share_links:
+        raise HTTPException(status_code=400, detail="没有需要提取的链接")
+    if len(share_links) > BATCH_MAX_LINKS:
+        raise HTTPException(status_code=400, detail=f"单次最多提取 {BATCH_MAX_LINKS} 个链接")
+
+    async def results():
+        async for item in extract_text_batch_async(share_links, api_key=api_key, use_cache=not req.no_cache):
+            info = item["video_info"] or {}
+            line = BatchExtractItem(
+                index=item["index"],
+                share_link=item["share_link"],
+                success=item["success"],
+                video_id=info.get("video_id", ""),
+                title=info.get("title", ""),
+                text=item["text"],
+                download_url=info.get("url", ""),
+                cached=item["cached"],
+                error=item["error"],
+            )
+            yield line.model_dump_json() + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@app.post("/api/jobs", response_model=JobResponse)
+async def create_extract_job_api(req: VideoRequest):
+    """
+    提交后台提取任务（需要 API_KEY），立即返回 job_id
+
+    长视频的提取可能超过反向代理的请求超时，改用任务方式：
+    通过 GET /api/jobs/{job_id} 轮询或 GET /api/jobs/{job_id}/events 订阅进度
+    """
+    api_key = req.api_key or os.getenv("API_KEY", "")
+    if not api_key:
+        return JobResponse(success=False, error="请先配置 API Key")
+
+    job_id = await get_db().run(create_extract_job, req.url, use_cache=not req.no_cache)
+    if req.api_key:
+        _job_api_keys[job_id] = req.api_key
+    _job_queue.put_nowait(job_id)
+    return extract_job_response(await get_db().run(get_extract_job, job_id))
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+async def extract_job_status(job_id: str):
+    """查询提取任务状态"""
+    job = await get_db().run(get_extract_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return extract_job_response(job)
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def extract_job_events(job_id: str):
+    """以 SSE 推送任务进度，状态变化时发送一条 JobResponse，任务结束后关闭"""
+    if not await get_db().run(get_extract_job, job_id):
+        raise HTTPException(status_code=404, detail="任务不存在")
+
+    async def events():
+        waiter = asyncio.Event()
+        _job_waiters.setdefault(job_id, set()).add(waiter)
+        last = None
+        try:
+            while True:
+                waiter.clear()
+                job = extract_job_response(await get_db().run(get_extract_job, job_id))
+                data = job.model_dump_json()
+                if data != last:
+                    yield f"data: {data}\n\n"
+                    last = data
+                if job.status in JOB_FINISHED:
+                    break
+                try:
+                    await asyncio.wait_for(waiter.wait(), JOB_EVENT_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            waiters = _job_waiters.get(job_id)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del _job_waiters[job_id]
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def content_disposition(filename: str) -> str:
+    """生成下载文件名响应头，非 ASCII 文件名按 RFC 5987 编码"""
+    name = Path(filename)
+    stem = name.stem.encode("ascii", "ignore").decode().replace('"', "").strip() or "video"
+    fallback = stem + name.suffix.encode("ascii", "ignore").decode()
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+
+# 后台进行中的视频缓存下载（保留引用，避免任务被回收）
+_media_fills: set[asyncio.Task] = set()
+
+
+def fill_media_cache(video_id: str, info: dict):
+    """
+    开始把视频下载到本地视频缓存并返回这次下载的登记；同一视频已在下载时返回那次下载
+
+    由本函数发起的下载按顺序写入，下载过程中请求可以边写边读（MediaCache.tail）
+    """
+    async def fetch(path: Path) -> int:
+        try:
+            return await stream_video_file_async(info, path)
+        except Exception as e:
+            print(f"[Download] 缓存视频失败: {e}")
+            raise
+
+    return get_media_cache().start_fill_async(video_id, fetch, sequential=True)
+
+
+@app.api_route("/api/video/download", methods=["GET", "HEAD"])
+async def download_video(request: Request, url: str, filename: str = "video.mp4", video_id: str = ""):
+    """
+    代理下载视频（解决跨域和请求头问题）
+
+    带 video_id 且该视频由本服务解析过时，已缓存的视频（包括 Range 请求）直接从本地缓存文件返回；
+    未缓存时向 CDN 发起（或加入进行中的）唯一一次缓存下载：不带 Range（或从头开始的 Range）的 GET
+    边下载边返回，不必等待整个文件下载完；其他 Range 请求和 HEAD 等下载完成后由缓存文件返回。
+
+    其余情况转发浏览器的 Range / If-Range，CDN 返回的 206 和 Content-Range 原样回传，
+    拖动进度条和断点续传只会拉取需要的部分。响应体逐块转发（不解压、不缓存整段），
+    客户端读得慢时写入会等待，上游读取也随之暂停，内存占用与视频大小无关。
+    """
+    print(f"[Download] {request.method} URL: {url}")
+    print(f"[Download] Filename: {filename}, Range: {request.headers.get('range', '-')}")
+
+    media_cache = get_media_cache()
+    if video_id and media_cache.enabled and media_cache.cacheable(video_id):
+        # 只缓存服务端解析过的视频并使用解析出的播放地址，避免任意 URL 写入缓存
+        info = await run_in_threadpool(get_video_cache().get_info, video_id)
+        if info is not None:
+            path = await run_in_threadpool(media_cache.get, video_id)
+            if path is None:
+                fill = fill_media_cache(video_id, info)
+                from_start = request.headers.get("range", "bytes=0-") == "bytes=0-"
+                if fill.sequential and request.method == "GET" and from_start:
+                    # 从头读取：边写边读正在下载的缓存文件（总大小未知，按 200 返回完整内容）
+                    return StreamingResponse(
+                        media_cache.tail(video_id, fill), media_type="video/mp4",
+                        headers={"Content-Disposition": content_disposition(filename)},
+                    )
+                try:
+                    path = await media_cache.wait_fill(video_id, fill)
+                except Exception as e:
+                    raise HTTPException(status_code=502, detail=f"下载失败: {e}")
+                if path is None:
+                    raise HTTPException(status_code=502, detail="下载失败")
+            return FileResponse(path, media_type="video/mp4", filename=filename)
     try:
         # 完整的请求头，模拟浏览器访问
         download_headers = {
@@ -523,36 +1419,68 @@ async def download_video(url: str, filename: str = "video.mp4"):
             'Accept-Encoding': 'identity',
             'Connection': 'keep-alive',
         }
-
-        response = requests.get(url, headers=download_headers, stream=True, allow_redirects=True)
-        print(f"[Download] Response status: {response.status_code}")
-        print(f"[Download] Final URL: {response.url}")
-        response.raise_for_status()
-
-        content_length = response.headers.get("content-length", "")
-
-        def iter_content():
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    yield chunk
-
-        headers = {
-            "Content-Disposition": f'attachment; filename="{filename}"',
-        }
-        if content_length:
-            headers["Content-Length"] = content_length
+        for name in PROXY_REQUEST_HEADERS:
+            if name in request.headers:
+                download_headers[name] = request.headers[name]
+
+        client = get_async_client()
+        upstream = await client.send(client.build_request(request.method, url, headers=download_headers), stream=True)
+        print(f"[Download] Response status: {upstream.status_code}")
+        print(f"[Download] Final URL: {upstream.url}")
+
+        headers = {name: upstream.headers[name] for name in PROXY_RESPONSE_HEADERS if name in upstream.headers}
+        if upstream.status_code == 416:
+            # 请求的范围超出文件大小，把 Content-Range 告诉客户端
+            await upstream.aclose()
+            return Response(status_code=416, headers=headers)
+        if upstream.is_error:
+            await upstream.aclose()
+            raise HTTPException(status_code=upstream.status_code, detail=f"下载失败: {upstream.status_code}")
+
+        headers["Content-Disposition"] = content_disposition(filename)
+        media_type = upstream.headers.get("content-type", "video/mp4")
+        if request.method == "HEAD":
+            await upstream.aclose()
+            return Response(status_code=upstream.status_code, headers=headers, media_type=media_type)
 
         return StreamingResponse(
-            iter_content(),
-            media_type="video/mp4",
-            headers=headers
+            upstream.aiter_raw(),
+            status_code=upstream.status_code,
+            media_type=media_type,
+            headers=headers,
+            background=BackgroundTask(upstream.aclose),
         )
-    except requests.exceptions.HTTPError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"下载失败: {e.response.status_code}")
+    except HTTPException:
+        raise
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"下载失败: {e}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/video/images")
+async def download_images(video_id: str):
+    """
+    打包下载图集作品的全部图片
+
+    边下载边生成 ZIP 并流式返回（图片按原样存储，不再压缩），不在内存或磁盘上构建整个压缩包
+    """
+    if not video_id.isdigit():
+        raise HTTPException(status_code=400, detail="无效的作品ID")
+    try:
+        info = await get_video_info_async(SHARE_PAGE_URL.format(video_id=video_id))
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"解析作品失败: {e}")
+    if not info.get("images"):
+        raise HTTPException(status_code=400, detail="该作品不是图集")
+
+    return StreamingResponse(
+        stream_images_zip(info["images"], HEADERS),
+        media_type="application/zip",
+        headers={"Content-Disposition": content_disposition(f"{info['title']}.zip")},
+    )
+
+
 def main():
     """启动服务"""
     port = int(os.getenv("PORT", "8080"))